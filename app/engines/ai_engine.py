@@ -5,6 +5,10 @@ import os
 import re
 import json
 from google import genai # New SDK
+from google.genai import types
+
+from app.utils.stream_utils import JSONEnvelopeParser
+from .llm_client import ResilientLLMClient, LLMUnavailableError, CANNED_RESPONSE, LLM_ATTEMPT_TIMEOUT
 
 
 class AIEngine:
@@ -15,12 +19,19 @@ class AIEngine:
         self.raw_model_name = model_name
         self.api_key = os.getenv("GOOGLE_API_KEY")
         self.client = None
+        self.llm = None  # ResilientLLMClient wrapping self.client
 
         if self.api_key:
             try:
                 # New SDK Client Initialization
                 print(f"[INIT] Initializing Gemini AI ({self.raw_model_name}) via NEW Google Gen AI SDK...")
-                self.client = genai.Client(api_key=self.api_key)
+                # SDK-level timeout bounds abandoned attempts; GEMINI_BASE_URL points at a fake server for testing
+                http_options = types.HttpOptions(
+                    timeout=int(LLM_ATTEMPT_TIMEOUT * 1000),
+                    base_url=os.getenv("GEMINI_BASE_URL") or None
+                )
+                self.client = genai.Client(api_key=self.api_key, http_options=http_options)
+                self.llm = ResilientLLMClient(self.client)
                 
                 # Normalize model name for new SDK (e.g., remove 'models/' prefix if present)
                 # The new SDK typically expects 'gemini-1.5-flash'
@@ -59,47 +70,41 @@ Instructions:
 Response (JSON):
 """
 
-    def process_message(self, user_message: str, data_context: str = "", conversation_history=None) -> dict:
-        """
-        Unified processing to save API calls.
-        Returns JSON: { "response": str, "suggestions": list, "needs_context": bool, "search_term": str }
-        """
-        if not self.client:
-            return {"response": "System Error: AI Model not initialized.", "suggestions": []}
+    def _build_prompt(self, user_message: str, data_context="", conversation_history=None,
+                      decide_intent: bool = True) -> str:
+        """Assemble the phase-1 decision prompt or the phase-2 answer prompt."""
+        # 1. Prepare Conversation Text
+        conversation_text = ""
+        if conversation_history:
+            recent = conversation_history[-6:] # Keep it short to save tokens
+            segments = []
+            for item in recent:
+                role = "User" if item.get("role") == "user" else "Model"
+                content = item.get('content', '')
+                # Clean previous JSON outputs from history to avoid confusion
+                try:
+                    c_json = json.loads(content)
+                    if isinstance(c_json, dict):
+                        content = c_json.get('text', '')
+                except:
+                    pass
+                segments.append(f"{role}: {content}")
+            conversation_text = "\n".join(segments)
+
+        # 2. Construct Prompt (One-Shot Decision)
+        # If data_context is provided, we force an answer.
+        # If NO data_context, we check if we NEED it.
+        
+        if data_context or not decide_intent:
+            # PHASE 2: We have data (or routing is already decided), generate answer.
+            return self.qa_template.format(
+                context=data_context or "No additional context needed.",
+                conversation=conversation_text,
+                question=user_message
+            )
 
-        try:
-            # 1. Prepare Conversation Text
-            conversation_text = ""
-            if conversation_history:
-                recent = conversation_history[-6:] # Keep it short to save tokens
-                segments = []
-                for item in recent:
-                    role = "User" if item.get("role") == "user" else "Model"
-                    content = item.get('content', '')
-                    # Clean previous JSON outputs from history to avoid confusion
-                    try:
-                        c_json = json.loads(content)
-                        if isinstance(c_json, dict):
-                            content = c_json.get('text', '')
-                    except:
-                        pass
-                    segments.append(f"{role}: {content}")
-                conversation_text = "\n".join(segments)
-
-            # 2. Construct Prompt (One-Shot Decision)
-            # If data_context is provided, we force an answer.
-            # If NO data_context, we check if we NEED it.
-            
-            if data_context:
-                # PHASE 2: We have data, generate answer.
-                prompt = self.qa_template.format(
-                    context=data_context,
-                    conversation=conversation_text,
-                    question=user_message
-                )
-            else:
-                # PHASE 1: Decide Intent OR Answer directly
-                prompt = f"""You are Kai, a university assistant.
+        # PHASE 1: Decide Intent OR Answer directly
+        return f"""You are Kai, a university assistant.
 Current Conversation:
 {conversation_text}
 
@@ -118,36 +123,93 @@ Instructions:
 3. STRICT JSON OUTPUT ONLY.
 """
 
-            # 3. Call API
-            response = self.client.models.generate_content(
+    def _parse_response(self, raw_text: str) -> dict:
+        """Normalize the model's JSON envelope (or plain text) into our result dict."""
+        json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
+        if json_match:
+            data = json.loads(json_match.group())
+            # Normalize output keys
+            return {
+                "response": data.get("text", ""),
+                "suggestions": data.get("suggestions", []),
+                "needs_context": data.get("needs_context", False),
+                "search_term": data.get("search_term", None)
+            }
+        # Fallback for plain text response
+        return {
+            "response": raw_text, 
+            "suggestions": ["Menu", "Contact"],
+            "needs_context": False
+        }
+
+    def process_message(self, user_message: str, data_context: str = "", conversation_history=None,
+                        decide_intent: bool = True) -> dict:
+        """
+        Unified processing to save API calls.
+        decide_intent=False skips the phase-1 decision prompt and answers directly
+        (used when the local intent router has already classified the message).
+        Returns JSON: { "response": str, "suggestions": list, "needs_context": bool, "search_term": str }
+        """
+        if not self.client:
+            return {"response": "System Error: AI Model not initialized.", "suggestions": [], "error": True}
+
+        try:
+            prompt = self._build_prompt(user_message, data_context, conversation_history, decide_intent)
+
+            # 3. Call API (deadline / retry / circuit breaker handled by the client layer)
+            response = self.llm.generate_content(
                 model=self.model_name,
                 contents=prompt
             )
             raw_text = response.text.strip()
             
             # 4. Parse JSON
-            json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group())
-                # Normalize output keys
-                return {
-                    "response": data.get("text", ""),
-                    "suggestions": data.get("suggestions", []),
-                    "needs_context": data.get("needs_context", False),
-                    "search_term": data.get("search_term", None)
-                }
-            else:
-                # Fallback for plain text response
-                return {
-                    "response": raw_text, 
-                    "suggestions": ["Menu", "Contact"],
-                    "needs_context": False
-                }
+            return self._parse_response(raw_text)
 
+        except LLMUnavailableError as e:
+            print(f"AI Unavailable: {e}")
+            return {"response": CANNED_RESPONSE, "suggestions": [], "error": True, "degraded": True}
         except Exception as e:
             print(f"AI Error: {e}")
-            return {"response": "I'm having trouble connecting right now.", "suggestions": []}
+            return {"response": "I'm having trouble connecting right now.", "suggestions": [], "error": True}
+
+    def stream_message(self, user_message: str, data_context: str = "", conversation_history=None,
+                       decide_intent: bool = True):
+        """
+        Streaming variant of process_message.
+        Yields ("text", delta) tuples as the "text" field arrives, then one ("result", dict)
+        with the same shape process_message returns.
+        """
+        if not self.client:
+            yield ("result", {"response": "System Error: AI Model not initialized.", "suggestions": [], "error": True})
+            return
+
+        parser = JSONEnvelopeParser()
+        try:
+            prompt = self._build_prompt(user_message, data_context, conversation_history, decide_intent)
+            for chunk in self.llm.generate_content_stream(model=self.model_name, contents=prompt):
+                delta = parser.feed(chunk.text or "")
+                if delta:
+                    yield ("text", delta)
+
+            result = self._parse_response(parser.raw_text.strip())
+        except LLMUnavailableError as e:
+            print(f"AI Unavailable: {e}")
+            result = {"response": parser.streamed_text or CANNED_RESPONSE, "suggestions": [], "error": True, "degraded": True}
+        except Exception as e:
+            print(f"AI Stream Error: {e}")
+            result = {"response": parser.streamed_text or "I'm having trouble connecting right now.",
+                      "suggestions": [], "error": True}
+
+        # Plain-text replies (no JSON envelope) are only known once the stream ends
+        remainder = parser.remainder(result.get("response", ""))
+        if remainder:
+            yield ("text", remainder)
+        yield ("result", result)
+
+    def get_llm_stats(self) -> dict:
+        """Per-model latency/error counters from the resilient client layer."""
+        return self.llm.get_stats() if self.llm else {}
 
     # ... (Unified process_message method kept above) ...
     # Deprecated fallback methods removed for cleanliness.
-
@@ -0,0 +1,336 @@
+"""
+Analytics Engine - precomputed student count cube for "how many" questions
+One $facet aggregation groups the student collection by gender, nationality,
+programme, intake, campus, profile status and profile type. The result is held
+as a sparse NumPy cube (category codes per non-empty cell, plus its count, with
+posting lists per category), so any slice / group-by count is a posting-list
+lookup and a bincount in memory. The
+cube is rebuilt on a schedule or on demand; only aggregate counts are kept.
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.utils.lazy_utils import LazyProxy
+from .catalog_engine import CAMPUS_ALIASES
+from .metadata_engine import normalize_campus
+
+# Configuration (override via .env)
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "900"))  # 0 = on demand only
+ANALYTICS_MAX_GROUPS = int(os.getenv("ANALYTICS_MAX_GROUPS", "15"))              # groups listed in chat context
+
+# Dimension -> student fields holding it (first non-null wins)
+DIMENSIONS = {
+    "gender": ["GENDER", "Gender", "gender"],
+    "nationality": ["NATIONALITY", "Nationality"],
+    "programme": ["PROGRAMME_NAME", "PROGRAMME", "PROGRAMME_TITLE"],
+    "intake": ["INTAKE"],
+    "campus": ["CAMPUS"],
+    "profile_status": ["PROFILE_STATUS"],
+    "profile_type": ["PROFILE_TYPE"],
+}
+UNKNOWN = "Unknown"
+
+# Question words -> dimension (for "by nationality", "per campus", "which programme has the most")
+DIMENSION_WORDS = {
+    "gender": "gender", "genders": "gender", "sex": "gender",
+    "nationality": "nationality", "nationalities": "nationality", "country": "nationality", "countries": "nationality",
+    "programme": "programme", "programmes": "programme", "program": "programme", "programs": "programme",
+    "course": "programme", "courses": "programme",
+    "intake": "intake", "intakes": "intake",
+    "campus": "campus", "campuses": "campus",
+    "status": "profile_status", "statuses": "profile_status",
+    "type": "profile_type", "types": "profile_type",
+}
+GENDER_WORDS = {
+    "female": ("female", "f"), "females": ("female", "f"), "women": ("female", "f"), "girls": ("female", "f"),
+    "male": ("male", "m"), "males": ("male", "m"), "men": ("male", "m"), "boys": ("male", "m"),
+}
+GROUP_BY = re.compile(r"\b(?:by|per|each|every|across|breakdown of|which|what|top \d+|most common)\s+(\w+)"
+                      r"(?:\s+and\s+(\w+))?")
+COUNT_QUESTION = re.compile(r"\b(how many|number of|count|counts|total|statistics|stats|breakdown|distribution|"
+                            r"most|least|fewest|largest|biggest|popular)\b")
+NATIONALITY_SUFFIX = re.compile(r"(ese|ian|ish|an|i|a|n|s)$")
+UNIVERSITY_NAME = re.compile(r"\bucsi( university)? malaysia\b")  # not a nationality filter
+PROGRAMME_PREFIX = re.compile(r"^(bachelor|master|diploma|doctor|foundation|certificate)s?\s+(of|in)\s+(science\s+in\s+)?")
+
+
+def _field_expression(fields: Sequence[str]):
+    """First non-null of the fields, as a string (nested $ifNull works on every MongoDB version)"""
+    expression = None
+    for field in reversed(fields):
+        expression = f"${field}" if expression is None else {"$ifNull": [f"${field}", expression]}
+    return {"$convert": {"input": expression, "to": "string", "onError": None, "onNull": None}}
+
+
+def _campus(text: str) -> Optional[str]:
+    """Canonical campus named in a label or question ("KL", "UCSI Kuala Lumpur" -> "Kuala Lumpur")"""
+    text = text.lower()
+    return normalize_campus(text) or next((name for pattern, name in CAMPUS_ALIASES if re.search(pattern, text)), None)
+
+
+def _same_nationality(label_word: str, word: str) -> bool:
+    """'indonesia' ~ 'indonesian' (prefix), 'china' ~ 'chinese' (stem)"""
+    shorter, longer = sorted((label_word, word), key=len)
+    if len(shorter) >= 5 and longer.startswith(shorter):
+        return True
+    stem = NATIONALITY_SUFFIX.sub("", label_word)
+    return len(stem) >= 4 and stem == NATIONALITY_SUFFIX.sub("", word)
+
+
+def cube_pipeline() -> List[Dict]:
+    """One round trip: every non-empty cell of the cube plus the collection total"""
+    return [{"$facet": {
+        "cells": [{"$group": {"_id": {dim: _field_expression(fields) for dim, fields in DIMENSIONS.items()},
+                              "count": {"$sum": 1}}}],
+        "total": [{"$count": "n"}],
+    }}]
+
+
+class StudentCube:
+    """
+    Immutable sparse count cube. columns[d][i] is cell i's category code on dimension d,
+    counts[i] its number of students; postings[d][code] lists the cells holding a category,
+    so a slice starts from its most selective filter. Labels are merged case-insensitively.
+    """
+
+    def __init__(self, cells: List[Dict], built_at: Optional[float] = None, build_ms: float = 0.0):
+        self.dimensions = list(DIMENSIONS)
+        self.built_at = built_at or time.time()
+        self.build_ms = build_ms
+        self.categories: Dict[str, List[str]] = {dim: [] for dim in self.dimensions}
+        lookups: Dict[str, Dict[str, int]] = {dim: {} for dim in self.dimensions}
+        codes = np.zeros((len(cells), len(self.dimensions)), dtype=np.int32)
+        counts = np.zeros(len(cells), dtype=np.int64)
+        for i, cell in enumerate(cells):
+            for d, dim in enumerate(self.dimensions):
+                label = str(cell.get(dim) or "").strip() or UNKNOWN
+                key = label.lower()
+                if key not in lookups[dim]:
+                    lookups[dim][key] = len(self.categories[dim])
+                    self.categories[dim].append(label)
+                codes[i, d] = lookups[dim][key]
+            counts[i] = int(cell.get("count", 0))
+        self.columns = [np.ascontiguousarray(codes[:, d]) for d in range(len(self.dimensions))]
+        self.counts = counts
+        self.total = int(counts.sum())
+        self.postings = []
+        for d, column in enumerate(self.columns):
+            order = np.argsort(column, kind="stable")
+            bounds = np.searchsorted(column[order], np.arange(len(self.categories[self.dimensions[d]]) + 1))
+            self.postings.append([order[bounds[c]:bounds[c + 1]] for c in range(len(bounds) - 1)])
+        self._lookups = lookups
+
+    @classmethod
+    def from_facet(cls, result: Dict, build_ms: float = 0.0) -> "StudentCube":
+        cells = [dict(doc["_id"], count=doc["count"]) for doc in result.get("cells", [])]
+        return cls(cells, build_ms=build_ms)
+
+    def category_codes(self, dim: str, values) -> List[int]:
+        values = [values] if isinstance(values, str) else values
+        return [self._lookups[dim][key] for key in (str(v).strip().lower() for v in values) if key in self._lookups[dim]]
+
+    def count(self, filters: Optional[Dict] = None, group_by: Optional[Sequence[str]] = None,
+              top: Optional[int] = None) -> Dict:
+        """
+        Students matching every filter {dimension: value or [values]} (case-insensitive),
+        optionally grouped by one or more dimensions (largest groups first).
+        """
+        selections = []  # (dimension index, allowed codes)
+        for dim, values in (filters or {}).items():
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dim}")
+            selections.append((self.dimensions.index(dim), self.category_codes(dim, values)))
+        rows = None
+        if selections:
+            # Candidate cells from the most selective filter; the others are lookup-table checks
+            sizes = [sum(len(self.postings[d][c]) for c in codes) for d, codes in selections]
+            first = int(np.argmin(sizes))
+            d, codes = selections.pop(first)
+            rows = np.concatenate([self.postings[d][c] for c in codes]) if codes else np.zeros(0, dtype=np.int64)
+            for d, codes in selections:
+                allowed = np.zeros(len(self.categories[self.dimensions[d]]), dtype=bool)
+                allowed[codes] = True
+                rows = rows[allowed[self.columns[d][rows]]]
+        counts = self.counts if rows is None else self.counts[rows]
+        result = {"total": int(counts.sum()), "filters": dict(filters or {}), "groups": []}
+        if group_by:
+            shape = tuple(len(self.categories[dim]) for dim in group_by)
+            keys = [self.columns[self.dimensions.index(dim)] for dim in group_by]
+            keys = [key if rows is None else key[rows] for key in keys]
+            flat = np.ravel_multi_index(tuple(keys), shape)
+            sums = np.bincount(flat, weights=counts, minlength=int(np.prod(shape)))
+            nonzero = np.flatnonzero(sums)
+            result["group_count"] = int(len(nonzero))
+            order = nonzero[np.argsort(-sums[nonzero], kind="stable")][:top]
+            for index, group_codes in zip(order, zip(*np.unravel_index(order, shape))):
+                labels = [self.categories[dim][code] for dim, code in zip(group_by, group_codes)]
+                result["groups"].append({"group": dict(zip(group_by, labels)), "count": int(sums[index])})
+        return result
+
+
+class AnalyticsEngine:
+    def __init__(self, db=None, refresh_seconds: float = ANALYTICS_REFRESH_SECONDS):
+        self._db = db
+        self.refresh_seconds = refresh_seconds
+        self.cube: Optional[StudentCube] = None
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"refreshes": 0, "refresh_errors": 0, "queries": 0, "contexts": 0, "total_us": 0.0}
+        self._stop = threading.Event()
+        self._first_build = threading.Event()  # set once the first build has been attempted
+        # The first build runs here too, so creating the engine inside a request never waits on the aggregation
+        threading.Thread(target=self._run, name="analytics-refresh", daemon=True).start()
+
+    @property
+    def db(self):
+        if self._db is None:
+            from .db_engine import db_engine
+            self._db = db_engine
+        return self._db
+
+    def _run(self):
+        try:
+            self.refresh()
+        finally:
+            self._first_build.set()
+        while self.refresh_seconds > 0 and not self._stop.wait(self.refresh_seconds):
+            self.refresh()
+
+    def warm_up(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the first cube build (startup warm-up step); True if a cube is available"""
+        self._first_build.wait(timeout)
+        return self.cube is not None
+
+    def refresh(self) -> Optional[Dict]:
+        """Rebuild the cube with one $facet aggregation and swap it in; keeps the old cube on failure"""
+        if not self.db.connected or self.db.student_coll is None:
+            return None
+        with self._refresh_lock:
+            started = time.perf_counter()
+            try:
+                result = next(self.db.student_coll.aggregate(cube_pipeline(), allowDiskUse=True), {})
+                cube = StudentCube.from_facet(result, build_ms=(time.perf_counter() - started) * 1000)
+            except Exception as e:
+                with self._stats_lock:
+                    self._stats["refresh_errors"] += 1
+                print(f"[Analytics] Cube refresh failed: {e}")
+                return None
+            self.cube = cube
+            with self._stats_lock:
+                self._stats["refreshes"] += 1
+            print(f"[Analytics] Cube rebuilt: {cube.total} students, {len(cube.counts)} cells "
+                  f"in {cube.build_ms:.0f} ms")
+            return self.describe()
+
+    def count(self, filters: Optional[Dict] = None, group_by: Optional[Sequence[str]] = None,
+              top: Optional[int] = None) -> Optional[Dict]:
+        cube = self.cube
+        if cube is None:
+            return None
+        started = time.perf_counter()
+        result = cube.count(filters, group_by, top)
+        with self._stats_lock:
+            self._stats["queries"] += 1
+            self._stats["total_us"] += (time.perf_counter() - started) * 1e6
+        return result
+
+    def parse_question(self, question: str) -> Optional[Dict]:
+        """Filters and group-by dimensions named in a count question, or None if it is not one"""
+        cube = self.cube
+        text = " ".join(re.findall(r"[a-z0-9\-]+", (question or "").lower()))
+        if cube is None or not COUNT_QUESTION.search(text):
+            return None
+        filters: Dict[str, List[str]] = {}
+        padded = f" {text} "
+        for word, candidates in GENDER_WORDS.items():
+            if f" {word} " in padded:
+                # Every spelling the data uses ("Female" and "F" can both be present)
+                for code in candidates:
+                    if cube.category_codes("gender", code) and code not in filters.get("gender", []):
+                        filters.setdefault("gender", []).append(code)
+        asked_campus = _campus(text)
+        nationality_words = UNIVERSITY_NAME.sub(" ", text).split()
+        for dim in ("nationality", "programme", "intake", "campus", "profile_status", "profile_type"):
+            for label in cube.categories[dim]:
+                if label == UNKNOWN:
+                    continue
+                phrase = " ".join(re.findall(r"[a-z0-9\-]+", label.lower()))
+                if dim == "programme":  # "Bachelor of Computer Science (Hons)" is asked about as "computer science"
+                    phrase = PROGRAMME_PREFIX.sub("", phrase).replace(" hons", "").strip()
+                if dim == "campus" and _campus(label):  # "KL", "Kuala Lumpur" and "UCSI KL" are one campus
+                    matched = _campus(label) == asked_campus
+                elif dim == "nationality":  # asked as "from Indonesia" about "Indonesian" students
+                    matched = bool(phrase) and all(any(_same_nationality(part, word) for word in nationality_words)
+                                                   for part in phrase.split())
+                else:
+                    matched = len(phrase) >= 3 and f" {phrase} " in padded
+                if matched:
+                    filters.setdefault(dim, []).append(label)
+        group_by = []
+        for match in GROUP_BY.finditer(text):
+            for word in match.groups():
+                dim = DIMENSION_WORDS.get(word or "")
+                if dim and dim not in group_by and dim not in filters:
+                    group_by.append(dim)
+        return {"filters": filters, "group_by": group_by}
+
+    def context_for(self, question: str) -> str:
+        """
+        Count answer for a statistics question as context text. "" while the cube is being built,
+        or when the question names nothing the cube knows ("students from Narnia"), so the caller
+        falls back to the summary stats instead of reporting the whole collection as the answer.
+        """
+        parsed = self.parse_question(question)
+        if parsed is None or not (parsed["filters"] or parsed["group_by"]):
+            return ""
+        cube = self.cube
+        result = self.count(parsed["filters"], parsed["group_by"], top=ANALYTICS_MAX_GROUPS)
+        if result is None:
+            return ""
+        as_of = datetime.fromtimestamp(cube.built_at).strftime("%Y-%m-%d %H:%M")
+        lines = [f"Student statistics (snapshot {as_of}, {cube.total} students in total):"]
+        if parsed["filters"]:
+            described = "; ".join(f"{dim}={', '.join(values)}" for dim, values in parsed["filters"].items())
+            lines.append(f"- Students matching {described}: {result['total']}")
+        if parsed["group_by"]:
+            shown = ", ".join(f"{' / '.join(group['group'].values())}: {group['count']}" for group in result["groups"])
+            hidden = result["group_count"] - len(result["groups"])
+            more = f" (+{hidden} smaller groups)" if hidden else ""
+            lines.append(f"- By {' and '.join(parsed['group_by'])}: {shown}{more}")
+        with self._stats_lock:
+            self._stats["contexts"] += 1
+        return "\n".join(lines)
+
+    def describe(self) -> Dict:
+        cube = self.cube
+        if cube is None:
+            return {"ready": False}
+        return {
+            "ready": True,
+            "students": cube.total,
+            "cells": int(len(cube.counts)),
+            "categories": {dim: len(values) for dim, values in cube.categories.items()},
+            "built_at": datetime.fromtimestamp(cube.built_at).isoformat(timespec="seconds"),
+            "build_ms": round(cube.build_ms, 1),
+            "bytes": int(sum(column.nbytes for column in cube.columns) + cube.counts.nbytes
+                         + sum(rows.nbytes for postings in cube.postings for rows in postings)),
+        }
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_us = stats.pop("total_us")
+        stats["avg_query_us"] = round(total_us / stats["queries"], 1) if stats["queries"] else 0.0
+        stats["refresh_seconds"] = self.refresh_seconds
+        stats.update(self.describe())
+        return stats
+
+
+# Singleton (the first cube is built in the background once the engine is created)
+analytics_engine = LazyProxy(AnalyticsEngine, "analytics_engine")
@@ -0,0 +1,378 @@
+"""
+Cache Engine - In-memory response cache for general chat answers
+Keys on the normalized question plus a hash of the recent conversation,
+with optional near-duplicate matching over MiniLM embeddings.
+Also holds the query embedding cache used by RAGEngine and the student
+record cache used by DataEngine.
+"""
+import os
+import re
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.singleflight import SingleFlight
+
+# Configuration (override via .env)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # seconds
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.93"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # entries
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "32"))
+STUDENT_CACHE_SIZE = int(os.getenv("STUDENT_CACHE_SIZE", "2048"))          # entries
+STUDENT_CACHE_MAX_MB = float(os.getenv("STUDENT_CACHE_MAX_MB", "16"))
+STUDENT_CACHE_TTL = float(os.getenv("STUDENT_CACHE_TTL", "300"))            # seconds, found records
+STUDENT_CACHE_NEGATIVE_TTL = float(os.getenv("STUDENT_CACHE_NEGATIVE_TTL", "30"))  # seconds, unknown numbers
+
+# Same window AIEngine puts into the prompt
+CONTEXT_WINDOW = 6
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("IELTS 5.5" keeps its dot)."""
+    text = str(text or "").lower()
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)
+    text = re.sub(r"[^\w\s.]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def hash_context(conversation_history: Optional[List[Dict]] = None) -> str:
+    """Stable hash of the conversation turns the LLM would actually see."""
+    recent = (conversation_history or [])[-CONTEXT_WINDOW:]
+    turns = [[item.get("role", ""), item.get("content", "")] for item in recent]
+    return hashlib.sha1(json.dumps(turns, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def rag_embedder(texts: List[str]):
+    """Reuse the SentenceTransformer already loaded by RAGEngine (through its embedding cache)."""
+    from .rag_engine import rag_engine
+    if not rag_engine.enabled or rag_engine.model is None:
+        return None
+    return rag_engine.embed_queries(texts)
+
+
+class EmbeddingCache:
+    """Bounded LRU of query embeddings keyed on normalized text, limited by entry count and bytes."""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE, max_mb: float = EMBEDDING_CACHE_MAX_MB):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries = OrderedDict()  # normalized text -> float32 vector
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "encode_calls": 0, "encoded_texts": 0}
+
+    @staticmethod
+    def _entry_bytes(key: str, vector: np.ndarray) -> int:
+        return vector.nbytes + len(key.encode("utf-8"))
+
+    def get_many(self, texts: List[str], encoder: Callable) -> np.ndarray:
+        """
+        Embeddings for texts (rows in input order). Misses are de-duplicated and
+        encoded in one batched encoder call; the encoder receives normalized text.
+        """
+        keys = [normalize_question(text) or str(text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+            self._stats["hits"] += sum(1 for key in keys if key in found)
+            self._stats["misses"] += sum(1 for key in keys if key not in found)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            # Encode outside the lock; concurrent misses for the same text may both encode
+            vectors = np.asarray(encoder(missing), dtype="float32").reshape(len(missing), -1)
+            with self._lock:
+                self._stats["encode_calls"] += 1
+                self._stats["encoded_texts"] += len(missing)
+                for key, vector in zip(missing, vectors):
+                    vector = vector.copy()
+                    found[key] = vector
+                    self._store(key, vector)
+
+        return np.stack([found[key] for key in keys]) if keys else np.zeros((0, 0), dtype="float32")
+
+    def _store(self, key: str, vector: np.ndarray):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= self._entry_bytes(key, previous)
+        self._entries[key] = vector
+        self._bytes += self._entry_bytes(key, vector)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            old_key, old_vector = self._entries.popitem(last=False)
+            self._bytes -= self._entry_bytes(old_key, old_vector)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, ttl: int = RESPONSE_CACHE_TTL,
+                 semantic: bool = RESPONSE_CACHE_SEMANTIC, similarity: float = RESPONSE_CACHE_SIMILARITY,
+                 embedder: Optional[Callable] = rag_embedder):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.semantic = semantic
+        self.similarity = similarity
+        self.embedder = embedder
+        self._entries = OrderedDict()  # key -> {"payload", "context", "expires", "vector"}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    @staticmethod
+    def _key(normalized: str, context: str) -> str:
+        return f"{context}:{normalized}"
+
+    def _embed(self, normalized: str):
+        """Unit-length embedding for near-duplicate matching (None if unavailable)."""
+        if not self.semantic or self.embedder is None:
+            return None
+        try:
+            vectors = self.embedder([normalized])
+            if vectors is None:
+                return None
+            vector = np.asarray(vectors, dtype="float32").reshape(-1)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else None
+        except Exception as e:
+            print(f"Response cache embed error: {e}")
+            return None
+
+    def _purge_expired(self, now: float):
+        expired = [k for k, entry in self._entries.items() if entry["expires"] <= now]
+        for k in expired:
+            del self._entries[k]
+        self._stats["expirations"] += len(expired)
+
+    def get(self, question: str, conversation_history: Optional[List[Dict]] = None,
+            scope: str = "") -> Optional[Dict]:
+        """
+        Return a cached payload for this question + context, or None.
+        scope separates answers that depend on who asks (e.g. retrieval filters); "" is shared.
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        context = hash_context(conversation_history) + (f"|{scope}" if scope else "")
+        key = self._key(normalized, context)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires"] > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return dict(entry["payload"])
+            if entry:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+            has_candidates = self.semantic and any(e["context"] == context for e in self._entries.values())
+
+        # Near-duplicate lookup (embedding runs outside the lock)
+        if has_candidates:
+            vector = self._embed(normalized)
+            if vector is not None:
+                with self._lock:
+                    self._purge_expired(now)
+                    keys = [k for k, e in self._entries.items()
+                            if e["context"] == context and e["vector"] is not None]
+                    if keys:
+                        matrix = np.stack([self._entries[k]["vector"] for k in keys])
+                        scores = matrix @ vector
+                        best = int(np.argmax(scores))
+                        if scores[best] >= self.similarity:
+                            self._entries.move_to_end(keys[best])
+                            self._stats["hits"] += 1
+                            self._stats["semantic_hits"] += 1
+                            return dict(self._entries[keys[best]]["payload"])
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, question: str, payload: Dict, conversation_history: Optional[List[Dict]] = None,
+            scope: str = ""):
+        """Store a general answer. Callers must never pass personal or grade answers."""
+        normalized = normalize_question(question)
+        if not normalized or not payload:
+            return
+        context = hash_context(conversation_history) + (f"|{scope}" if scope else "")
+        vector = self._embed(normalized)
+
+        with self._lock:
+            key = self._key(normalized, context)
+            self._entries[key] = {
+                "payload": dict(payload),
+                "context": context,
+                "expires": time.time() + self.ttl,
+                "vector": vector
+            }
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, reason: str = ""):
+        """Drop every entry (e.g. after the knowledge base changes)."""
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+        if reason:
+            print(f"[CACHE] Response cache invalidated: {reason}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_size"] = self.max_size
+        stats["ttl"] = self.ttl
+        stats["semantic"] = self.semantic
+        return stats
+
+
+# Singleton
+response_cache = ResponseCache()
+
+
+class StudentCache:
+    """
+    Read-through cache of student records keyed by normalized student number.
+    Misses are cached too (for a shorter TTL) so unknown numbers hammered at login
+    do not reach the database each time; a loader that raises caches nothing, so only
+    a confirmed miss becomes a negative entry. Concurrent misses on one key share a
+    single load, and a load that overlaps an invalidation is not stored.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries: int = STUDENT_CACHE_SIZE, max_mb: float = STUDENT_CACHE_MAX_MB,
+                 ttl: float = STUDENT_CACHE_TTL, negative_ttl: float = STUDENT_CACHE_NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # key -> (record or _MISSING, expires, bytes)
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "loads": 0, "load_errors": 0,
+                       "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def _record_bytes(key: str, record) -> int:
+        return len(key) + (64 if record is StudentCache._MISSING else len(json.dumps(record, default=str)))
+
+    def get(self, key: str, loader: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        """Cached record for key (a copy), else loader() stored as a hit or a negative entry (loader errors propagate)."""
+        if not key:
+            return loader()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                if entry[0] is self._MISSING:
+                    self._stats["negative_hits"] += 1
+                    return None
+                self._stats["hits"] += 1
+                return copy.deepcopy(entry[0])
+            if entry:
+                self._drop(key)
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        record, _ = self._loads.do(key, lambda: self._load(key, loader, generation))
+        return copy.deepcopy(record)
+
+    def _load(self, key: str, loader: Callable, generation: int):
+        try:
+            record = loader()
+        except Exception:
+            with self._lock:
+                self._stats["load_errors"] += 1
+            raise
+        value = self._MISSING if record is None else record
+        size = self._record_bytes(key, value)
+        expires = time.monotonic() + (self.negative_ttl if record is None else self.ttl)
+        with self._lock:
+            self._stats["loads"] += 1
+            if generation != self._generation or size > self.max_bytes:
+                return record
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                old_key, _ = next(iter(self._entries.items()))
+                self._drop(old_key)
+                self._stats["evictions"] += 1
+        return record
+
+    def _drop(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, key: Optional[str] = None, reason: str = ""):
+        """Forget one student (key) or everyone; loads already in flight are not stored."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            elif key in self._entries:
+                self._drop(key)
+            self._stats["invalidations"] += 1
+        if reason:
+            print(f"[CACHE] Student cache invalidated ({key or 'all'}): {reason}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["negative_entries"] = sum(1 for entry in self._entries.values() if entry[0] is self._MISSING)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["negative_hits"]) / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["max_bytes"] = self.max_bytes
+        stats["ttl"] = self.ttl
+        stats["negative_ttl"] = self.negative_ttl
+        return stats
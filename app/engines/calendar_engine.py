@@ -0,0 +1,533 @@
+"""
+Calendar Engine - structured academic-calendar events and a no-LLM answer path
+The academic calendar PDFs are month grids (four months per page, one row per
+day number). Their cells are parsed into events (name, start/end date, track,
+intake, programme level) so date questions ("when does semester start?",
+"when is the exam week?", "add/drop deadline?") are answered from the index
+with a templated reply instead of two LLM calls over 500-char chunks.
+"""
+import calendar
+import glob
+import json
+import os
+import re
+import threading
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+from app.utils.lazy_utils import LazyProxy
+from .dedup_engine import file_hash
+from .metadata_engine import source_metadata, student_levels
+
+# Configuration (override via .env)
+CALENDAR_FAST_PATH = os.getenv("CALENDAR_FAST_PATH", "true").lower() == "true"
+CALENDAR_SOURCES = os.getenv("CALENDAR_SOURCES", "data/academic_calendar_*.pdf,data/knowledge_base/*calendar*.pdf")
+CALENDAR_INDEX_FILE = os.getenv("CALENDAR_INDEX_FILE", "data/calendar_index.json")
+CALENDAR_MIN_CONFIDENCE = float(os.getenv("CALENDAR_MIN_CONFIDENCE", "1.0"))  # share of the question's words explained
+
+WEEKDAYS = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+MONTHS = {name.upper(): number for number, name in enumerate(calendar.month_name) if name}
+SEMESTER_HEADING = re.compile(r"\b([A-Z]+)\s*-\s*([A-Z]+)\s+(\d{4})\s+SEMESTER")
+TABLE_START = "Week Date Day"
+TABLE_END = "(A)Public Holiday"
+
+TRACKS = {"~S": "short semester", "~L": "long semester"}
+HOLIDAY_CAMPUSES = {"A": "all campuses", "KL": "Kuala Lumpur", "S": "Kuching (Sarawak)",
+                    "NS": "Springhill (Negeri Sembilan)"}
+LEVEL_LABELS = {
+    "foundation": "Foundation programmes",
+    "undergraduate": "General (diploma/degree) programmes",
+    "postgraduate_coursework": "Postgraduate programmes by coursework",
+    "postgraduate_research": "Postgraduate programmes by research",
+}
+
+# Question topics: (topic, question pattern, event-name pattern). Checked against the lowercased question.
+TOPICS = (
+    ("add_drop", r"\badd\s*(/|and|&|-)?\s*drop", r"add/drop"),
+    ("supplementary_exam", r"\bsupp(lementary)?\b", r"supplementary exam|apply for supp"),
+    ("final_exam", r"\b(final\s+)?exam(s|ination|inations)?\b", r"final examination"),
+    ("study_week", r"\b(study|revision)\s+week\b", r"study week"),
+    ("orientation", r"\borientation\b", r"orientation"),
+    ("class_end", r"\b(class(es)?|lectures?|semester|term)\s+(end|ends|finish|finishes|over)\b|\blast day of class",
+     r"class ends"),
+    ("semester_start", r"\b(semester|classes|class|lectures?|term)\b.*\b(start|starts|begin|begins|commence)"
+                       r"|\bcommencement\b|\bstart of (the )?(semester|term|classes)",
+     r"class commencement"),
+    ("withdrawal", r"\bwithdraw(al)?\b", r"course withdrawal"),
+    ("course_selection", r"\bcourse selection\b|\bregist(er|ration)\b|\benrol", r"course selection"),
+    ("deferment", r"\bdefer(ment|ral)?\b", r"deferment"),
+    ("re_evaluation", r"\bre-?evaluat|\bappeal\b|\bremark", r"re-evaluation"),
+    ("course_evaluation", r"\bcourse evaluation\b", r"^course evaluation"),
+    ("exam_barring", r"\bbarr(ed|ing)\b|\bunbarr", r"exam barring|exam unbarring"),
+    ("convocation", r"\bconvocation\b|\bgraduation ceremony\b", r"convocation"),
+    ("holiday", r"\b(public\s+)?holidays?\b|\bday off\b", None),
+)
+# Words a calendar match explains: topic vocabulary, date/schedule words, levels and campuses.
+# Anything else ("results", "hostel", "fees") is something the event index knows nothing about.
+TOPIC_WORDS = {
+    "add", "drop", "supp", "supplementary", "final", "exam", "exams", "examination", "examinations", "study",
+    "revision", "orientation", "class", "classes", "lecture", "lectures", "over", "commence", "commencement",
+    "withdraw", "withdrawal", "course", "courses", "selection", "register", "registration", "enrol", "enroll",
+    "enrolment", "enrollment", "defer", "deferment", "deferral", "re", "evaluation", "evaluate", "reevaluation",
+    "appeal", "remark", "barred", "barring", "unbarring", "unbarred", "convocation", "graduation", "ceremony",
+    "holiday", "holidays", "public", "off",
+}
+MONTH_WORDS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTH_WORDS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+MONTH_WORDS["sept"] = 9
+SCHEDULE_WORDS = {
+    "date", "dates", "day", "days", "week", "weeks", "month", "months", "year", "years", "semester", "semesters",
+    "sem", "term", "terms", "start", "starts", "starting", "begin", "begins", "beginning", "end", "ends", "ending",
+    "finish", "finishes", "deadline", "deadlines", "last", "first", "next", "upcoming", "coming", "schedule",
+    "scheduled", "calendar", "academic", "period", "time", "held", "happen", "happens", "long", "open", "opens",
+    "close", "closes", "due", "until", "till", "before", "after", "student", "students", "intake", "intakes",
+    "short", "track", "this", "current",
+} | set(MONTH_WORDS)
+SCOPE_WORDS = {
+    "foundation", "diploma", "degree", "undergraduate", "undergrad", "bachelor", "postgraduate", "postgrad",
+    "master", "masters", "phd", "research", "coursework", "programme", "programmes", "program", "programs",
+    "general", "campus", "campuses", "kl", "kuala", "lumpur", "kuching", "sarawak", "springhill", "negeri", "sembilan",
+}
+FUNCTION_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "will", "would", "can", "could", "should", "shall",
+    "may", "might", "do", "does", "did", "i", "my", "me", "we", "our", "us", "you", "your", "it", "its", "that",
+    "these", "those", "there", "for", "of", "in", "on", "at", "to", "from", "by", "with", "and", "or", "about",
+    "when", "what", "which", "who", "how", "please", "tell", "know", "any", "s", "ucsi", "university", "hi", "hello",
+}
+HOLIDAY_ALIASES = {"cny": "chinese new year", "merdeka": "national day", "diwali": "deepavali", "vesak": "wesak",
+                   "xmas": "christmas", "aidilfitri": "hari raya aidilfitri", "aidiladha": "hari raya aidiladha"}
+MONTH_WORD = re.compile(r"\b(" + "|".join(sorted(MONTH_WORDS, key=len, reverse=True)) + r")\b")
+# "may" is usually the verb; it names the month next to a year, intake or semester word
+MAY_MONTH = re.compile(r"\b(in|the|of|for|from|during|since)\s+may\b|\bmay\s+(20\d{2}|semester|sem|term|intake)\b")
+INTAKE_CODE = re.compile(r"\b(20\d{2})\s*[-/]\s*(0?[1-9]|1[0-2])\b")
+YEAR = re.compile(r"\b(20\d{2})\b")
+COHORT_WORDS = re.compile(r"\b(semesters?|sem|terms?|intakes?|cohort)\b")
+DATE_QUESTION = re.compile(r"\b(when|what date|which date|what day|date|dates|deadline|last day|schedule|start|"
+                           r"starts|begin|begins|end|ends|how long)\b")
+
+
+def _page_months(first: int, year: int, count: int = 4) -> List[Tuple[int, int]]:
+    """(year, month) of `count` consecutive months starting at first/year"""
+    return [(year + (first + i - 1) // 12, (first + i - 1) % 12 + 1) for i in range(count)]
+
+
+def _semester_months(semester: str) -> List[Tuple[int, int]]:
+    """(year, month) covered by a semester label such as "September - December 2026" """
+    match = re.match(r"([A-Za-z]+) - ([A-Za-z]+) (\d{4})", semester)
+    if not match or match.group(1).upper() not in MONTHS:
+        return []
+    return _page_months(MONTHS[match.group(1).upper()], int(match.group(3)))
+
+
+def parse_period(text: str) -> Optional[Dict]:
+    """
+    Months, years and intake codes named in a lowercased question, or None. cohort is True when
+    the question names a semester or intake ("the September semester", "2026-09 intake"), which
+    selects that cohort's events rather than events dated in that month.
+    """
+    months, years = set(), set()
+    for year, month in INTAKE_CODE.findall(text):
+        months.add(int(month))
+        years.add(int(year))
+    rest = INTAKE_CODE.sub(" ", text)
+    years.update(int(year) for year in YEAR.findall(rest))
+    months.update(MONTH_WORDS[word] for word in MONTH_WORD.findall(rest) if word != "may")
+    if MAY_MONTH.search(rest):
+        months.add(5)
+    if not months and not years:
+        return None
+    return {"months": months, "years": years, "cohort": bool(COHORT_WORDS.search(text))}
+
+
+def _in_period(period: Dict, year: int, month: int) -> bool:
+    return (not period["months"] or month in period["months"]) and (not period["years"] or year in period["years"])
+
+
+def event_in_period(event: Dict, period: Dict) -> bool:
+    """
+    Academic events belong to the asked period when their intake is that month/year, or when
+    they have no intake and their calendar page covers it. Holidays, and academic events when
+    no semester/intake is named ("exams in september"), also match by their own dates.
+    """
+    if event["kind"] == "academic":
+        if event["intake"]:
+            year, month = (int(part) for part in event["intake"].split("-"))
+            if _in_period(period, year, month):
+                return True
+        elif any(_in_period(period, year, month) for year, month in _semester_months(event["semester"])):
+            return True
+        if period["cohort"]:
+            return False
+    elif period["cohort"] and any(_in_period(period, year, month)
+                                  for year, month in _semester_months(event["semester"])):
+        return True
+    start, end = date.fromisoformat(event["start"]), date.fromisoformat(event["end"])
+    months = _page_months(start.month, start.year, (end.year - start.year) * 12 + end.month - start.month + 1)
+    return any(_in_period(period, year, month) for year, month in months)
+
+
+def _cell_markers(body: str, months: List[Tuple[int, int]]):
+    """
+    Yield (date, start, end) of each day cell in page order. Rows list day d of every month
+    that has one, so the next cell is always known; it is located by its day number + weekday.
+    """
+    pos = 0
+    for day in range(1, 32):
+        for year, month in months:
+            if day > calendar.monthrange(year, month)[1]:
+                continue
+            current = date(year, month, day)
+            weekday = WEEKDAYS[current.weekday()]
+            match = re.compile(rf"(?<!\d){day}\s?{weekday}[a-z]?(?![a-z])").search(body, pos)
+            if match is None:
+                continue
+            yield current, match.start(), match.end()
+            pos = match.end()
+
+
+def parse_calendar_page(text: str) -> List[Tuple[date, str, str]]:
+    """(date, cell text, semester label) for every non-empty day cell on one calendar page"""
+    heading = SEMESTER_HEADING.search(text)
+    if not heading or TABLE_START not in text or heading.group(1) not in MONTHS:
+        return []
+    first, year = MONTHS[heading.group(1)], int(heading.group(3))
+    months = _page_months(first, year)
+    semester = f"{heading.group(1).title()} - {heading.group(2).title()} {year}"
+
+    body = text[text.index(TABLE_START) + len(TABLE_START):]
+    body = body[:body.index(TABLE_END)] if TABLE_END in body else body
+    body = body.replace("Week Date Day", " ")
+    body = re.sub(r"(\d{4})-\s*\n\s*(\d{2})", r"\1-\2 ", body)  # intake codes wrapped across lines: 2026-\n01
+
+    cells = []
+    markers = list(_cell_markers(body, months))
+    for i, (current, _, end) in enumerate(markers):
+        cell = body[end:markers[i + 1][1] if i + 1 < len(markers) else len(body)]
+        cell = re.sub(r"\s+", " ", cell).strip()
+        cell = re.sub(r"(\s+\d{1,2})+$", "", cell).strip()  # week numbers of the next column
+        if cell:
+            cells.append((current, cell, semester))
+    return cells
+
+
+def _split_cell(cell: str) -> List[str]:
+    """
+    One cell can hold several events separated by '/'. 'Add / Drop' is one name and slashes
+    inside parentheses ("(Tentative / Subject to Changes)") do not split.
+    """
+    cell = re.sub(r"\bAdd\s*/\s*Drop\b", "Add/Drop", cell, flags=re.IGNORECASE)
+    parts, current, depth = [], "", 0
+    for i, char in enumerate(cell):
+        depth += (char == "(") - (char == ")")
+        spaced = cell[i - 1:i] == " " or cell[i + 1:i + 2] == " "
+        if char == "/" and depth == 0 and spaced:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return [part.strip(" -") for part in parts if part.strip(" -")]
+
+
+def parse_event(text: str) -> Dict:
+    """Name, track, intake and holiday campuses of one event text"""
+    tracks = re.findall(r"\((~[SL])\)", text)
+    holiday = re.findall(r"\((A|KL|S|NS)\)", text)
+    intake = re.search(r"\((\d{4}-\d{2})\)|\b(\d{4}-\d{2})\b", text)
+    name = re.sub(r"\((~[SL]|A|KL|S|NS)\)|\(\d{4}-\d{2}\)|\b\d{4}-\d{2}\b", " ", text)
+    name = re.sub(r"\s+", " ", name).strip(" -")
+    return {
+        "name": name,
+        "track": TRACKS.get(tracks[-1]) if tracks else None,
+        "intake": (intake.group(1) or intake.group(2)) if intake else None,
+        "kind": "holiday" if holiday else "academic",
+        "campuses": [HOLIDAY_CAMPUSES[code] for code in dict.fromkeys(holiday)],
+    }
+
+
+def _pair_ranges(events: List[Dict]) -> List[Dict]:
+    """
+    Merge 'X Begins' / 'X Ends' (same track) into one event spanning both dates, and a holiday
+    listed on consecutive days into one range
+    """
+    merged, open_ranges, last_holiday = [], {}, {}
+    for event in sorted(events, key=lambda e: e["start"]):
+        if event["kind"] == "holiday":
+            key = (event["name"].lower(), tuple(event["campuses"]))
+            previous = last_holiday.get(key)
+            if previous and (date.fromisoformat(event["start"]) - date.fromisoformat(previous["end"])).days == 1:
+                previous["end"] = event["end"]
+            else:
+                last_holiday[key] = event
+                merged.append(event)
+            continue
+        match = re.match(r"(.*?)\s+(Begins|Ends)$", event["name"])
+        if not match:
+            merged.append(event)
+            continue
+        key = (match.group(1).lower(), event["track"])
+        if match.group(2) == "Begins":
+            open_ranges[key] = event
+            merged.append(event)
+        elif key in open_ranges:
+            begun = open_ranges.pop(key)
+            begun.update(name=match.group(1), end=event["end"], intake=begun["intake"] or event["intake"])
+        else:
+            merged.append(event)  # ends a range begun on an earlier calendar
+    return merged
+
+
+def parse_calendar(path: str) -> List[Dict]:
+    """Every event of one academic-calendar PDF"""
+    if PyPDF2 is None:
+        raise RuntimeError("PyPDF2 is not installed")
+    source = os.path.basename(path)
+    level = source_metadata(source)["level"]
+    events = []
+    with open(path, "rb") as f:
+        for page in PyPDF2.PdfReader(f).pages:
+            for current, cell, semester in parse_calendar_page(page.extract_text() or ""):
+                # "Class Commencement / Add/Drop Course(s) Begins (~S)": one track marker covers the cell
+                cell_tracks = set(re.findall(r"\((~[SL])\)", cell))
+                for part in _split_cell(cell):
+                    event = parse_event(part)
+                    if not re.search(r"[A-Za-z]", event["name"]):
+                        continue  # a stray week number
+                    if event["track"] is None and event["kind"] == "academic" and len(cell_tracks) == 1:
+                        event["track"] = TRACKS[next(iter(cell_tracks))]
+                    event.update(start=current.isoformat(), end=current.isoformat(), semester=semester,
+                                 level=level, source=source)
+                    events.append(event)
+    # Holidays repeat across the level calendars but stay per source; ranges pair within a source
+    return _pair_ranges(events)
+
+
+def _format_range(event: Dict) -> str:
+    start, end = date.fromisoformat(event["start"]), date.fromisoformat(event["end"])
+    if start == end:
+        return start.strftime("%a %d %b %Y").replace(" 0", " ")
+    return f"{start.strftime('%a %d %b').replace(' 0', ' ')} - {end.strftime('%a %d %b %Y').replace(' 0', ' ')}"
+
+
+class CalendarEngine:
+    def __init__(self, sources: str = CALENDAR_SOURCES, index_file: str = CALENDAR_INDEX_FILE):
+        self.sources = [pattern.strip() for pattern in sources.split(",") if pattern.strip()]
+        self.index_file = index_file
+        self.events: List[Dict] = []
+        self.files: Dict[str, Dict] = {}  # path -> {"sha256", "events"}
+        self._lock = threading.Lock()
+        self._stats = {"checked": 0, "served": 0, "phrased": 0, "no_match": 0, "low_confidence": 0, "total_ms": 0.0}
+        self._load()
+        self.refresh()
+
+    def _load(self):
+        """Parsed events cached by file hash, so startup does not re-read unchanged PDFs"""
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+        except Exception as e:
+            print(f"[Calendar] Could not read {self.index_file}: {e}")
+            self.files = {}
+
+    def _paths(self) -> List[str]:
+        paths = []
+        for pattern in self.sources:
+            paths.extend(path for path in glob.glob(pattern) if path.lower().endswith(".pdf") and os.path.isfile(path))
+        return sorted(set(paths))
+
+    def refresh(self) -> Dict:
+        """Re-parse calendar PDFs that are new or changed, drop ones that are gone; returns counts"""
+        with self._lock:
+            files, parsed = {}, 0
+            for path in self._paths():
+                digest = file_hash(path)
+                cached = self.files.get(path)
+                if cached and cached["sha256"] == digest:
+                    files[path] = cached
+                    continue
+                try:
+                    files[path] = {"sha256": digest, "events": parse_calendar(path)}
+                    parsed += 1
+                except Exception as e:
+                    print(f"[Calendar] Failed to parse {path}: {e}")
+            changed = parsed or set(files) != set(self.files)
+            self.files = files
+            self.events = sorted((event for entry in files.values() for event in entry["events"]),
+                                 key=lambda e: (e["start"], e["source"]))
+            if changed:
+                self._save()
+                print(f"[Calendar] {len(self.events)} events from {len(files)} calendars ({parsed} parsed)")
+            return {"calendars": len(files), "events": len(self.events), "parsed": parsed}
+
+    def _save(self):
+        try:
+            with open(self.index_file + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"files": self.files}, f)
+            os.replace(self.index_file + ".tmp", self.index_file)
+        except Exception as e:
+            print(f"[Calendar] Could not write {self.index_file}: {e}")
+
+    def find(self, topic: str, levels: Optional[List[str]] = None, today: Optional[date] = None,
+             holiday_names: Optional[List[str]] = None, period: Optional[Dict] = None) -> List[Dict]:
+        """
+        Events of a topic for the given levels in the next semester that has any (the latest one
+        if all are past), per level. holiday_names restricts holidays to those names (each
+        holiday's upcoming dates, else its last one); without it the next five holidays are listed.
+        period (parse_period) restricts events to the asked semester/intake/month and lists all
+        of its events, upcoming ones if any; nothing is returned when the calendars lack them.
+        """
+        today = (today or date.today()).isoformat()
+        name_pattern = dict((t, n) for t, _, n in TOPICS)[topic]
+        found = []
+        events = [e for e in self.events if not levels or e["level"] in levels]
+        for level in dict.fromkeys(e["level"] for e in events):
+            if topic == "holiday":
+                matches = [e for e in events if e["level"] == level and e["kind"] == "holiday"
+                           and (not holiday_names or e["name"] in holiday_names)]
+            else:
+                matches = [e for e in events if e["level"] == level and e["kind"] == "academic"
+                           and re.search(name_pattern, e["name"], re.IGNORECASE)]
+            if period:
+                matches = [e for e in matches if event_in_period(e, period)]
+            if not matches:
+                continue
+            upcoming = [e for e in matches if e["end"] >= today]
+            if topic == "holiday" and holiday_names:
+                for name in holiday_names:  # each named holiday's next date, else its last one
+                    dates = [e for e in matches if e["name"] == name]
+                    found.extend([e for e in dates if e["end"] >= today] or dates[-1:])
+                continue
+            if period:
+                found.extend(upcoming or matches)
+                continue
+            if topic == "holiday":
+                found.extend(upcoming[:5])
+                continue
+            pick = upcoming[0] if upcoming else matches[-1]
+            found.extend(e for e in matches if e["semester"] == pick["semester"] and
+                         (e["end"] >= today or not upcoming))
+        # Holidays are shared by every calendar: keep one copy per date and name
+        if topic == "holiday":
+            found = list({(e["start"], e["name"]): e for e in found}.values())
+        return found
+
+    def _holiday_names(self, words: List[str]) -> Tuple[List[str], set]:
+        """
+        Holidays named in the question and the words that named them. A holiday matches when
+        it contains every question word that belongs to some holiday name ("hari raya" ->
+        both Hari Raya holidays, not Hari Gawai; "chinese new year" -> not New Year's Day).
+        """
+        expanded = []
+        for word in words:
+            expanded.extend(HOLIDAY_ALIASES.get(word, word).split())
+        names = {e["name"] for e in self.events if e["kind"] == "holiday"}
+        name_words = {name: set(re.findall(r"[a-z]+", name.lower())) - FUNCTION_WORDS for name in names}
+        vocabulary = set().union(*name_words.values()) if name_words else set()
+        asked = {word for word in expanded if word in vocabulary}
+        if not asked:
+            return [], set()
+        matched = sorted(name for name, tokens in name_words.items() if asked <= tokens)
+        used = {word for word in words if set(HOLIDAY_ALIASES.get(word, word).split()) & asked}
+        return matched, used if matched else set()
+
+    def match(self, question: str, levels: Optional[List[str]] = None,
+              today: Optional[date] = None) -> Optional[Dict]:
+        """
+        Answer a date question from the event index.
+        Returns None if it is not a calendar question, else {"topics", "events", "confidence",
+        "confident", "text"}. Months, years and intake codes in the question restrict the events
+        to that period (none there -> None, so the LLM answers). confidence is the share of the question's words the match explains;
+        below CALENDAR_MIN_CONFIDENCE ("when are exam results out?", "hostel registration date")
+        the turn is not answered from the calendar at all. Confident (single-topic) answers are
+        sent as-is; otherwise the text is context for the LLM to phrase.
+        """
+        started = time.perf_counter()
+        text = question.lower()
+        topics = [topic for topic, pattern, _ in TOPICS if re.search(pattern, text)]
+        if "add_drop" in topics and "semester_start" in topics:
+            topics.remove("semester_start")  # "when does add/drop start"
+        is_date_question = DATE_QUESTION.search(text) or "week" in text
+        result = None
+        low_confidence = False
+        if is_date_question and self.events:
+            words = [word for word in re.findall(r"[a-z]+", text) if word not in FUNCTION_WORDS]
+            unexplained = [word for word in words if word not in TOPIC_WORDS | SCHEDULE_WORDS | SCOPE_WORDS]
+            holiday_names, named = self._holiday_names(unexplained)
+            if holiday_names and "holiday" not in topics:
+                topics.append("holiday")  # "when is deepavali?"
+            unexplained = [word for word in unexplained if word not in named]
+            confidence = 1 - len(unexplained) / len(words) if words else 1.0
+            if topics and confidence < CALENDAR_MIN_CONFIDENCE:
+                low_confidence = True
+            elif topics:
+                levels = student_levels(text) or levels
+                period = parse_period(text)
+                events = [e for topic in topics
+                          for e in self.find(topic, levels, today, holiday_names or None, period)]
+                if events:
+                    result = {"topics": topics, "events": events, "confidence": round(confidence, 3),
+                              "confident": len(topics) == 1, "text": self.render(events, topics, levels)}
+        with self._lock:
+            self._stats["checked"] += 1
+            self._stats["total_ms"] += (time.perf_counter() - started) * 1000
+            if low_confidence:
+                self._stats["low_confidence"] += 1
+            elif result is None:
+                self._stats["no_match"] += 1
+        return result
+
+    def record(self, served: bool):
+        """Count a matched turn as answered from the template (served) or phrased by the LLM"""
+        with self._lock:
+            self._stats["served" if served else "phrased"] += 1
+
+    @staticmethod
+    def render(events: List[Dict], topics: List[str], levels: Optional[List[str]]) -> str:
+        # One block per level and calendar page (a period question can span pages)
+        by_level: Dict[tuple, List[Dict]] = {}
+        for event in sorted(events, key=lambda e: e["start"]):
+            by_level.setdefault((event["level"] or "", event["semester"]), []).append(event)
+        # Levels whose dates are identical share one heading
+        groups: Dict[tuple, List[tuple]] = {}
+        for level_key, items in by_level.items():
+            key = tuple((e["name"], e["start"], e["end"], e["track"], e["intake"], e["semester"]) for e in items)
+            groups.setdefault(key, []).append(level_key)
+        lines = ["From the 2026 academic calendar:"]
+        for group_levels in groups.values():
+            items = by_level[group_levels[0]]
+            if topics != ["holiday"]:
+                labels = " / ".join(LEVEL_LABELS.get(level, "All programmes") for level, _ in group_levels)
+                lines.append(f"{labels} ({items[0]['semester']} semester):")
+            for event in items:
+                details = [detail for detail in (event["track"],
+                                                 f"{event['intake']} intake" if event["intake"] else None,
+                                                 ", ".join(event["campuses"]) if event["campuses"] else None)
+                           if detail]
+                suffix = f" ({'; '.join(details)})" if details else ""
+                lines.append(f"• {event['name']}{suffix}: {_format_range(event)}")
+        if not levels and topics != ["holiday"] and len({tuple(level for level, _ in group)
+                                                          for group in groups.values()}) > 1:
+            lines.append("Log in to see only your programme's dates.")
+        return "\n".join(lines)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        checked = stats.pop("checked")
+        total_ms = stats.pop("total_ms")
+        stats.update(calendars=len(self.files), events=len(self.events), turns_checked=checked,
+                     served_share=round(stats["served"] / checked, 3) if checked else 0.0,
+                     avg_match_ms=round(total_ms / checked, 3) if checked else 0.0)
+        return stats
+
+
+# Singleton (parses or loads the calendars on first use)
+calendar_engine = LazyProxy(CalendarEngine, "calendar_engine")
@@ -0,0 +1,383 @@
+"""
+Catalog Engine - in-memory faceted programme catalog
+UCSI_Master_All_Campuses_Programmes.csv is loaded into a columnar table (NumPy
+arrays per column) with posting lists on faculty, level and campus and sorted
+columns for fee / IELTS range queries. Programme questions ("engineering degrees
+in KL under 30k for internationals") are parsed into facets and ranges and
+answered as a structured context block, instead of regex scans over the student
+collection or raw CSV chunks in FAISS. The CSV is reloaded when it changes.
+"""
+import csv
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.lazy_utils import LazyProxy
+from .dedup_engine import file_hash
+from .metadata_engine import normalize_campus
+
+# Configuration (override via .env)
+CATALOG_CSV = os.getenv("CATALOG_CSV", "data/UCSI_Master_All_Campuses_Programmes.csv")
+CATALOG_CONTEXT = os.getenv("CATALOG_CONTEXT", "true").lower() == "true"
+CATALOG_MAX_ROWS = int(os.getenv("CATALOG_MAX_ROWS", "10"))                  # programmes listed per answer
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "5"))    # seconds between CSV change checks
+
+# CSV header -> column name
+COLUMNS = {
+    "faculty": "faculty",
+    "programme": "programme",
+    "level": "level",
+    "campus": "campus",
+    "academic_requirement": "academic_requirement",
+    "ielts": "ielts",
+    "muet": "muet",
+    "annual_fee_international_myr": "fee_international",
+    "annual_fee_local_myr": "fee_local",
+    "subject_requirements": "subject_requirements",
+    "official_programme_url": "url",
+}
+FACETS = ("faculty", "level", "campus")
+RANGES = ("ielts", "fee_international", "fee_local")
+
+PROGRAMME_QUESTION = re.compile(
+    r"\b(programmes?|programs?|courses?|degrees?|bachelors?|diplomas?|masters?|mba|phd|fees?|cost|costs|tuition|"
+    r"price|cheap\w*|afford\w*|ielts|entry|requirements?|offer\w*|study|faculty|faculties)\b")
+LEVEL_WORDS = (
+    (r"\bfoundation\b", "Foundation"),
+    (r"\b(degrees?|bachelors?|undergrad\w*|diplomas?)\b", "Undergraduate"),
+    (r"\b(masters?|mba|phd|postgrad\w*|doctorate)\b", "Postgraduate"),
+)
+CAMPUS_ALIASES = (
+    (r"\bkl\b", "Kuala Lumpur"),
+    (r"\bsarawak\b", "Kuching"),
+    (r"\b(negeri sembilan|seremban|port dickson)\b", "Springhill (Negeri Sembilan)"),
+)
+PROGRAMME_ALIASES = {"ai": "artificial intelligence", "cs": "computer science"}
+STOPWORDS = {"and", "in", "of", "the", "for", "pre", "university"}
+
+_NUMBER = r"(\d[\d,]*(?:\.\d+)?\s*k?)\b"
+_CURRENCY = r"(?:rm\s*|myr\s*)?"
+FEE_BETWEEN = re.compile(rf"between\s+{_CURRENCY}{_NUMBER}\s*(?:and|to|-)\s*{_CURRENCY}{_NUMBER}")
+FEE_MAX = re.compile(rf"(?:under|below|less than|cheaper than|at most|max(?:imum)?|up to|within|"
+                     rf"no more than|<=?)\s*{_CURRENCY}{_NUMBER}")
+FEE_MIN = re.compile(rf"(?:over|above|more than|at least|min(?:imum)?|>=?)\s*{_CURRENCY}{_NUMBER}")
+IELTS_SCORE = re.compile(r"ielts\D{0,20}?(\d(?:\.\d)?)\b|(\d(?:\.\d)?)\s*(?:in|for|on)?\s*ielts")
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9.,\s]", " ", (text or "").lower().replace("&", " and "))).strip()
+
+
+def _stem(word: str) -> str:
+    """'sciences' -> 'science', 'degrees' -> 'degree' ('business' stays)"""
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def _words(text: str) -> List[str]:
+    return [_stem(word) for word in re.findall(r"[a-z]+", _normalize(text)) if word not in STOPWORDS]
+
+
+def _parse_amount(value: str) -> Optional[float]:
+    value = value.replace(",", "").replace(" ", "")
+    scale = 1000 if value.endswith("k") else 1
+    try:
+        amount = float(value.rstrip("k")) * scale
+    except ValueError:
+        return None
+    return amount if amount >= 1000 else None  # small numbers are IELTS scores, bands, years of study
+
+
+class CatalogTable:
+    """
+    Immutable columnar snapshot of the CSV. Facet columns are stored as int codes with
+    posting lists (code -> sorted row ids); range columns keep an argsort so a range is
+    two searchsorted calls. Reloads build a new table and swap the reference.
+    """
+
+    def __init__(self, rows: List[Dict[str, str]], sha256: str = "", stat: Tuple = ()):
+        self.sha256 = sha256
+        self.stat = stat
+        self.size = len(rows)
+        self.text = {column: np.array([row.get(column, "") for row in rows], dtype=object)
+                     for column in COLUMNS.values()}
+        self.categories: Dict[str, List[str]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.postings: Dict[str, Dict[int, np.ndarray]] = {}
+        for facet in FACETS:
+            values = self.text[facet]
+            self.categories[facet] = sorted(set(values))
+            lookup = {value: code for code, value in enumerate(self.categories[facet])}
+            self.codes[facet] = np.array([lookup[value] for value in values], dtype=np.int32)
+            self.postings[facet] = {code: np.flatnonzero(self.codes[facet] == code)
+                                    for code in range(len(self.categories[facet]))}
+        self.numbers: Dict[str, np.ndarray] = {}
+        self.sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for column in RANGES:
+            values = np.array([float(v) if re.fullmatch(r"\d+(\.\d+)?", v.strip()) else np.nan
+                               for v in self.text[column]], dtype=np.float64)
+            self.numbers[column] = values
+            order = np.argsort(values, kind="stable")
+            order = order[~np.isnan(values[order])]  # rows without a value never match a range
+            self.sorted[column] = (order, values[order])
+        self.programme_lower = np.array([_normalize(name) for name in self.text["programme"]], dtype=str)
+        self._build_vocabulary()
+
+    def _build_vocabulary(self):
+        """Question words that select a faculty or programme (words shared by several faculties are too vague)."""
+        self.faculty_words: Dict[str, List[str]] = {}
+        for faculty in self.categories["faculty"]:
+            for word in set(_words(faculty)):
+                self.faculty_words.setdefault(word, []).append(faculty)
+        self.faculty_words = {word: names for word, names in self.faculty_words.items() if len(names) == 1}
+        self.programme_phrases = sorted({str(name) for name in self.programme_lower}, key=len, reverse=True)
+        counts: Dict[str, int] = {}
+        for name in set(self.programme_lower):
+            for word in set(_words(name)):
+                counts[word] = counts.get(word, 0) + 1
+        self.programme_words = {word for word, count in counts.items()
+                                if count <= 2 and word not in self.faculty_words and word != "foundation"}
+
+    @classmethod
+    def from_csv(cls, path: str) -> "CatalogTable":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            header = {name: COLUMNS.get(name.strip().lower()) for name in reader.fieldnames or []}
+            rows = [{header[key]: (value or "").strip() for key, value in row.items() if header.get(key)}
+                    for row in reader]
+        stat = os.stat(path)
+        return cls(rows, file_hash(path), (stat.st_mtime_ns, stat.st_size))
+
+    def facet_rows(self, facet: str, values) -> np.ndarray:
+        wanted = {value.lower() for value in ([values] if isinstance(values, str) else values)}
+        codes = [code for code, name in enumerate(self.categories[facet]) if name.lower() in wanted]
+        if not codes:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.postings[facet][code] for code in codes]))
+
+    def range_rows(self, column: str, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        order, values = self.sorted[column]
+        start = np.searchsorted(values, low, "left") if low is not None else 0
+        end = np.searchsorted(values, high, "right") if high is not None else len(values)
+        return np.sort(order[start:end])
+
+    def programme_rows(self, names: List[str]) -> np.ndarray:
+        """Rows whose programme name contains any of the given (normalized) substrings"""
+        mask = np.zeros(self.size, dtype=bool)
+        for name in names:
+            mask |= np.char.find(self.programme_lower, _normalize(name)) >= 0
+        return np.flatnonzero(mask)
+
+    def row(self, i: int) -> Dict:
+        entry = {column: self.text[column][i] for column in COLUMNS.values()}
+        for column in RANGES:
+            entry[column] = None if np.isnan(self.numbers[column][i]) else float(self.numbers[column][i])
+        return entry
+
+
+class CatalogEngine:
+    def __init__(self, csv_path: str = CATALOG_CSV):
+        self.csv_path = csv_path
+        self._table: Optional[CatalogTable] = None
+        self._checked = 0.0
+        self._reload_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"queries": 0, "contexts": 0, "reloads": 0, "total_us": 0.0}
+        self._current()
+
+    def _current(self) -> Optional[CatalogTable]:
+        """The live table, reloaded when the CSV's mtime/size and then its hash change (checked every few seconds)"""
+        now = time.monotonic()
+        if self._table is not None and now - self._checked < CATALOG_CHECK_INTERVAL:
+            return self._table
+        with self._reload_lock:
+            if self._table is not None and now - self._checked < CATALOG_CHECK_INTERVAL:
+                return self._table
+            self._checked = now
+            try:
+                stat = os.stat(self.csv_path)
+            except OSError:
+                return self._table
+            table = self._table
+            if table is not None and table.stat == (stat.st_mtime_ns, stat.st_size):
+                return table
+            try:
+                if table is not None and file_hash(self.csv_path) == table.sha256:
+                    table.stat = (stat.st_mtime_ns, stat.st_size)  # touched, not changed
+                    return table
+                self._table = CatalogTable.from_csv(self.csv_path)
+                with self._stats_lock:
+                    self._stats["reloads"] += 1
+                print(f"[Catalog] Loaded {self._table.size} programmes from {self.csv_path}")
+            except Exception as e:
+                print(f"[Catalog] Could not load {self.csv_path}: {e}")
+            return self._table
+
+    def query(self, faculty=None, level=None, campus=None, programme: Optional[List[str]] = None,
+              ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+              limit: Optional[int] = None) -> List[Dict]:
+        """
+        Programmes matching every given facet (each a value or list of values, case-insensitive),
+        programme-name substrings (any) and ranges {column: (low, high)} (inclusive, None = open).
+        The "fee" range column matches either fee. Results are sorted by the first range column.
+        """
+        table = self._current()
+        if table is None:
+            return []
+        started = time.perf_counter()
+        rows = None
+        selections = []
+        for facet, values in (("faculty", faculty), ("level", level), ("campus", campus)):
+            if values:
+                selections.append(table.facet_rows(facet, values))
+        if programme:
+            selections.append(table.programme_rows(programme))
+        for column, (low, high) in (ranges or {}).items():
+            if column == "fee":
+                selections.append(np.union1d(table.range_rows("fee_international", low, high),
+                                             table.range_rows("fee_local", low, high)))
+            else:
+                selections.append(table.range_rows(column, low, high))
+        for selected in sorted(selections, key=len):  # smallest first keeps intersections cheap
+            rows = selected if rows is None else np.intersect1d(rows, selected, assume_unique=True)
+        rows = np.arange(table.size) if rows is None else rows
+        if ranges:
+            column = next(iter(ranges))
+            column = "fee_international" if column == "fee" else column
+            rows = rows[np.argsort(table.numbers[column][rows], kind="stable")]
+        results = [table.row(i) for i in rows[:limit]]
+        with self._stats_lock:
+            self._stats["queries"] += 1
+            self._stats["total_us"] += (time.perf_counter() - started) * 1e6
+        return results
+
+    def parse_question(self, question: str) -> Optional[Dict]:
+        """Facets/ranges named in a programme question, or None if it is not a programme question"""
+        table = self._current()
+        text = _normalize(question)
+        if table is None or not PROGRAMME_QUESTION.search(text):
+            return None
+        filters: Dict = {}
+        level = [name for pattern, name in LEVEL_WORDS if re.search(pattern, text)]
+        if level:
+            filters["level"] = level
+        campus = normalize_campus(text) or next((name for pattern, name in CAMPUS_ALIASES
+                                                 if re.search(pattern, text)), None)
+        if campus:
+            filters["campus"] = campus
+
+        # Whole programme names first, then faculty words, then distinctive programme words
+        remaining = f" {text} "
+        for alias, name in PROGRAMME_ALIASES.items():
+            remaining = re.sub(rf"\b{alias}\b", name, remaining)
+        programme = []
+        for phrase in table.programme_phrases:
+            if f" {phrase} " in remaining:
+                programme.append(phrase)
+                remaining = remaining.replace(f" {phrase} ", " ")
+        faculty = set()
+        for word in _words(remaining):
+            if word in table.faculty_words:
+                faculty.update(table.faculty_words[word])
+            elif word in table.programme_words:
+                programme.append(word)
+        if faculty:
+            filters["faculty"] = sorted(faculty)
+        if programme:
+            filters["programme"] = programme
+
+        ranges = {}
+        fee_column = "fee"
+        if re.search(r"\b(locals?|malaysians?)\b", text):
+            fee_column = "fee_local"
+        elif re.search(r"\b(international|internationals|foreign|overseas)\b", text):
+            fee_column = "fee_international"
+        between = FEE_BETWEEN.search(text)
+        low = high = None
+        if between:
+            low, high = _parse_amount(between.group(1)), _parse_amount(between.group(2))
+        else:
+            high = next((amount for m in FEE_MAX.finditer(text) if (amount := _parse_amount(m.group(1)))), None)
+            low = next((amount for m in FEE_MIN.finditer(text) if (amount := _parse_amount(m.group(1)))), None)
+        if low is not None or high is not None:
+            ranges[fee_column] = (low, high)
+        elif re.search(r"\b(cheap\w*|lowest|afford\w*)\b", text):
+            ranges[fee_column] = (None, None)  # no bound, just sorted by fee
+        score = IELTS_SCORE.search(text)
+        if score:
+            ranges["ielts"] = (None, float(score.group(1) or score.group(2)))  # programmes this score qualifies for
+        if ranges:
+            filters["ranges"] = ranges
+        return filters
+
+    def context_for(self, question: str) -> str:
+        """Structured context block for a programme question ("" when it is not one or names no facet)"""
+        if not CATALOG_CONTEXT:
+            return ""
+        filters = self.parse_question(question)
+        if not filters:
+            return ""
+        table = self._current()
+        matches = self.query(**filters)
+        shown = matches[:CATALOG_MAX_ROWS]
+        lines = [f"Programme catalog ({len(matches)} of {table.size} programmes match {describe_filters(filters)}):"]
+        if not matches:
+            lines.append("- No programme in the catalog matches these criteria.")
+        for row in shown:
+            lines.append(format_programme(row))
+        if len(matches) > len(shown):
+            lines.append(f"- ... and {len(matches) - len(shown)} more")
+        with self._stats_lock:
+            self._stats["contexts"] += 1
+        return "\n".join(lines)
+
+    def get_stats(self) -> Dict:
+        table = self._current()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_us = stats.pop("total_us")
+        stats.update(programmes=table.size if table else 0,
+                     faculties=len(table.categories["faculty"]) if table else 0,
+                     avg_query_us=round(total_us / stats["queries"], 1) if stats["queries"] else 0.0)
+        return stats
+
+
+def describe_filters(filters: Dict) -> str:
+    parts = []
+    for key in ("faculty", "level", "campus", "programme"):
+        if filters.get(key):
+            values = filters[key]
+            parts.append(f"{key}={', '.join([values] if isinstance(values, str) else values)}")
+    labels = {"fee": "annual fee", "fee_international": "international fee", "fee_local": "local fee",
+              "ielts": "IELTS requirement"}
+    for column, (low, high) in filters.get("ranges", {}).items():
+        unit = "" if column == "ielts" else "RM "
+        if low is not None:
+            parts.append(f"{labels[column]} >= {unit}{low:,.0f}" if unit else f"{labels[column]} >= {low:g}")
+        if high is not None:
+            parts.append(f"{labels[column]} <= {unit}{high:,.0f}" if unit else f"{labels[column]} <= {high:g}")
+    return "; ".join(parts) or "all"
+
+
+def format_programme(row: Dict) -> str:
+    fees = []
+    if row["fee_international"] is not None:
+        fees.append(f"RM {row['fee_international']:,.0f} international")
+    if row["fee_local"] is not None:
+        fees.append(f"RM {row['fee_local']:,.0f} local")
+    line = (f"- {row['programme']} ({row['level']}, {row['faculty']}) at {row['campus']}: "
+            f"entry {row['academic_requirement'] or 'n/a'}; "
+            f"IELTS {'n/a' if row['ielts'] is None else format(row['ielts'], '.1f')} / MUET {row['muet'] or 'n/a'}; "
+            f"annual fee {' / '.join(fees) or 'n/a'}")
+    if row["subject_requirements"]:
+        line += f"; subjects: {row['subject_requirements']}"
+    if row["url"]:
+        line += f"; {row['url']}"
+    return line
+
+
+# Singleton (loads the CSV on first use)
+catalog_engine = LazyProxy(CatalogEngine, "catalog_engine")
@@ -0,0 +1,290 @@
+"""
+Chunk Store - SQLite-backed RAG chunk text and source registry
+Chunk texts are read lazily by vector id instead of unpickling the whole
+corpus into every worker. WAL mode lets several processes read while one writes.
+Each chunk also carries retrieval metadata (doc_type, level, campus, page) used to
+build the candidate set of filtered searches.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+RETIRED_SUFFIX = ".retired-"  # superseded chunks (+ the version that dropped them) kept while older snapshots read them
+
+
+class ChunkStore:
+    METADATA_COLUMNS = (("doc_type", "TEXT"), ("level", "TEXT"), ("campus", "TEXT"), ("page", "INTEGER"))
+    # Filter fields where a NULL value matches any requested value
+    GENERAL_WHEN_NULL = ("level", "campus")
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, source TEXT NOT NULL, text TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            # Dedup: per-chunk content hash + MinHash signature (added to existing stores in place)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+            if "hash" not in columns:
+                self._conn.execute("ALTER TABLE chunks ADD COLUMN hash TEXT")
+            if "minhash" not in columns:
+                self._conn.execute("ALTER TABLE chunks ADD COLUMN minhash BLOB")
+            # Retrieval metadata (NULL level/campus = applies to every level/campus)
+            for column, kind in self.METADATA_COLUMNS:
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} {kind}")
+            # Manifest of ingested files and of chunks skipped as duplicates of another chunk
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files (source TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER,"
+                " chunks INTEGER, duplicates_exact INTEGER, duplicates_near INTEGER, ingested_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS duplicates (source TEXT NOT NULL, canonical_id INTEGER NOT NULL,"
+                " kind TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS duplicates_canonical ON duplicates(canonical_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_hash ON chunks(hash)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __contains__(self, chunk_id: int):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks WHERE id = ?", (int(chunk_id),)).fetchone() is not None
+
+    def add(self, rows: Iterable[Tuple]):
+        """
+        Insert (id, source, text[, hash, minhash bytes, doc_type, level, campus, page]) rows
+        in one transaction.
+        """
+        rows = [tuple(row) + (None,) * (9 - len(row)) for row in rows]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, source, text, hash, minhash, doc_type, level, campus, page)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((int(row[0]),) + row[1:] for row in rows)
+            )
+
+    def get_texts(self, ids: List[int]) -> Dict[int, str]:
+        """Texts for the given ids (missing ids are simply absent)."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, text FROM chunks WHERE id IN ({placeholders})",
+                                      [int(i) for i in ids]).fetchall()
+        return dict(rows)
+
+    def existing(self, ids: List[int]) -> set:
+        """Subset of ids that are stored."""
+        if not ids:
+            return set()
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id FROM chunks WHERE id IN ({placeholders})",
+                                      [int(i) for i in ids]).fetchall()
+        return {row[0] for row in rows}
+
+    def ids_matching(self, filters: Iterable[Tuple[str, Tuple]]) -> List[int]:
+        """
+        Ids whose metadata matches every (field, allowed values) filter. source and doc_type
+        must match exactly; a chunk with no level/campus matches any requested level/campus.
+        """
+        clauses, params = [], []
+        for field, values in filters:
+            if field not in ("source", "doc_type") + self.GENERAL_WHEN_NULL:
+                raise ValueError(f"Unknown filter field: {field}")
+            placeholders = ",".join("?" * len(values))
+            clause = f"{field} IN ({placeholders})"
+            if field in self.GENERAL_WHEN_NULL:
+                clause = f"({field} IS NULL OR {clause})"
+            clauses.append(clause)
+            params.extend(values)
+        where = " AND ".join(clauses) or "1"
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id FROM chunks WHERE {where} ORDER BY id", params).fetchall()
+        return [row[0] for row in rows]
+
+    def get_metadata(self, ids: List[int]) -> Dict[int, Dict]:
+        """id -> {source, doc_type, level, campus, page} for the given ids."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, source, doc_type, level, campus, page FROM chunks WHERE id IN ({placeholders})",
+                [int(i) for i in ids]).fetchall()
+        return {row[0]: dict(zip(("source", "doc_type", "level", "campus", "page"), row[1:])) for row in rows}
+
+    def sources_missing_metadata(self) -> List[str]:
+        """Sources stored before chunk metadata existed."""
+        with self._lock:
+            return [row[0] for row in
+                    self._conn.execute("SELECT DISTINCT source FROM chunks WHERE doc_type IS NULL").fetchall()]
+
+    def set_source_metadata(self, source: str, doc_type: str, level=None, campus=None):
+        """Backfill source-level metadata, keeping any level/campus already set on a chunk."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE chunks SET doc_type = ?, level = COALESCE(level, ?), campus = COALESCE(campus, ?)"
+                " WHERE source = ? AND doc_type IS NULL", (doc_type, level, campus, source))
+
+    def widen_metadata(self, rows: Iterable[Tuple[int, Optional[str], Optional[str]]]):
+        """
+        A chunk also stands in for a duplicate from another (level, campus): clear each field
+        that differs so the chunk matches both audiences' filters. Rows are (id, level, campus).
+        """
+        with self._lock, self._conn:
+            for chunk_id, level, campus in rows:
+                self._conn.execute("UPDATE chunks SET level = NULL WHERE id = ? AND level IS NOT ?",
+                                   (int(chunk_id), level))
+                self._conn.execute("UPDATE chunks SET campus = NULL WHERE id = ? AND campus IS NOT ?",
+                                   (int(chunk_id), campus))
+
+    def ids_for_source(self, source: str) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM chunks WHERE source = ? ORDER BY id", (source,)).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_source(self, source: str, retire_as: Optional[str] = None) -> Tuple[List[int], List[str]]:
+        """
+        Delete a source's chunks, manifest entry and duplicate records. Returns (deleted ids,
+        stale sources). A duplicate record of another source that points at a deleted chunk is
+        moved to a live chunk with the same hash (e.g. the replacement upload's copy); sources
+        left with no copy of some skipped chunk lose that content, so their manifest entries are
+        dropped and the caller must re-ingest them.
+        retire_as: move the chunk rows under this source name instead of deleting them, so
+        searches still on an older snapshot can read them until purge_source(retire_as).
+        """
+        with self._lock, self._conn:
+            ids = [row[0] for row in
+                   self._conn.execute("SELECT id FROM chunks WHERE source = ? ORDER BY id", (source,)).fetchall()]
+            dependents = set()
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                records = self._conn.execute(
+                    "SELECT d.rowid, d.source, c.hash, c.level, c.campus FROM duplicates d"
+                    f" JOIN chunks c ON c.id = d.canonical_id WHERE d.canonical_id IN ({placeholders})"
+                    " AND d.source != ?", batch + [source]).fetchall()
+                for rowid, dependent, digest, level, campus in records:
+                    replacement = digest and self._conn.execute(
+                        "SELECT id FROM chunks WHERE hash = ? AND source != ? AND instr(source, ?) = 0 LIMIT 1",
+                        (digest, source, RETIRED_SUFFIX)).fetchone()
+                    if not replacement:
+                        dependents.add(dependent)
+                        continue
+                    self._conn.execute("UPDATE duplicates SET canonical_id = ? WHERE rowid = ?",
+                                       (replacement[0], rowid))
+                    # The replacement now also stands in for the dependent's chunk: widen it the same way
+                    self._conn.execute("UPDATE chunks SET level = NULL WHERE id = ? AND level IS NOT ?",
+                                       (replacement[0], level))
+                    self._conn.execute("UPDATE chunks SET campus = NULL WHERE id = ? AND campus IS NOT ?",
+                                       (replacement[0], campus))
+            if retire_as is None:
+                self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            else:
+                self._conn.execute("UPDATE chunks SET source = ? WHERE source = ?", (retire_as, source))
+            self._conn.execute("DELETE FROM duplicates WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM files WHERE source = ?", (source,))
+            for dependent in dependents:
+                self._conn.execute("DELETE FROM files WHERE source = ?", (dependent,))
+        return ids, sorted(dependents)
+
+    def purge_source(self, source: str) -> int:
+        """Delete the chunk rows of a retired source; returns how many were deleted"""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,)).rowcount
+
+    def rename_source(self, old: str, new: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE chunks SET source = ? WHERE source = ?", (new, old))
+
+    def record_file(self, source: str, sha256: str, size: int, chunks: int,
+                    duplicates: List[Tuple[int, str]], ingested_at: float):
+        """Write a file's manifest entry and its skipped duplicates as (canonical id, kind) pairs."""
+        exact = sum(1 for _, kind in duplicates if kind == "exact")
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM duplicates WHERE source = ?", (source,))
+            self._conn.executemany("INSERT INTO duplicates (source, canonical_id, kind) VALUES (?, ?, ?)",
+                                   [(source, int(canonical), kind) for canonical, kind in duplicates])
+            self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (source, sha256, size, chunks, exact, len(duplicates) - exact, ingested_at))
+
+    def files(self) -> Dict[str, Dict]:
+        """Manifest: source -> {sha256, size, chunks, duplicates_exact, duplicates_near, ingested_at}."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM files")
+            names = [column[0] for column in cursor.description]
+            return {row[0]: dict(zip(names[1:], row[1:])) for row in cursor.fetchall()}
+
+    def duplicate_count(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT kind, COUNT(*) FROM duplicates GROUP BY kind").fetchall())
+
+    def set_hashes(self, rows: Iterable[Tuple[int, str, bytes]]):
+        """Backfill (id, hash, minhash bytes) for chunks stored before dedup existed."""
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE chunks SET hash = ?, minhash = ? WHERE id = ?",
+                                   ((digest, signature, int(i)) for i, digest, signature in rows))
+
+    def iter_signatures(self, batch_size: int = 1000):
+        """Yield (id, text, hash, minhash bytes) in id order for rebuilding the dedup index."""
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute("SELECT id, text, hash, minhash FROM chunks WHERE id > ? ORDER BY id LIMIT ?",
+                                          (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def sources(self) -> Dict[str, int]:
+        """Source filename -> chunk count."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT source, COUNT(*) FROM chunks GROUP BY source").fetchall())
+
+    def iter_chunks(self, batch_size: int = 1000):
+        """Yield (id, source, text) in id order without loading the whole table."""
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute("SELECT id, source, text FROM chunks WHERE id > ? ORDER BY id LIMIT ?",
+                                          (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def get_meta(self, key: str, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, **values):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   [(key, json.dumps(value)) for key, value in values.items()])
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM duplicates")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
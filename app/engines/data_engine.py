@@ -3,6 +3,8 @@ Data Engine - Student Data Access Layer
 Now uses MongoDB instead of Excel
 """
 from .db_engine import db_engine
+from .cache_engine import StudentCache
+from .schema_engine import schema_engine
 import re
 
 class DataEngine:
@@ -12,18 +14,14 @@ class DataEngine:
         excel_path parameter kept for backward compatibility but not used
         """
         self.db = db_engine
+        self.student_cache = StudentCache()
         print(f"DataEngine initialized with MongoDB (connected: {self.db.connected})")
 
     def get_column_names(self):
-        """Return available field names from MongoDB"""
+        """Return available field names from MongoDB (sampled schema, most filled first)"""
         if not self.db.connected:
             return []
-        
-        # Get a sample document to extract field names
-        students = self.db.get_all_students()
-        if students and len(students) > 0:
-            return list(students[0].keys())
-        return []
+        return [name for name in schema_engine.field_names() if name != "_id"]
 
     def verify_student(self, student_number, name):
         """
@@ -35,8 +33,11 @@ class DataEngine:
         
         print(f"DEBUG: Verifying student_number='{student_number}', name='{name}'")
         
-        # Get student by student number
-        student = self.db.get_student_by_number(student_number)
+        # Get student by student number (a failed lookup is not "not found")
+        try:
+            student = self.get_student_info(student_number, raise_errors=True)
+        except Exception:
+            return (False, None, "Database connection error")
         
         if not student:
             print(f"DEBUG: Student number '{student_number}' not found in DB")
@@ -62,12 +63,31 @@ class DataEngine:
             print(f"DEBUG: Name mismatch. DB='{student_name_str}', Input='{input_name}'")
             return (False, None, "Name does not match student number")
 
-    def get_student_info(self, student_number):
-        """Get a specific student's information by student number"""
+    def get_student_info(self, student_number, raise_errors=False):
+        """
+        Get a specific student's information by student number
+        A database error is never cached; it returns None, or raises with raise_errors=True
+        """
         if not self.db.connected:
             return None
         
-        return self.db.get_student_by_number(student_number)
+        try:
+            return self.student_cache.get(self._cache_key(student_number),
+                                          lambda: self.db.get_student_by_number(student_number, raise_errors=True))
+        except Exception:
+            if raise_errors:
+                raise
+            return None
+
+    @staticmethod
+    def _cache_key(student_number):
+        # Case is kept: until student_number_key is backfilled, lookups are case-sensitive
+        return str(student_number).strip() if student_number is not None else ""
+
+    def invalidate_student(self, student_number=None, reason=""):
+        """Drop one cached student record (or all of them) after it changes in MongoDB"""
+        key = self._cache_key(student_number) if student_number is not None else None
+        self.student_cache.invalidate(key, reason)
 
     def get_summary_stats(self):
         """Get general statistics (non-sensitive)"""
@@ -3,27 +3,59 @@ Database Engine - MongoDB Atlas Connection Manager
 Handles all MongoDB operations for the UCSI Chatbot
 """
 import os
-from typing import Optional, Dict, List, Any
+import threading
+from typing import Optional, Dict, Iterator, List, Any
 from dotenv import load_dotenv
 
+from app.utils.lazy_utils import LazyProxy
+
 # Load environment variables
 load_dotenv()
 
 # Conditional import
 try:
-    from pymongo import MongoClient
+    from pymongo import MongoClient, UpdateOne
     from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
     HAS_PYMONGO = True
 except ImportError:
     HAS_PYMONGO = False
     print("Warning: pymongo not installed. Run: pip install pymongo")
 
+# Student ID lookup (override via .env)
+DB_ENSURE_INDEXES = os.getenv("DB_ENSURE_INDEXES", "true").lower() == "true"
+DB_ID_PROBE_SIZE = int(os.getenv("DB_ID_PROBE_SIZE", "200"))  # documents sampled to find the ID field(s)
+DB_CURSOR_BATCH_SIZE = int(os.getenv("DB_CURSOR_BATCH_SIZE", "1000"))  # documents per getMore in iter_students
+
+# Field names a student number has been stored under, in lookup priority order
+ID_FIELDS = ["STUDENT_NUMBER", "student_number", "StudentNumber", "student_id", "id", "ID"]
+STUDENT_KEY_FIELD = "student_number_key"  # normalized string copy, written by backfill_student_keys()
+
+
+def student_number_key(value) -> Optional[str]:
+    """Canonical string form of a student number: 5001234, 5001234.0, ' 5001234 ' -> '5001234'"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    key = str(value).strip().upper()
+    return key or None
+
+
+def _first_id_value(doc: Dict):
+    """Value of the highest-priority ID field present (what student_number_key is derived from)"""
+    return next((doc[field] for field in ID_FIELDS if doc.get(field) is not None), None)
+
+
 class DatabaseEngine:
     def __init__(self):
         self.client = None
         self.db = None
         self.connected = False
         self.student_collection_name = "UCSI"  # Default
+        # Filled by probe_student_schema(): which ID field(s)/types the collection uses
+        self.id_schema = {"fields": [], "types": {}, "key_ready": False, "probed": False}
+        self._lookup_lock = threading.Lock()
+        self._lookup_stats = {"lookups": 0, "round_trips": 0, "found": 0, "keys_written": 0}
         
         if HAS_PYMONGO:
             self._connect()
@@ -84,6 +116,10 @@ class DatabaseEngine:
                         self.student_collection_name = target
             except Exception as e:
                 print(f"Warning: Could not auto-detect collections: {e}")
+
+            self.probe_student_schema()
+            if DB_ENSURE_INDEXES:
+                self.ensure_indexes()
             
         except Exception as e:
             print(f"[DB][ERROR] Database connection failed: {e}")
@@ -100,34 +136,162 @@ class DatabaseEngine:
     # STUDENTS COLLECTION
     # ===========================================
     
-    def get_student_by_number(self, student_number: str) -> Optional[Dict]:
-        """Find student by student number (handles string and int)"""
+    def probe_student_schema(self) -> Dict:
+        """
+        One-off startup probe: which ID field(s) and value types the student collection
+        actually uses (from a sample), and whether every document has student_number_key.
+        """
+        if self.student_coll is None or not self.connected:
+            return self.id_schema
+        try:
+            projection = {field: 1 for field in ID_FIELDS + [STUDENT_KEY_FIELD]}
+            # $sample, not find().limit(): the first documents in natural order are the oldest import
+            sample = list(self.student_coll.aggregate([{"$sample": {"size": DB_ID_PROBE_SIZE}},
+                                                       {"$project": projection}]))
+            types: Dict[str, set] = {}
+            for doc in sample:
+                for field in ID_FIELDS:
+                    if doc.get(field) is not None:
+                        types.setdefault(field, set()).add(type(doc[field]).__name__)
+            key_ready = bool(sample) and self.student_coll.find_one(
+                {STUDENT_KEY_FIELD: {"$exists": False}}, {"_id": 1}) is None
+            self.id_schema = {
+                "fields": [field for field in ID_FIELDS if field in types],
+                "types": {field: sorted(found) for field, found in types.items()},
+                "key_ready": key_ready,
+                "probed": True
+            }
+            print(f"[DB] Student ID schema: {self.id_schema['types'] or 'no ID field found'}"
+                  f"{' (student_number_key ready)' if key_ready else ''}")
+        except Exception as e:
+            print(f"Warning: Student schema probe failed, using the lookup cascade: {e}")
+        return self.id_schema
+
+    def ensure_indexes(self) -> List[str]:
+        """Index the probed ID field(s) and student_number_key (no-op for indexes that already exist)"""
+        if self.student_coll is None or not self.connected:
+            return []
+        created = []
+        for field in self.id_schema["fields"] + [STUDENT_KEY_FIELD]:
+            try:
+                created.append(self.student_coll.create_index([(field, 1)]))
+            except Exception as e:
+                print(f"Warning: Could not create index on {field}: {e}")
+        return created
+
+    def _count_lookup(self, round_trips: int, found: bool):
+        with self._lookup_lock:
+            self._lookup_stats["lookups"] += 1
+            self._lookup_stats["round_trips"] += round_trips
+            self._lookup_stats["found"] += int(found)
+
+    def get_lookup_stats(self) -> Dict:
+        with self._lookup_lock:
+            stats = dict(self._lookup_stats)
+        stats["round_trips_per_lookup"] = round(stats["round_trips"] / stats["lookups"], 2) if stats["lookups"] else 0.0
+        stats["schema"] = dict(self.id_schema)
+        return stats
+
+    def get_student_by_number(self, student_number: str, raise_errors: bool = False) -> Optional[Dict]:
+        """
+        Find student by student number with one indexed query: on student_number_key once
+        it is backfilled, else string/int candidates on the probed ID field(s). A key miss
+        retries the probed fields (documents written after the backfill may lack the key)
+        and writes the key on the document found there.
+        Falls back to the field-by-field cascade when the probe did not run.
+        raise_errors: re-raise database errors instead of returning None (so callers that
+        cache misses can tell "not found" from "lookup failed").
+        """
         if self.student_coll is None or not self.connected:
             return None
-        
+        if not self.id_schema["probed"]:
+            return self._lookup_cascade(student_number, raise_errors)
+
+        round_trips = 0
+        student = None
         try:
-            # Try string
-            student = self.student_coll.find_one({"STUDENT_NUMBER": str(student_number)})
-            if student: return student
-            
-            # Try int
-            if str(student_number).isdigit():
-                student = self.student_coll.find_one({"STUDENT_NUMBER": int(student_number)})
-                if student: return student
-                
-            # Try fuzzy field names if standard query failed
-            id_fields = ["student_number", "StudentNumber", "student_id", "id", "ID"]
-            for field in id_fields:
-                s = self.student_coll.find_one({field: str(student_number)})
-                if s: return s
-                if str(student_number).isdigit():
-                    s = self.student_coll.find_one({field: int(student_number)})
-                    if s: return s
-                    
+            if self.id_schema["key_ready"]:
+                round_trips += 1
+                student = self.student_coll.find_one({STUDENT_KEY_FIELD: student_number_key(student_number)})
+                if student is not None:
+                    return student
+
+            candidates = [str(student_number).strip()]
+            if candidates[0].isdigit():
+                candidates.append(int(candidates[0]))
+            fields = self.id_schema["fields"] or ID_FIELDS
+            if len(fields) == 1:
+                student = self.student_coll.find_one({fields[0]: {"$in": candidates}})
+            else:
+                # Mixed collection: one $or query, then keep the old field priority
+                matches = list(self.student_coll.find(
+                    {"$or": [{field: {"$in": candidates}} for field in fields]}).limit(len(fields)))
+                student = next((doc for field in fields for doc in matches if doc.get(field) in candidates), None)
+            round_trips += 1
+            if student is not None and self.id_schema["key_ready"]:
+                round_trips += 1
+                self._write_student_key(student)
+            return student
+        except Exception as e:
+            print(f"DB Error: {e}")
+            if raise_errors:
+                raise
             return None
+        finally:
+            self._count_lookup(round_trips, student is not None)
+
+    def _write_student_key(self, doc: Dict):
+        """Backfill student_number_key on one document found without it (best effort)"""
+        key = student_number_key(_first_id_value(doc))
+        if key is None or doc.get(STUDENT_KEY_FIELD) == key:
+            return
+        try:
+            self.student_coll.update_one({"_id": doc["_id"]}, {"$set": {STUDENT_KEY_FIELD: key}})
+            with self._lookup_lock:
+                self._lookup_stats["keys_written"] += 1
+        except Exception as e:
+            print(f"Warning: Could not write {STUDENT_KEY_FIELD}: {e}")
+
+    def _lookup_cascade(self, student_number: str, raise_errors: bool = False) -> Optional[Dict]:
+        """Original lookup: string then int on each ID field in turn (up to 12 round trips)"""
+        round_trips = 0
+        student = None
+        try:
+            for field in ID_FIELDS:
+                round_trips += 1
+                student = self.student_coll.find_one({field: str(student_number)})
+                if student: break
+                if str(student_number).isdigit():
+                    round_trips += 1
+                    student = self.student_coll.find_one({field: int(student_number)})
+                    if student: break
+            return student
         except Exception as e:
             print(f"DB Error: {e}")
+            if raise_errors:
+                raise
             return None
+        finally:
+            self._count_lookup(round_trips, student is not None)
+
+    def backfill_student_keys(self, batch_size: int = 1000) -> Dict:
+        """
+        Migration: write student_number_key (normalized string of the first ID field present)
+        on every document missing it, in bulk batches, then index it and re-probe.
+        """
+        if self.student_coll is None or not self.connected:
+            return {"updated": 0}
+        projection = {field: 1 for field in ID_FIELDS}
+        updated = 0
+        for docs in self.iter_student_batches({STUDENT_KEY_FIELD: {"$exists": False}}, projection, batch_size):
+            updates = []
+            for doc in docs:
+                updates.append(UpdateOne({"_id": doc["_id"]},
+                                         {"$set": {STUDENT_KEY_FIELD: student_number_key(_first_id_value(doc))}}))
+            updated += self.student_coll.bulk_write(updates, ordered=False).modified_count
+        self.ensure_indexes()
+        self.probe_student_schema()
+        return {"updated": updated, "key_ready": self.id_schema["key_ready"]}
     
     def get_student_by_name(self, name: str) -> Optional[Dict]:
         """Find student by name (case-insensitive)"""
@@ -152,15 +316,37 @@ class DatabaseEngine:
             print(f"DB Error: {e}")
             return None
     
-    def get_all_students(self) -> List[Dict]:
-        """Get all students"""
+    def iter_students(self, query: Optional[Dict] = None, projection: Optional[Dict] = None,
+                      batch_size: int = DB_CURSOR_BATCH_SIZE) -> Iterator[Dict]:
+        """
+        Stream student documents matching query, fetched batch_size at a time.
+        Pass a projection with only the fields you need; the default drops _id only.
+        """
         if self.student_coll is None or not self.connected:
-            return []
+            return
+        cursor = self.student_coll.find(query or {}, projection or {"_id": 0}, batch_size=batch_size)
         try:
-            return list(self.student_coll.find({}, {"_id": 0}))
+            yield from cursor
         except Exception as e:
             print(f"DB Error: {e}")
-            return []
+        finally:
+            cursor.close()
+
+    def iter_student_batches(self, query: Optional[Dict] = None, projection: Optional[Dict] = None,
+                             batch_size: int = DB_CURSOR_BATCH_SIZE) -> Iterator[List[Dict]]:
+        """iter_students grouped into lists of up to batch_size documents (e.g. for bulk writes)"""
+        batch = []
+        for doc in self.iter_students(query, projection, batch_size):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def get_all_students(self) -> List[Dict]:
+        """Get all students. Loads the whole collection; prefer iter_students with a projection."""
+        return list(self.iter_students())
     
     def search_programme_by_keywords(self, keywords: List[str], limit: int = 5) -> List[Dict]:
         """Find programme information by keyword list"""
@@ -297,8 +483,8 @@ class DatabaseEngine:
             return list(self.db.unanswered.find({}, {"_id": 0}).sort("timestamp", -1).limit(limit))
         except: return []
 
-# Singleton instance
-db_engine = DatabaseEngine()
+# Singleton instance (connects on first use instead of at import)
+db_engine = LazyProxy(DatabaseEngine, "db_engine")
 
 if __name__ == "__main__":
     if db_engine.connected:
@@ -0,0 +1,141 @@
+"""
+Dedup Engine - exact and near-duplicate detection for RAG chunks
+Exact duplicates are matched on a hash of the normalized text; near duplicates
+(the four academic calendars share most of their boilerplate) on MinHash
+signatures bucketed with LSH banding.
+"""
+import hashlib
+import os
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Configuration (override via .env)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_NEAR_THRESHOLD = float(os.getenv("DEDUP_NEAR_THRESHOLD", "0.9"))  # estimated Jaccard; 0 = exact only
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: ~0.9-similar pairs collide in some band with high probability
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+PRIME = 4294967291  # largest prime below 2**32
+
+_rng = np.random.default_rng(20260101)  # fixed so signatures stay comparable across restarts
+_A = _rng.integers(1, 2**31, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2**31, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize_chunk(text: str) -> str:
+    return re.sub(r"\s+", " ", str(text or "").lower()).strip()
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha1(normalize_chunk(text).encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def minhash(text: str) -> np.ndarray:
+    """NUM_PERM-value uint32 MinHash signature over word 3-gram shingles."""
+    words = normalize_chunk(text).split(" ")
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a*h + b) mod p for every permutation; a < 2**31 and h < 2**32 keep the product inside uint64
+    permuted = (np.outer(hashes, _A) + _B) % PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+class DedupIndex:
+    def __init__(self, near_threshold: float = DEDUP_NEAR_THRESHOLD):
+        self.near_threshold = near_threshold
+        self.hashes: Dict[str, int] = {}  # chunk hash -> chunk id
+        self.signatures: Dict[int, np.ndarray] = {}
+        self.buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+        self.chunk_hashes: Dict[int, str] = {}
+
+    def __len__(self):
+        return len(self.chunk_hashes)
+
+    @staticmethod
+    def _bands(signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(BANDS):
+            yield band, signature[band * ROWS:(band + 1) * ROWS].tobytes()
+
+    def find(self, digest: str, signature: Optional[np.ndarray],
+             ignore: Set[int] = frozenset()) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Return ("exact" | "near", chunk id) for a duplicate of an indexed chunk, else (None, None).
+        Ids in ignore (the previous version of the file being re-ingested) never match.
+        """
+        if self.hashes.get(digest, -1) not in ignore and digest in self.hashes:
+            return "exact", self.hashes[digest]
+        if signature is None or self.near_threshold <= 0:
+            return None, None
+        candidates = set()
+        for key in self._bands(signature):
+            candidates.update(self.buckets.get(key, ()))
+        candidates.difference_update(ignore)
+        best_id, best_similarity = None, 0.0
+        for chunk_id in candidates:
+            similarity = float(np.mean(self.signatures[chunk_id] == signature))
+            if similarity > best_similarity:
+                best_id, best_similarity = chunk_id, similarity
+        if best_id is not None and best_similarity >= self.near_threshold:
+            return "near", best_id
+        return None, None
+
+    def add(self, chunk_id: int, digest: str, signature: Optional[np.ndarray]):
+        self.hashes.setdefault(digest, chunk_id)
+        self.chunk_hashes[chunk_id] = digest
+        if signature is not None:
+            self.signatures[chunk_id] = signature
+            for key in self._bands(signature):
+                self.buckets.setdefault(key, set()).add(chunk_id)
+
+    def remove(self, chunk_ids: Iterable[int]):
+        for chunk_id in chunk_ids:
+            digest = self.chunk_hashes.pop(chunk_id, None)
+            if digest is not None and self.hashes.get(digest) == chunk_id:
+                del self.hashes[digest]
+            signature = self.signatures.pop(chunk_id, None)
+            if signature is not None:
+                for key in self._bands(signature):
+                    bucket = self.buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(chunk_id)
+                        if not bucket:
+                            del self.buckets[key]
+
+    def filter(self, chunks: List[str], ignore: Set[int] = frozenset()) -> Tuple[List[int], List[Tuple[int, str, int]], List[str], List[np.ndarray]]:
+        """
+        Split new chunks into kept and duplicate. Duplicates are checked against the
+        index and against chunks kept earlier in the same batch.
+        Returns (kept positions, [(position, kind, canonical ref)], hashes, signatures) where the
+        canonical ref is a chunk id, or -(position + 1) for an earlier chunk of the same batch.
+        """
+        batch = DedupIndex(self.near_threshold)
+        kept, duplicates, digests, signatures = [], [], [], []
+        for position, text in enumerate(chunks):
+            digest = chunk_hash(text)
+            signature = minhash(text) if self.near_threshold > 0 else None
+            digests.append(digest)
+            signatures.append(signature)
+            kind, ref = self.find(digest, signature, ignore)
+            if kind is None:
+                kind, ref = batch.find(digest, signature)
+                if ref is not None:
+                    ref = -(ref + 1)
+            if kind is None:
+                kept.append(position)
+                batch.add(position, digest, signature)
+            else:
+                duplicates.append((position, kind, ref))
+        return kept, duplicates, digests, signatures
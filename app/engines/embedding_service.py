@@ -0,0 +1,106 @@
+"""
+Embedding Service - dynamic micro-batching for query embeddings
+Chat threads each need one query embedded. Encoding them one call at a time wastes
+most of the model's throughput on CPU and has every thread competing for torch's
+intra-op threads. EmbeddingBatcher queues requests from all threads and a single
+worker encodes them together, flushing when the batch is full or the oldest request
+has waited RAG_EMBED_MAX_WAIT_MS. Callers block on a future for their rows.
+The wait only applies once the previous batch had company: a lone client is
+encoded straight away instead of paying the wait on every query.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Configuration (override via .env)
+RAG_EMBED_MICROBATCH = os.getenv("RAG_EMBED_MICROBATCH", "true").lower() == "true"
+RAG_EMBED_MAX_BATCH = int(os.getenv("RAG_EMBED_MAX_BATCH", "32"))  # texts per flush
+RAG_EMBED_MAX_WAIT_MS = float(os.getenv("RAG_EMBED_MAX_WAIT_MS", "5"))  # 0 = batch only what is already queued
+RAG_TORCH_THREADS = int(os.getenv("RAG_TORCH_THREADS", "0"))  # intra-op threads for encoding; 0 = torch default
+
+
+def configure_torch_threads(threads: int = RAG_TORCH_THREADS):
+    """Cap torch's intra-op thread pool (applies process-wide)."""
+    if threads <= 0:
+        return
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        print(f"[Embedding] torch using {threads} intra-op thread(s)")
+    except Exception as e:
+        print(f"[Embedding] Could not set torch threads: {e}")
+
+
+class EmbeddingBatcher:
+    def __init__(self, encode: Callable, max_batch: int = RAG_EMBED_MAX_BATCH,
+                 max_wait_ms: float = RAG_EMBED_MAX_WAIT_MS):
+        """encode(texts, batch_size=n) -> array with one row per text, e.g. SentenceTransformer.encode"""
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._last_requests = 0  # requests in the previous batch
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "largest_batch": 0}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts through the shared batch; blocks until this request's rows are ready."""
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            count = len(pending[0][0])
+            deadline = time.perf_counter() + (self.max_wait if self._last_requests > 1 else 0)
+            while count < self.max_batch:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                pending.append(item)
+                count += len(item[0])
+            self._last_requests = len(pending)
+            self._flush(pending)
+
+    def _flush(self, pending: List):
+        texts = [text for request, _ in pending for text in request]
+        try:
+            vectors = np.asarray(self._encode(texts, batch_size=len(texts)), dtype="float32")
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self._stats["requests"] += len(pending)
+            self._stats["texts"] += len(texts)
+            self._stats["batches"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(texts))
+        offset = 0
+        for request, future in pending:
+            future.set_result(vectors[offset:offset + len(request)])
+            offset += len(request)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats.update(max_batch=self.max_batch, max_wait_ms=self.max_wait * 1000)
+        return stats
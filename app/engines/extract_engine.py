@@ -0,0 +1,189 @@
+"""
+Extract Engine - streaming document readers and chunker for RAG ingestion
+Documents are read as a stream of text segments (PDF pages, DOCX paragraphs,
+CSV rows, TXT blocks) and cut into overlapping chunks as they arrive, so memory
+stays bounded by the batch size rather than the file size. Large PDFs are
+extracted across a process pool. Segments carry metadata (PDF page, CSV row
+level/campus) that is merged onto the chunks they end up in.
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+try:
+    import docx  # python-docx (optional)
+except ImportError:
+    docx = None
+
+from .metadata_engine import normalize_level
+
+# Configuration (override via .env)
+RAG_EXTRACT_WORKERS = int(os.getenv("RAG_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+RAG_EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("RAG_EXTRACT_PARALLEL_MIN_PAGES", "16"))  # smaller PDFs stay in-process
+PAGES_PER_TASK = 8  # minimum; each task re-opens the PDF, so large files get about 4 tasks per worker
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+MIN_CHUNK_CHARS = 50  # Ignore very small trailing chunks
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".csv", ".docx")
+TXT_BLOCK_CHARS = 1 << 16
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    """Runs in a pool worker: text of pages [start, end) of one PDF."""
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def iter_pdf_pages(path: str, progress: Optional[Callable] = None,
+                   workers: int = RAG_EXTRACT_WORKERS) -> Iterator[str]:
+    """
+    Yield page texts in order. With several workers and enough pages, page ranges are
+    extracted in a process pool, keeping at most 2 ranges per worker in flight.
+    """
+    if PyPDF2 is None:
+        raise RuntimeError("PyPDF2 is not installed")
+    with open(path, "rb") as f:
+        total = len(PyPDF2.PdfReader(f).pages)
+
+    if workers <= 1 or total < RAG_EXTRACT_PARALLEL_MIN_PAGES:
+        with open(path, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            for page_number, page in enumerate(reader.pages, 1):
+                yield page.extract_text() or ""
+                if progress:
+                    progress(pages_done=page_number, pages_total=total)
+        return
+
+    per_task = max(PAGES_PER_TASK, -(-total // (workers * 4)))
+    ranges = [(start, min(start + per_task, total)) for start in range(0, total, per_task)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        next_range = 0
+        while pending or next_range < len(ranges):
+            while next_range < len(ranges) and len(pending) < workers * 2:
+                start, end = ranges[next_range]
+                pending.append((end, pool.submit(_extract_page_range, path, start, end)))
+                next_range += 1
+            end, future = pending.pop(0)
+            yield from future.result()
+            if progress:
+                progress(pages_done=end, pages_total=total)
+
+
+def iter_docx(path: str) -> Iterator[str]:
+    """Paragraphs, then table rows (cells joined with ' | ')."""
+    if docx is None:
+        raise RuntimeError("python-docx is not installed (pip install python-docx)")
+    document = docx.Document(path)
+    for paragraph in document.paragraphs:
+        if paragraph.text.strip():
+            yield paragraph.text
+    for table in document.tables:
+        for row in table.rows:
+            yield " | ".join(cell.text.strip() for cell in row.cells)
+
+
+def iter_csv(path: str) -> Iterator[Tuple[str, Dict]]:
+    """Rows as text, with the row's level/campus when the header has Level/Campus columns."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield ",".join(header), {}
+        columns = {name.strip().lower(): i for i, name in enumerate(header)}
+        level, campus = columns.get("level"), columns.get("campus")
+        for row in reader:
+            meta = {}
+            if level is not None and level < len(row):
+                meta["level"] = normalize_level(row[level])
+            if campus is not None and campus < len(row):
+                meta["campus"] = row[campus].strip() or None
+            yield ",".join(row), meta
+
+
+def iter_txt(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(TXT_BLOCK_CHARS), ""):
+            yield block
+
+
+def iter_segments(path: str, progress: Optional[Callable] = None) -> Iterator[Tuple[str, Dict]]:
+    """Stream a document as (text, metadata) segments; texts already carry their separators."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        for page_number, page in enumerate(iter_pdf_pages(path, progress), 1):
+            if page:
+                yield page + "\n", {"page": page_number}
+    elif ext == ".txt":
+        for block in iter_txt(path):
+            yield block, {}
+    elif ext in (".csv", ".docx"):
+        lines = iter_csv(path) if ext == ".csv" else ((line, {}) for line in iter_docx(path))
+        for i, (line, meta) in enumerate(lines):
+            yield (line if i == 0 else "\n" + line), meta
+    else:
+        raise ValueError(f"Unsupported file type: {ext or path}")
+
+
+def _merge_meta(metas: List[Dict]) -> Dict:
+    """Metadata of a chunk: the first page it touches; other keys only where every segment agrees."""
+    merged = {}
+    for key in {key for meta in metas for key in meta}:
+        values = [meta.get(key) for meta in metas]
+        if key == "page":
+            pages = [value for value in values if value is not None]
+            merged[key] = min(pages) if pages else None
+        else:
+            merged[key] = values[0] if len(set(values)) == 1 else None
+    return merged
+
+
+def iter_chunks_with_meta(segments: Iterable[Tuple[str, Dict]], size: int = CHUNK_SIZE,
+                          overlap: int = CHUNK_OVERLAP) -> Iterator[Tuple[str, Dict]]:
+    """
+    Fixed-size overlapping windows over the concatenated segment texts, with the merged
+    metadata of the segments each window overlaps. Produces the same chunks as slicing the
+    whole text every (size - overlap) characters, keeping only the unconsumed tail.
+    """
+    step = size - overlap
+    buffer = ""
+    spans = []  # (start, end, meta) of the segments still in the buffer
+    for text, meta in segments:
+        spans.append((len(buffer), len(buffer) + len(text), meta))
+        buffer += text
+        start = 0
+        while len(buffer) - start >= size:
+            end = start + size
+            yield buffer[start:end], _merge_meta([m for s, e, m in spans if s < end and e > start])
+            start += step
+        buffer = buffer[start:]
+        spans = [(s - start, e - start, m) for s, e, m in spans if e > start]
+    if len(buffer) > MIN_CHUNK_CHARS:
+        yield buffer, _merge_meta([m for _, _, m in spans])
+
+
+def iter_chunks(segments: Iterable[str], size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """Chunk plain text segments (no metadata)."""
+    for chunk, _ in iter_chunks_with_meta(((segment, {}) for segment in segments), size, overlap):
+        yield chunk
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
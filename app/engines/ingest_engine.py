@@ -0,0 +1,152 @@
+"""
+Ingest Engine - background job queue for knowledge-base uploads
+A single worker thread runs RAGEngine.ingest so uploads return immediately
+and the live index keeps serving searches while a document is embedded.
+"""
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+# Configuration (override via .env)
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "100"))  # finished jobs kept for status queries
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class IngestQueue:
+    def __init__(self, history: int = INGEST_JOB_HISTORY):
+        self.history = history
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self.on_complete: Optional[Callable[[Dict], None]] = None  # e.g. response cache invalidation
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="ingest-worker", daemon=True)
+                self._worker.start()
+
+    def submit(self, file_path: str) -> Dict:
+        """Queue a saved file for ingestion and return its job record"""
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "filename": os.path.basename(file_path),
+            "path": file_path,
+            "status": QUEUED,
+            "attempts": 0,
+            "pages_done": 0,
+            "pages_total": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "vectors_added": 0,
+            "duplicates_skipped": 0,
+            "unchanged": False,
+            "stale_dependents": [],  # files that lost chunks of this file's previous version
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+        with self._lock:
+            self.jobs[job["id"]] = job
+            self._trim()
+        self._queue.put(job["id"])
+        self._ensure_worker()
+        return dict(job)
+
+    def submit_stale(self, sources: List[str], directory: str) -> List[str]:
+        """
+        Queue files that lost deduplicated chunks to a removal or replacement. Files already
+        queued or gone from the directory are skipped. Returns the new job ids.
+        """
+        with self._lock:
+            queued = {job["filename"] for job in self.jobs.values() if job["status"] == QUEUED}
+        job_ids = []
+        for source in sources:
+            path = os.path.join(directory, source)
+            if source not in queued and os.path.isfile(path):
+                print(f"[Ingest] Re-queueing {source}: it reused chunks that were removed")
+                job_ids.append(self.submit(path)["id"])
+        return job_ids
+
+    def retry(self, job_id: str) -> Optional[Dict]:
+        """Re-queue a failed job. Returns None if unknown, the unchanged job if it has not failed."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] != FAILED:
+                return dict(job)
+            job.update(status=QUEUED, error=None, pages_done=0, chunks_embedded=0, vectors_added=0,
+                       started_at=None, finished_at=None)
+        self._queue.put(job_id)
+        self._ensure_worker()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            return [dict(job) for job in reversed(self.jobs.values())]
+
+    def _trim(self):
+        """Drop the oldest finished jobs beyond the history limit (queued/running are kept)"""
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._process(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job_id: str):
+        job = self.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        self._update(job_id, status=RUNNING, started_at=time.time(), attempts=job["attempts"] + 1)
+        print(f"[Ingest] Job {job_id}: {job['filename']}")
+        try:
+            from app.engines.rag_engine import rag_engine
+            result = rag_engine.ingest(job["path"], progress=lambda **fields: self._update(job_id, **fields))
+            self._update(job_id, status=DONE, finished_at=time.time(),
+                         duplicates_skipped=result.get("duplicates_skipped", 0), unchanged=result.get("unchanged", False),
+                         stale_dependents=result.get("stale_dependents", []))
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+            return
+        if self.on_complete:
+            try:
+                self.on_complete(self.get(job_id))
+            except Exception as e:
+                print(f"[Ingest] on_complete hook failed: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self.jobs.values():
+                counts[job["status"]] += 1
+        return counts
+
+
+# Singleton
+ingest_queue = IngestQueue()
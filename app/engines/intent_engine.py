@@ -0,0 +1,212 @@
+"""
+Intent Engine - Local nearest-centroid intent router
+Classifies a chat message as needs_context / personal / grade / stats / general
+from MiniLM embeddings so chat() can skip the phase-1 "do you need context?" LLM call.
+"""
+import os
+import json
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .cache_engine import rag_embedder
+
+INTENT_LABELS = ["needs_context", "personal", "grade", "stats", "general"]
+
+# Temperature / threshold written by `python -m app.utils.calibrate_intent_router --write`
+INTENT_CALIBRATION_FILE = os.getenv("INTENT_CALIBRATION_FILE", "data/intent_calibration.json")
+
+
+def load_calibration(path: str = INTENT_CALIBRATION_FILE) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Intent calibration load error: {e}")
+        return {}
+
+
+_calibration = load_calibration()
+
+# Configuration (override via .env; else the calibration file; else conservative defaults)
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", _calibration.get("threshold", 0.7)))
+INTENT_TEMPERATURE = float(os.getenv("INTENT_TEMPERATURE", _calibration.get("temperature", 0.1)))
+INTENT_MAX_EXAMPLES_PER_LABEL = int(os.getenv("INTENT_MAX_EXAMPLES_PER_LABEL", "40"))  # caps log-derived examples
+
+# Labelled training sources (data/intent_holdout.json is kept out of training for calibration)
+INTENT_EXAMPLES_FILE = "data/intent_examples.json"
+INTENT_HOLDOUT_FILE = "data/intent_holdout.json"
+FEEDBACK_LOG_FILE = "data/feedback_log.json"
+UNANSWERED_LOG_FILE = "data/unanswered_log.json"
+
+GRADE_KEYWORDS = ["grade", "result", "exam", "score", "gpa"]
+
+
+def label_by_rules(message: str) -> Optional[str]:
+    """Weak label for unlabelled log messages (same heuristics chat() used before routing)."""
+    lower = str(message or "").lower()
+    if "my " in lower:
+        return "grade" if any(k in lower for k in GRADE_KEYWORDS) else "personal"
+    if "how many" in lower or "count" in lower:
+        return "stats"
+    return None
+
+
+def intent_probabilities(similarity: np.ndarray, temperature: float) -> np.ndarray:
+    """Softmax over centroid cosine similarities (last axis); lower temperature = sharper"""
+    logits = (similarity - similarity.max(axis=-1, keepdims=True)) / temperature
+    weights = np.exp(logits)
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+class IntentRouter:
+    def __init__(self, embedder: Optional[Callable] = rag_embedder,
+                 threshold: float = INTENT_CONFIDENCE_THRESHOLD, temperature: float = INTENT_TEMPERATURE):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.temperature = temperature
+        self.enabled = INTENT_ROUTER_ENABLED
+        self.labels = []
+        self.centroids = None  # (n_labels, dim), unit length
+        self.example_counts = {}
+        self._trained = False
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_routes": 0,
+            "llm_fallbacks": 0,
+            "llm_calls": 0,
+            "llm_calls_saved": 0
+        }
+
+    # ===========================================
+    # TRAINING
+    # ===========================================
+
+    def load_examples(self) -> Dict[str, List[str]]:
+        """
+        Collect labelled examples from the seed file and feedback logs. Seeds come first and
+        each label is capped at INTENT_MAX_EXAMPLES_PER_LABEL, so weakly labelled log messages
+        cannot swamp the other centroids.
+        """
+        examples = {label: [] for label in INTENT_LABELS}
+
+        if os.path.exists(INTENT_EXAMPLES_FILE):
+            try:
+                with open(INTENT_EXAMPLES_FILE, "r", encoding="utf-8") as f:
+                    for label, items in json.load(f).items():
+                        if label in examples:
+                            examples[label].extend(items)
+            except Exception as e:
+                print(f"Intent examples load error: {e}")
+
+        for path, list_key, text_key in [(FEEDBACK_LOG_FILE, "feedbacks", "user_message"),
+                                         (UNANSWERED_LOG_FILE, "low_confidence", "question")]:
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for entry in json.load(f).get(list_key, []):
+                        text = entry.get(text_key)
+                        label = label_by_rules(text)
+                        if text and label:
+                            examples[label].append(text)
+            except Exception as e:
+                print(f"Intent log load error ({path}): {e}")
+
+        return {label: list(dict.fromkeys(items))[:INTENT_MAX_EXAMPLES_PER_LABEL]
+                for label, items in examples.items() if items}
+
+    def train(self, examples: Optional[Dict[str, List[str]]] = None) -> bool:
+        """Embed all examples and compute one unit-length centroid per intent."""
+        if self.embedder is None:
+            return False
+        examples = examples or self.load_examples()
+        labels, centroids, counts = [], [], {}
+        for label, texts in examples.items():
+            vectors = self.embedder(texts)
+            if vectors is None:
+                return False
+            vectors = np.asarray(vectors, dtype="float32")
+            vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / (np.linalg.norm(centroid) + 1e-12))
+            labels.append(label)
+            counts[label] = len(texts)
+        if not labels:
+            return False
+        self.labels = labels
+        self.centroids = np.stack(centroids)
+        self.example_counts = counts
+        self._trained = True
+        print(f"[INTENT] Router trained on {sum(counts.values())} examples: {counts}")
+        return True
+
+    def _ensure_trained(self) -> bool:
+        if self._trained:
+            return True
+        with self._lock:
+            if not self._trained:
+                try:
+                    trained = self.train()
+                except Exception as e:
+                    print(f"Intent training error: {e}")
+                    trained = False
+                if not trained:
+                    self.embedder = None  # Don't retry on every request
+        return self._trained
+
+    def warm_up(self) -> bool:
+        """Train ahead of the first chat turn (startup warm-up)."""
+        return not self.enabled or self._ensure_trained()
+
+    # ===========================================
+    # CLASSIFICATION
+    # ===========================================
+
+    def classify(self, message: str) -> Dict:
+        """
+        Returns { "intent": str|None, "confidence": float, "confident": bool, "scores": dict }
+        """
+        decision = {"intent": None, "confidence": 0.0, "confident": False, "scores": {}}
+        if not self.enabled or not message or not self._ensure_trained():
+            return decision
+        try:
+            vector = np.asarray(self.embedder([message]), dtype="float32").reshape(-1)
+            vector = vector / (np.linalg.norm(vector) + 1e-12)
+            probs = intent_probabilities(self.centroids @ vector, self.temperature)
+            best = int(np.argmax(probs))
+            decision["intent"] = self.labels[best]
+            decision["confidence"] = round(float(probs[best]), 4)
+            decision["confident"] = decision["confidence"] >= self.threshold
+            decision["scores"] = {label: round(float(p), 4) for label, p in zip(self.labels, probs)}
+        except Exception as e:
+            print(f"Intent classify error: {e}")
+        return decision
+
+    def record(self, source: str, llm_calls: int, llm_calls_saved: int = 0):
+        """Track how routing decisions translate into LLM calls."""
+        with self._lock:
+            if source == "local":
+                self._stats["local_routes"] += 1
+            elif source == "llm":
+                self._stats["llm_fallbacks"] += 1
+            self._stats["llm_calls"] += llm_calls
+            self._stats["llm_calls_saved"] += llm_calls_saved
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        routed = stats["local_routes"] + stats["llm_fallbacks"]
+        stats["local_route_rate"] = round(stats["local_routes"] / routed, 4) if routed else 0.0
+        stats["threshold"] = self.threshold
+        stats["trained"] = self._trained
+        stats["examples"] = dict(self.example_counts)
+        return stats
+
+
+# Singleton
+intent_router = IntentRouter()
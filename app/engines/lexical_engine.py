@@ -0,0 +1,118 @@
+"""
+Lexical Engine - in-process BM25 inverted index over RAG chunks
+Catches exact tokens MiniLM blurs ("IELTS 5.5", "MUET Band 3", programme codes, week numbers).
+Chunk ids are the same ids RAGEngine uses in its FAISS ID map.
+"""
+import math
+import re
+from collections import Counter
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Words that carry no retrieval signal on their own
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "in", "is",
+    "it", "me", "my", "of", "on", "or", "the", "to", "what", "when", "where", "which", "who", "with", "you"
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens ("5.5" stays whole) plus adjacent-word bigrams for exact phrases."""
+    words = [w for w in TOKEN_PATTERN.findall(str(text or "").lower()) if w not in STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def reciprocal_rank_fusion(rankings: List[Tuple[List[int], float]], k: int = 60) -> List[int]:
+    """Fuse ranked id lists given as (ids, weight) pairs; returns ids by descending fused score."""
+    scores: Dict[int, float] = {}
+    for ids, weight in rankings:
+        for rank, doc_id in enumerate(ids):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class BM25Index:
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}  # term -> {chunk id: term frequency}
+        self.doc_lengths: Dict[int, int] = {}
+        self.doc_terms: Dict[int, List[str]] = {}  # chunk id -> distinct terms, so removal touches only its postings
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: int, text: str):
+        if doc_id in self.doc_lengths:
+            self.remove([doc_id])
+        terms = tokenize(text)
+        counts = Counter(terms)
+        self.doc_lengths[doc_id] = len(terms)
+        self.doc_terms[doc_id] = list(counts)
+        self.total_length += len(terms)
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def copy(self) -> "BM25Index":
+        """Independent copy for a writer to modify while readers keep searching this one."""
+        clone = BM25Index()
+        clone.postings = {term: dict(posting) for term, posting in self.postings.items()}
+        clone.doc_lengths = dict(self.doc_lengths)
+        clone.doc_terms = dict(self.doc_terms)  # term lists are replaced on add, never mutated
+        clone.total_length = self.total_length
+        return clone
+
+    def remove(self, doc_ids: Iterable[int]):
+        for doc_id in doc_ids:
+            length = self.doc_lengths.pop(doc_id, None)
+            if length is None:
+                continue
+            self.total_length -= length
+            for term in self.doc_terms.pop(doc_id, ()):
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        """BM25 idf; unseen terms get the maximum so they count against keyword confidence."""
+        n = len(self.doc_lengths)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10, allowed: Optional[Container[int]] = None
+               ) -> Tuple[List[Tuple[int, float]], float]:
+        """
+        Top-k (chunk id, score) pairs and the keyword coverage of the best hit:
+        the share of the query's idf mass that the top chunk contains (0..1).
+        With `allowed`, chunks outside it are skipped before scoring.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_lengths:
+            return [], 0.0
+        average_length = self.total_length / len(self.doc_lengths)
+        scores: Dict[int, float] = {}
+        weights = {term: self.idf(term) for term in terms}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            for doc_id, tf in posting.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = K1 * (1 - B + B * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + weights[term] * tf * (K1 + 1) / (tf + norm)
+        if not scores:
+            return [], 0.0
+
+        hits = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        best = hits[0][0]
+        matched = sum(weight for term, weight in weights.items() if best in self.postings.get(term, ()))
+        total = sum(weights.values())
+        return hits, (matched / total if total else 0.0)
@@ -0,0 +1,321 @@
+"""
+LLM Client - Resilient wrapper around the Google Gen AI client
+Adds per-call deadlines, jittered exponential retry, optional hedged requests,
+a per-model circuit breaker and a bounded concurrency semaphore.
+"""
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Optional
+
+# Configuration (override via .env)
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "25"))                # seconds per logical call, retries included
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "12"))  # seconds per attempt
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "4"))
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))  # e.g. 95; 0 disables hedging
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # consecutive failures
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))      # seconds before a half-open probe
+
+CANNED_RESPONSE = "I'm having trouble reaching my AI service right now. Please try again in a minute."
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """Base class for failures the caller should answer with the canned response."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    pass
+
+
+class LLMOverloadedError(LLMUnavailableError):
+    pass
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection problems, 429 and 5xx are worth another attempt."""
+    if isinstance(error, (LLMTimeoutError, TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    name = type(error).__name__
+    return "Timeout" in name or "Connect" in name or "RemoteProtocol" in name
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open probe after reset_timeout."""
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, reset_timeout: float = LLM_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class ModelStats:
+    """Latency and error counters for one model."""
+
+    def __init__(self, window: int = 500):
+        self.latencies = deque(maxlen=window)
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "circuit_rejections": 0,
+            "overload_rejections": 0
+        }
+        self.lock = threading.Lock()
+
+    def incr(self, key: str, n: int = 1):
+        with self.lock:
+            self.counters[key] += n
+
+    def observe(self, seconds: float):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self.lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            data = dict(self.counters)
+            samples = len(self.latencies)
+        for pct in (50, 95, 99):
+            value = self.percentile(pct)
+            data[f"p{pct}_ms"] = round(value * 1000, 1) if value is not None else None
+        data["latency_samples"] = samples
+        return data
+
+
+class ResilientLLMClient:
+    """Drop-in for `client.models.generate_content(_stream)` with resilience policies."""
+
+    def __init__(self, client, deadline: float = LLM_DEADLINE, attempt_timeout: float = LLM_ATTEMPT_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = LLM_BACKOFF_BASE,
+                 backoff_max: float = LLM_BACKOFF_MAX, hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+                 hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 breaker_threshold: int = LLM_BREAKER_THRESHOLD, breaker_reset: float = LLM_BREAKER_RESET):
+        self.client = client
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_concurrency = max_concurrency
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Hedges can double the in-flight attempts; abandoned (timed-out) attempts keep a worker busy
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 3, thread_name_prefix="llm")
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, ModelStats] = {}
+        self._registry_lock = threading.Lock()
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        with self._registry_lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return self._breakers[model]
+
+    def _model_stats(self, model: str) -> ModelStats:
+        with self._registry_lock:
+            if model not in self._stats:
+                self._stats[model] = ModelStats()
+            return self._stats[model]
+
+    def _backoff(self, attempt: int, remaining: float):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        time.sleep(max(0.0, min(delay, remaining)))
+
+    def _timed_call(self, fn, stats: ModelStats):
+        """Run fn under a concurrency slot and record its latency."""
+        started = time.monotonic()
+        try:
+            result = fn()
+            # Only successful latencies feed the hedge percentile (fast errors would skew it)
+            stats.observe(time.monotonic() - started)
+            return result
+        finally:
+            self._slots.release()
+
+    def _acquire_slot(self, timeout: float, stats: ModelStats):
+        if not self._slots.acquire(timeout=max(0.0, timeout)):
+            stats.incr("overload_rejections")
+            raise LLMOverloadedError("Too many concurrent LLM calls")
+
+    def _attempt(self, fn, stats: ModelStats, timeout: float):
+        """One attempt (plus an optional hedge) bounded by `timeout` seconds."""
+        started = time.monotonic()
+        self._acquire_slot(timeout, stats)
+        primary = self._executor.submit(self._timed_call, fn, stats)
+        pending = [primary]
+
+        hedge_at = None
+        if self.hedge_percentile > 0 and len(stats.latencies) >= self.hedge_min_samples:
+            hedge_at = stats.percentile(self.hedge_percentile)
+
+        last_error = None
+        while pending:
+            elapsed = time.monotonic() - started
+            remaining = timeout - elapsed
+            if remaining <= 0:
+                break
+            wait_for = remaining if hedge_at is None else min(remaining, max(0.0, hedge_at - elapsed))
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if hedge_at is not None:
+                    # Primary is slower than the hedge percentile -> fire one backup request
+                    if self._slots.acquire(blocking=False):
+                        stats.incr("hedges")
+                        pending.append(self._executor.submit(self._timed_call, fn, stats))
+                    hedge_at = None
+                continue
+
+            for future in done:
+                pending.remove(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if future is not primary:
+                    stats.incr("hedge_wins")
+                for other in pending:
+                    if other.cancel():
+                        self._slots.release()
+                return result
+            hedge_at = None  # Don't hedge a call that is already failing
+
+        if last_error is not None and not pending:
+            raise last_error
+        # Abandoned attempts keep their slot until the SDK-level timeout frees them
+        stats.incr("timeouts")
+        raise LLMTimeoutError(f"LLM call exceeded {timeout:.1f}s")
+
+    def _call(self, model: str, fn):
+        """Deadline + retry + circuit breaker around a single SDK call."""
+        stats = self._model_stats(model)
+        breaker = self._breaker(model)
+        stats.incr("calls")
+
+        if not breaker.allow():
+            stats.incr("circuit_rejections")
+            raise CircuitOpenError(f"Circuit open for {model}")
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self.deadline - (time.monotonic() - started)
+            try:
+                result = self._attempt(fn, stats, min(self.attempt_timeout, remaining))
+                breaker.record_success()
+                stats.incr("successes")
+                return result
+            except LLMOverloadedError:
+                # Local back-pressure says nothing about upstream health
+                breaker.release_probe()
+                stats.incr("failures")
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    breaker.record_failure()
+                remaining = self.deadline - (time.monotonic() - started)
+                if not retryable or attempt >= self.max_retries or remaining <= 0 or breaker.state == "open":
+                    stats.incr("failures")
+                    if not retryable:
+                        # Bad request etc. says nothing about upstream health either way:
+                        # free a half-open probe without resetting the failure count
+                        breaker.release_probe()
+                    raise
+                stats.incr("retries")
+                self._backoff(attempt, remaining)
+                attempt += 1
+
+    def generate_content(self, model: str, contents, **kwargs):
+        """Same signature as client.models.generate_content."""
+        return self._call(
+            model, lambda: self.client.models.generate_content(model=model, contents=contents, **kwargs)
+        )
+
+    def generate_content_stream(self, model: str, contents, **kwargs):
+        """
+        Same signature as client.models.generate_content_stream.
+        Deadline/retry apply until the first chunk arrives; later chunks are bounded by the SDK timeout.
+        """
+        def open_stream():
+            stream = iter(self.client.models.generate_content_stream(model=model, contents=contents, **kwargs))
+            return stream, next(stream, None)
+
+        stream, first = self._call(model, open_stream)
+        if first is not None:
+            yield first
+            for chunk in stream:
+                yield chunk
+
+    def get_stats(self) -> Dict:
+        with self._registry_lock:
+            models = list(self._stats.keys())
+        return {
+            model: dict(self._stats[model].snapshot(), circuit=self._breaker(model).state)
+            for model in models
+        }
@@ -0,0 +1,93 @@
+"""
+Metadata Engine - structured chunk metadata and retrieval filters
+Each knowledge-base chunk carries its source, document type, programme level,
+campus and page. Source-level fields are inferred from the file name; CSV rows
+add their own level/campus. A NULL level or campus means "applies to everyone",
+so general documents stay visible to every filtered search.
+"""
+import os
+import re
+from typing import Dict, List, Optional
+
+LEVELS = ("foundation", "undergraduate", "postgraduate", "postgraduate_coursework", "postgraduate_research")
+FILTER_KEYS = ("source", "doc_type", "level", "campus")
+
+# File name patterns -> programme level (checked in order)
+_SOURCE_LEVELS = (
+    ("by_coursework", "postgraduate_coursework"),
+    ("by_research", "postgraduate_research"),
+    ("postgraduate", "postgraduate"),
+    ("foundation", "foundation"),
+    ("general_programme", "undergraduate"),
+    ("undergraduate", "undergraduate"),
+)
+_CAMPUSES = {
+    "kuala_lumpur": "Kuala Lumpur",
+    "kuching": "Kuching",
+    "springhill": "Springhill (Negeri Sembilan)",
+}
+
+# Student profile keywords -> levels whose documents apply to them (checked in order)
+_PROFILE_LEVELS = (
+    (r"\bfoundation\b", ["foundation"]),
+    (r"\b(phd|doctor|doctorate|mphil|research)\b", ["postgraduate_research", "postgraduate"]),
+    (r"\b(master|masters|mba|msc|ma|coursework|postgraduate|pg)\b", ["postgraduate_coursework", "postgraduate"]),
+    (r"\b(diploma|bachelor|bachelors|degree|undergraduate|ug|bsc|ba)\b", ["undergraduate"]),
+)
+
+
+def normalize_level(value: Optional[str]) -> Optional[str]:
+    """'Postgraduate' -> 'postgraduate'; unknown or empty values -> None."""
+    level = re.sub(r"[\s\-]+", "_", (value or "").strip().lower())
+    return level if level in LEVELS else None
+
+
+def source_metadata(filename: str) -> Dict:
+    """doc_type, level and campus implied by a knowledge-base file name."""
+    name = os.path.basename(filename).lower()
+    stem, ext = os.path.splitext(name)
+    if "calendar" in stem:
+        doc_type = "academic_calendar"
+    elif "programme" in stem and ext == ".csv":
+        doc_type = "programmes"
+    else:
+        doc_type = "document"
+    key = re.sub(r"[^a-z0-9]+", "_", stem)
+    level = next((level for pattern, level in _SOURCE_LEVELS if pattern in key), None)
+    return {"doc_type": doc_type, "level": level, "campus": normalize_campus(key)}
+
+
+def normalize_campus(value: Optional[str]) -> Optional[str]:
+    """Campus name as stored on chunks ('UCSI Kuching' -> 'Kuching'); None if unrecognised."""
+    key = re.sub(r"[^a-z0-9]+", "_", (value or "").lower())
+    return next((campus for pattern, campus in _CAMPUSES.items() if pattern in key), None)
+
+
+def student_levels(*profile_fields: Optional[str]) -> List[str]:
+    """
+    Programme levels relevant to a student, from the first profile field that names one
+    (e.g. PROGRAMME_LEVEL, PROFILE_TYPE, PROGRAMME_NAME, in that order).
+    """
+    for text in profile_fields:
+        text = (text or "").lower()
+        for pattern, levels in _PROFILE_LEVELS:
+            if re.search(pattern, text):
+                return list(levels)
+    return []
+
+
+def normalize_filters(filters: Optional[Dict]) -> Optional[tuple]:
+    """Hashable, canonical form of a filter dict: ((key, (values...)), ...) or None for no filtering."""
+    if not filters:
+        return None
+    items = []
+    for key in FILTER_KEYS:
+        value = filters.get(key)
+        if value is None:
+            continue
+        values = (value,) if isinstance(value, str) else tuple(value)
+        items.append((key, tuple(sorted(set(values)))))
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter field(s): {', '.join(sorted(unknown))}")
+    return tuple(items) or None
@@ -8,36 +8,122 @@ os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 import logging
 logging.getLogger("sentence_transformers").setLevel(logging.WARNING)
 
+import importlib.util
 import pickle
-from typing import List, Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, List, Dict, NamedTuple, Optional, Tuple
 import numpy as np
 
 # Conditional imports
 try:
     import faiss
-    from sentence_transformers import SentenceTransformer
     import PyPDF2
+    # sentence_transformers pulls in torch (seconds); it is imported when the engine is built
+    if importlib.util.find_spec("sentence_transformers") is None:
+        raise ImportError("sentence_transformers")
     HAS_DEPENDENCIES = True
 except ImportError:
     HAS_DEPENDENCIES = False
     print("Warning: RAG dependencies missing. Install faiss-cpu, sentence-transformers, PyPDF2")
 
+from app.utils.lazy_utils import LazyProxy
+from .cache_engine import EmbeddingCache
+from .chunk_store import RETIRED_SUFFIX, ChunkStore
+from .embedding_service import RAG_EMBED_MICROBATCH, EmbeddingBatcher, configure_torch_threads
+from .extract_engine import SUPPORTED_EXTENSIONS, batched, iter_chunks, iter_chunks_with_meta, iter_segments
+from .dedup_engine import DEDUP_ENABLED, DedupIndex, chunk_hash, file_hash, minhash
+from .lexical_engine import BM25Index, reciprocal_rank_fusion
+from .metadata_engine import normalize_filters, source_metadata
+from .vector_index import (
+    INDEX_TYPES, QUANTIZED_TYPES, RAG_INDEX_TYPE, build_index, bytes_per_vector, index_kind, reconstruct_with_ids,
+    search_params, should_switch, supports_remove, supports_selector, tune_index
+)
+
 KNOWLEDGE_BASE_DIR = "data/knowledge_base"
 INDEX_FILE = "data/knowledge_base/faiss_index.bin"
-METADATA_FILE = "data/knowledge_base/faiss_metadata.pkl"
+METADATA_FILE = "data/knowledge_base/faiss_metadata.pkl"  # Legacy; migrated into the chunk store on load
+CHUNK_STORE_FILE = "data/knowledge_base/chunks.sqlite3"
+LEXICAL_FILE = "data/knowledge_base/lexical_index.pkl"
+STAGING_SUFFIX = ".ingesting"  # chunks of a file being ingested live under this source name until it completes
+
+RAG_INDEX_MMAP = os.getenv("RAG_INDEX_MMAP", "true").lower() == "true"  # share index pages across workers
+
+RAG_EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))  # chunks per model.encode call during ingestion
+
+# Hybrid retrieval: BM25 share in reciprocal rank fusion (0 = vector only) and candidates per side
+RAG_HYBRID_WEIGHT = float(os.getenv("RAG_HYBRID_WEIGHT", "0.5"))
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+# Lexical-only fast path: top keyword hit covers this share of the query's idf mass and beats the runner-up by the margin
+RAG_LEXICAL_FASTPATH_COVERAGE = float(os.getenv("RAG_LEXICAL_FASTPATH_COVERAGE", "0.95"))  # 0 = off
+RAG_LEXICAL_FASTPATH_MARGIN = float(os.getenv("RAG_LEXICAL_FASTPATH_MARGIN", "1.5"))
+
+# Compact once tombstoned (deleted but still indexed) vectors exceed this share of the index
+RAG_COMPACT_RATIO = float(os.getenv("RAG_COMPACT_RATIO", "0.2"))
+
+# Candidate id sets of recent metadata filters, per published version
+RAG_FILTER_CACHE_SIZE = int(os.getenv("RAG_FILTER_CACHE_SIZE", "32"))
+
+class FilterCandidates(NamedTuple):
+    """Chunk ids a metadata filter allows, as a set (keyword side) and a FAISS selector (vector side)."""
+    ids: set
+    selector: object
+
+
+class IndexSnapshot(NamedTuple):
+    """
+    One published version of the searchable state. Never mutated, so readers use it without locking.
+    Chunk rows it refers to stay in the store while a reader holds it (see RAGEngine._reading).
+    """
+    version: int
+    index: object
+    lexical: BM25Index
+    tombstones: frozenset
+
 
 class RAGEngine:
-    def __init__(self):
+    def __init__(self, model=None):
+        """model: anything with encode(texts, batch_size=...) -> float32 rows; defaults to all-MiniLM-L6-v2"""
+        # Working state, changed only by writers holding _lock and published as a snapshot when consistent
         self.index = None
-        self.metadata = []  # List of dicts: [{"text": "...", "source": "..."}, ...]
+        self.store = None  # ChunkStore: vector id -> text/source, read lazily
+        self.tombstones = set()  # Ids deleted from the store but still in an index that cannot remove them
+        self.next_id = 0  # Ids are never reused, so a stale snapshot can miss a chunk text but never get a wrong one
+        self.lexical = BM25Index()  # Keyword index over the same chunk ids
+        self._snapshot = IndexSnapshot(0, None, BM25Index(), frozenset())
+        self._dedup = None  # DedupIndex over stored chunk hashes, built on the first ingest
+        self._retrieval_stats = {"lexical_only": 0, "hybrid": 0, "vector_only": 0, "filtered": 0}
+        # (snapshot version, store generation, filters) -> FilterCandidates; the generation moves when
+        # rows change source without a new version (staged chunks renamed to their file)
+        self._filter_cache = OrderedDict()
+        self._filter_generation = 0
+        self._filter_lock = threading.Lock()  # also guards _retrieval_stats (bumped from rag_executor threads)
+        # Readers per pinned snapshot version, and retired row sets as (first version without them, source tag)
+        self._readers: Dict[int, int] = {}
+        self._retired: List[tuple] = []
+        self._readers_lock = threading.Lock()
         self.model = None
         self.enabled = HAS_DEPENDENCIES
+        # Serializes writers (ingest, remove, rebuild); search reads the published snapshot and never takes it
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._shared = False  # working index/lexical are the published ones (or an mmap view): copy before writing
+        self.embedding_cache = EmbeddingCache()
+        self.query_batcher = None  # micro-batches query encodes from concurrent requests
         
         if self.enabled:
             try:
                 # Load Model (MiniLM is fast and light)
-                self.model = SentenceTransformer('all-MiniLM-L6-v2')
+                if model is None:
+                    configure_torch_threads()
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer('all-MiniLM-L6-v2')
+                self.model = model
                 self.dimension = 384  # MiniLM dimension
+                if RAG_EMBED_MICROBATCH:
+                    self.query_batcher = EmbeddingBatcher(self.model.encode)
                 
                 # Load or Create Index
                 self._load_index()
@@ -46,120 +132,721 @@ class RAGEngine:
                 print(f"RAG Init Error: {e}")
                 self.enabled = False
 
+    def _read_index(self):
+        """Read the FAISS index, memory-mapped read-only when enabled so workers share pages"""
+        if RAG_INDEX_MMAP:
+            try:
+                flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+                index = faiss.read_index(INDEX_FILE, flags)
+                self._shared = True
+                return index
+            except Exception as e:
+                print(f"[RAG] mmap load failed ({e}); reading index into memory")
+        return faiss.read_index(INDEX_FILE)
+
+    def _ensure_writable(self):
+        """
+        Copy-on-write: after a publish the working index and keyword index are the ones readers are
+        searching (and a mapped index is a read-only view FAISS aborts on resizing), so copy them
+        before the first mutation. Caller holds _lock.
+        """
+        if self._shared:
+            self.index = tune_index(faiss.deserialize_index(faiss.serialize_index(self.index)))
+            self.lexical = self.lexical.copy()
+            self._shared = False
+
+    def _publish(self):
+        """Make the working state the version readers see, with one reference swap. Caller holds _lock."""
+        self._snapshot = IndexSnapshot(self._snapshot.version + 1, self.index, self.lexical,
+                                       frozenset(self.tombstones))
+        self._shared = True
+
+    def _rollback(self):
+        """Drop unpublished changes: the working state goes back to the published snapshot. Caller holds _lock."""
+        snapshot = self._snapshot
+        self.index, self.lexical, self.tombstones = snapshot.index, snapshot.lexical, set(snapshot.tombstones)
+        self._shared = True
+        self._dedup = None  # rebuilt from the store on next use
+
+    @contextmanager
+    def _reading(self):
+        """
+        Pin the published snapshot for one search (ids and their chunk texts). Rows retired
+        after it was published are not purged until every reader of it has finished.
+        """
+        with self._readers_lock:
+            snapshot = self._snapshot
+            self._readers[snapshot.version] = self._readers.get(snapshot.version, 0) + 1
+        try:
+            yield snapshot
+        finally:
+            with self._readers_lock:
+                left = self._readers.pop(snapshot.version) - 1
+                if left:
+                    self._readers[snapshot.version] = left
+            if self._retired:
+                self._purge_retired()
+
+    def _retire_source_rows(self, filename: str) -> List[str]:
+        """
+        Take a source out of the store's registry once a published version no longer refers to its
+        ids. Its rows are kept under a retired name until no reader holds an older version.
+        Returns the sources that lost chunks they had skipped as duplicates of this one.
+        """
+        version = self._snapshot.version
+        tag = f"{filename}{RETIRED_SUFFIX}{version}"
+        _, stale = self.store.delete_source(filename, retire_as=tag)
+        with self._readers_lock:
+            self._retired.append((version, tag))
+        if stale:
+            print(f"[RAG] {', '.join(stale)} reused chunks of {filename} and must be re-ingested")
+        self._purge_retired()
+        return stale
+
+    def _purge_retired(self):
+        """Delete retired rows that no pinned snapshot can still read"""
+        with self._readers_lock:
+            oldest = min(self._readers, default=None)
+            ready = [tag for version, tag in self._retired if oldest is None or oldest >= version]
+            self._retired = [(version, tag) for version, tag in self._retired
+                             if not (oldest is None or oldest >= version)]
+        for tag in ready:
+            self.store.purge_source(tag)
+
+    def _discard_staging(self, source: Optional[str] = None):
+        """Delete chunks staged by an ingest that failed or was interrupted (all staged sources by default)"""
+        sources = [source] if source else [s for s in self.store.sources() if s.endswith(STAGING_SUFFIX)]
+        for staged in sources:
+            ids, _ = self.store.delete_source(staged)
+            if self._dedup is not None:
+                self._dedup.remove(ids)
+        if source is None:
+            # Rows retired before a restart: no reader can hold an old snapshot any more
+            for retired in [s for s in self.store.sources() if RETIRED_SUFFIX in s]:
+                self.store.purge_source(retired)
+
     def _load_index(self):
         """Load index from disk if exists"""
-        if os.path.exists(INDEX_FILE) and os.path.exists(METADATA_FILE):
+        try:
+            self.store = ChunkStore(CHUNK_STORE_FILE)
+        except Exception as e:
+            print(f"[RAG] Chunk store unavailable ({e}); keeping chunks in memory")
+            self.store = ChunkStore(":memory:")
+        self._discard_staging()
+        self._backfill_metadata()
+        if os.path.exists(INDEX_FILE):
             try:
-                self.index = faiss.read_index(INDEX_FILE)
-                with open(METADATA_FILE, 'rb') as f:
-                    self.metadata = pickle.load(f)
+                self.index = tune_index(self._read_index())
+                if os.path.exists(METADATA_FILE):
+                    self._migrate_pickle()
+                self.tombstones = set(self.store.get_meta("tombstones", []))
+                self.next_id = self.store.get_meta("next_id", 0)
+                self._load_lexical()
+                self._check_consistency()
             except Exception as e:
                 print(f"Error loading index: {e}")
                 self._create_new_index()
         else:
             self._create_new_index()
+        self._publish()
+
+    def _backfill_metadata(self):
+        """Give chunks stored before metadata existed the doc_type/level/campus implied by their file name"""
+        sources = self.store.sources_missing_metadata()
+        for source in sources:
+            self.store.set_source_metadata(source, **source_metadata(source))
+        if sources:
+            print(f"[RAG] Added metadata to chunks of {len(sources)} existing sources")
+
+    def _load_lexical(self):
+        """Load the BM25 index, rebuilding it from chunk texts if missing or out of step"""
+        self.lexical = BM25Index()
+        if os.path.exists(LEXICAL_FILE):
+            try:
+                with open(LEXICAL_FILE, 'rb') as f:
+                    self.lexical = pickle.load(f)
+            except Exception as e:
+                print(f"Error loading lexical index: {e}")
+        chunk_count = len(self.store)
+        if len(self.lexical) != chunk_count:
+            self.lexical = BM25Index()
+            for vector_id, _, text in self.store.iter_chunks():
+                self.lexical.add(vector_id, text)
+            print(f"[RAG] Rebuilt lexical index over {chunk_count} chunks")
+
+    def _migrate_pickle(self):
+        """
+        Move faiss_metadata.pkl into the chunk store. Handles both the ID-keyed format and
+        the original list format (row position = vector position, index not yet ID-mapped).
+        """
+        with open(METADATA_FILE, 'rb') as f:
+            stored = pickle.load(f)
+        self.store.clear()
+        if isinstance(stored, list):
+            self._ensure_writable()
+            ids, vectors = reconstruct_with_ids(self.index)
+            self.index = build_index(vectors, index_kind(self.index), self.dimension, ids=ids)
+            chunks = {vector_id: chunk for vector_id, chunk in enumerate(stored)}
+            tombstones, next_id = [], len(stored)
+        else:
+            chunks = stored["chunks"]
+            tombstones, next_id = sorted(stored.get("tombstones", ())), stored["next_id"]
+        self.store.add((vector_id, chunk["source"], chunk["text"]) for vector_id, chunk in chunks.items())
+        self.store.set_meta(tombstones=tombstones, next_id=next_id)
+        self.tombstones, self.next_id = set(tombstones), next_id
+        self._publish()
+        self._save_index()
+        os.replace(METADATA_FILE, METADATA_FILE + ".migrated")
+        print(f"[RAG] Migrated {len(chunks)} chunks from {METADATA_FILE} to {CHUNK_STORE_FILE}")
+
+    def _check_consistency(self):
+        """Every indexed id must be either live (in the store) or tombstoned"""
+        expected = len(self.store) + len(self.tombstones)
+        if self.index.ntotal != expected:
+            print(f"[RAG] Warning: index holds {self.index.ntotal} vectors but the chunk store accounts for {expected}; "
+                  f"run 'python -m app.engines.rag_engine compact'")
 
     def _create_new_index(self):
-        """Create a new empty index"""
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.metadata = []
+        """Create a new empty index (flat until the corpus crosses RAG_INDEX_SWITCH_THRESHOLD)"""
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+        self._shared = False
+        self.store.clear()
+        self.tombstones = set()
+        self.lexical = BM25Index()
+        self._dedup = None
+        self.next_id = 0
+
+    def _maybe_switch_index(self):
+        """Train and switch to the configured ANN index once the flat index is large enough"""
+        if not should_switch(self.index):
+            return
+        print(f"[RAG] {self.index.ntotal} vectors: switching flat index to {RAG_INDEX_TYPE}...")
+        self._rebuild(RAG_INDEX_TYPE)
+
+    def _rebuild(self, index_type: str):
+        """Rebuild live vectors (dropping tombstones) into an index of the given type, keeping their ids"""
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}' (choose from {', '.join(INDEX_TYPES)})")
+        if index_kind(self.index) in QUANTIZED_TYPES:
+            print(f"[RAG] Warning: rebuilding from {index_kind(self.index)} codes; vectors are approximate. "
+                  f"Re-ingest documents to recover float32 precision.")
+        self._ensure_writable()  # reconstructing an IVF index builds a direct map on it: never on a published one
+        ids, vectors = reconstruct_with_ids(self.index)
+        if self.tombstones:
+            live = ~np.isin(ids, np.fromiter(self.tombstones, dtype="int64"))
+            ids, vectors = ids[live], vectors[live]
+        self.index = build_index(vectors, index_type, self.dimension, ids=ids)
+        self.tombstones = set()
+
+    def rebuild_index(self, index_type: str):
+        """Rebuild the current vectors into an index of the given type (flat/ivf_flat/ivf_pq/hnsw)"""
+        with self._lock:
+            self._rebuild(index_type)
+            self._publish()
+        self._save_index()
+        return index_kind(self.index)
+
+    def tombstone_ratio(self) -> float:
+        return len(self.tombstones) / self.index.ntotal if self.index is not None and self.index.ntotal else 0.0
+
+    def compact(self, force: bool = False) -> bool:
+        """Rebuild the index without tombstoned vectors once they exceed RAG_COMPACT_RATIO"""
+        if not self.tombstones or (not force and self.tombstone_ratio() < RAG_COMPACT_RATIO):
+            return False
+        self.rebuild_index(index_kind(self.index))
+        return True
+
+    def _remove_ids(self, ids: List[int]):
+        """Take chunk ids out of the working index, keyword and dedup indexes. Caller holds _lock."""
+        self._ensure_writable()
+        self.lexical.remove(ids)
+        if self._dedup is not None:
+            self._dedup.remove(ids)
+        if supports_remove(self.index):
+            self.index.remove_ids(np.array(ids, dtype="int64"))
+        else:
+            self.tombstones.update(ids)
+            if self.tombstone_ratio() >= RAG_COMPACT_RATIO:
+                print(f"[RAG] {len(self.tombstones)} tombstones ({self.tombstone_ratio():.0%} of the index); "
+                      f"run 'python -m app.engines.rag_engine compact'")
+
+    def remove_source(self, filename: str, save: bool = True) -> Tuple[int, List[str]]:
+        """
+        Delete every vector and chunk that came from a source file. Returns (number removed,
+        stale sources): files that skipped chunks as duplicates of this one and now need re-ingesting.
+        """
+        with self._lock:
+            ids = self.store.ids_for_source(filename)
+            if ids:
+                self._remove_ids(ids)
+                self._publish()
+            stale = self._retire_source_rows(filename)
+        if ids and save:
+            self._save_index()
+        return len(ids), stale
 
     def _save_index(self):
-        """Save index to disk"""
+        """
+        Save the published snapshot's index and lexical index to disk. Snapshots are immutable, so
+        neither readers nor writers are blocked while they serialize.
+        Files are written to a temp file and renamed over the old one, so a crash never leaves a
+        half-written index and processes that mmap the old file keep a valid mapping.
+        """
         if not os.path.exists(KNOWLEDGE_BASE_DIR):
             os.makedirs(KNOWLEDGE_BASE_DIR)
-        faiss.write_index(self.index, INDEX_FILE)
-        with open(METADATA_FILE, 'wb') as f:
-            pickle.dump(self.metadata, f)
+        with self._save_lock:
+            snapshot = self._snapshot
+            index_bytes = faiss.serialize_index(snapshot.index)
+            lexical_bytes = pickle.dumps(snapshot.lexical)
+            tombstones, next_id = sorted(snapshot.tombstones), self.next_id
+            for path, data in ((INDEX_FILE, index_bytes.tobytes()), (LEXICAL_FILE, lexical_bytes)):
+                with open(path + ".tmp", 'wb') as f:
+                    f.write(data)
+                os.replace(path + ".tmp", path)
+            self.store.set_meta(tombstones=tombstones, next_id=next_id)
+
+    def extract_text(self, file_path: str, progress: Optional[Callable] = None) -> str:
+        """Extract plain text from a PDF, TXT, CSV or DOCX file (ingestion streams it instead)"""
+        return "".join(text for text, _ in iter_segments(file_path, progress))
+
+    def chunk_text(self, text: str) -> List[str]:
+        """Chunking (Simple)"""
+        return list(iter_chunks([text]))
+
+    def embed_chunks(self, chunks: List[str], batch_size: int = RAG_EMBED_BATCH_SIZE,
+                     progress: Optional[Callable] = None) -> np.ndarray:
+        """Encode chunks in batches, reporting progress after each batch"""
+        embeddings = np.zeros((len(chunks), self.dimension), dtype='float32')
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            embeddings[start:start + len(batch)] = self.model.encode(batch, batch_size=batch_size)
+            if progress:
+                progress(chunks_embedded=start + len(batch))
+        return embeddings
+
+    def _append_chunks(self, source: str, chunks: List[str], embeddings: np.ndarray,
+                       hashes: Optional[List] = None, metadata: Optional[List[Dict]] = None) -> List[int]:
+        """
+        Add one batch of chunks under new ids (index, store, keyword and dedup indexes); returns the ids.
+        metadata: per chunk {doc_type, level, campus, page}.
+        """
+        with self._lock:
+            ids = np.arange(self.next_id, self.next_id + len(chunks), dtype='int64')
+            if len(chunks):
+                self._ensure_writable()
+                self.index.add_with_ids(np.ascontiguousarray(embeddings, dtype='float32'), ids)
+            self.next_id += len(chunks)
+            
+            hashes = hashes or [(None, None)] * len(chunks)
+            metadata = metadata or [{}] * len(chunks)
+            self.store.add((vector_id, source, chunk, digest, None if signature is None else signature.tobytes(),
+                            meta.get("doc_type"), meta.get("level"), meta.get("campus"), meta.get("page"))
+                           for vector_id, chunk, (digest, signature), meta
+                           in zip(ids.tolist(), chunks, hashes, metadata))
+            for vector_id, chunk in zip(ids.tolist(), chunks):
+                self.lexical.add(vector_id, chunk)
+            if self._dedup is not None:
+                for vector_id, (digest, signature) in zip(ids.tolist(), hashes):
+                    if digest is not None:
+                        self._dedup.add(vector_id, digest, signature)
+        return ids.tolist()
+
+    def _commit_source(self, filename: str, staging: str, manifest: Dict, duplicates: List) -> List[str]:
+        """
+        Publish the staged chunks in place of the file's previous ones as one new version, then
+        retire the old rows, record the manifest and persist. Returns the stale sources (see
+        remove_source). Caller holds _lock.
+        """
+        # Re-uploading a file replaces its previous vectors
+        previous = self.store.ids_for_source(filename)
+        if previous:
+            self._remove_ids(previous)
+        self._maybe_switch_index()
+        self._publish()
+        stale = self._retire_source_rows(filename)
+        self.store.rename_source(staging, filename)
+        self._filter_generation += 1
+        self.store.record_file(filename, manifest["sha256"], manifest["size"], manifest["chunks"],
+                               duplicates, time.time())
+        self._save_index()
+        return stale
+
+    def ingest(self, file_path: str, progress: Optional[Callable] = None) -> Dict:
+        """
+        Ingest a file (PDF, TXT, CSV or DOCX) into the vector DB. Raises on failure.
+        Streams pages -> chunks -> embedding batches -> index, so memory is bounded by the batch size.
+        Batches go into a private copy of the index (chunk rows under a temporary source name);
+        searches keep using the published version until the whole file is in and the new
+        version is swapped in. Other writers wait; readers never do.
+        progress(**fields) is called with pages_done/pages_total, chunks_total, chunks_embedded, vectors_added.
+        The result's stale_dependents lists files that lost chunks of the replaced version and
+        must be re-ingested.
+        """
+        if not self.enabled:
+            raise RuntimeError("RAG engine is disabled")
+        
+        filename = os.path.basename(file_path)
+        manifest = {"sha256": file_hash(file_path), "size": os.path.getsize(file_path), "chunks": 0}
+        previous = self.store.files().get(filename)
+        if previous and previous["sha256"] == manifest["sha256"]:
+            print(f"[RAG] {filename} unchanged since last ingest; skipped")
+            return {"chunks": previous["chunks"], "vectors_added": 0, "unchanged": True}
+        
+        staging = filename + STAGING_SUFFIX
+        source_meta = source_metadata(filename)
+        added, duplicates, near = 0, [], 0
+        with self._lock:
+            try:
+                self._discard_staging(staging)
+                previous_ids = set(self.store.ids_for_source(filename))
+                chunks = iter_chunks_with_meta(iter_segments(file_path, progress))
+                for batch in batched(chunks, RAG_EMBED_BATCH_SIZE):
+                    manifest["chunks"] += len(batch)
+                    # Chunk metadata: the file's doc_type/level/campus unless the chunk's rows say otherwise
+                    metadata = [dict(source_meta, page=meta.get("page"),
+                                     level=meta.get("level") or source_meta["level"],
+                                     campus=meta.get("campus") or source_meta["campus"]) for _, meta in batch]
+                    batch = [chunk for chunk, _ in batch]
+                    kept, hashes, skipped = list(range(len(batch))), None, []
+                    if DEDUP_ENABLED:
+                        # Drop exact and near duplicates of stored chunks (including earlier batches of this file)
+                        kept, skipped, digests, signatures = self._dedup_index().filter(batch, ignore=previous_ids)
+                        hashes = [(digests[p], signatures[p]) for p in kept]
+                    texts = [batch[p] for p in kept]
+                    embeddings = self.model.encode(texts, batch_size=RAG_EMBED_BATCH_SIZE) if texts else None
+                    ids = self._append_chunks(staging, texts, embeddings, hashes, [metadata[p] for p in kept])
+                    added += len(ids)
+                    if skipped:
+                        id_of = {p: vector_id for p, vector_id in zip(kept, ids)}
+                        resolved = [(pos, id_of[-ref - 1] if ref < 0 else ref, kind) for pos, kind, ref in skipped]
+                        duplicates.extend((canonical, kind) for _, canonical, kind in resolved)
+                        near += sum(1 for _, kind, _ in skipped if kind == "near")
+                        # The kept chunk now answers for this one too, so it must pass this chunk's filters
+                        self.store.widen_metadata((canonical, metadata[pos]["level"], metadata[pos]["campus"])
+                                                  for pos, canonical, _ in resolved)
+                    if progress:
+                        progress(chunks_total=manifest["chunks"], chunks_embedded=added)
+                
+                if not manifest["chunks"]:
+                    raise ValueError("No extractable text")
+                stale = self._commit_source(filename, staging, manifest, duplicates)
+            except Exception:
+                self._rollback()
+                self._discard_staging(staging)
+                raise
+        
+        if duplicates:
+            print(f"[RAG] {filename}: skipped {len(duplicates)} duplicate chunks ({near} near)")
+        if progress:
+            progress(vectors_added=added)
+        return {"chunks": manifest["chunks"], "vectors_added": added, "duplicates_skipped": len(duplicates),
+                "stale_dependents": stale}
+
+    def _dedup_index(self) -> DedupIndex:
+        """Build the dedup index from stored hashes on first use, backfilling chunks stored without one"""
+        with self._lock:
+            if self._dedup is None:
+                dedup, backfill = DedupIndex(), []
+                for vector_id, text, digest, signature in self.store.iter_signatures():
+                    if digest is None or signature is None:
+                        digest, signature = chunk_hash(text), minhash(text)
+                        backfill.append((vector_id, digest, signature.tobytes()))
+                    else:
+                        signature = np.frombuffer(signature, dtype=np.uint32)
+                    dedup.add(vector_id, digest, signature)
+                if backfill:
+                    self.store.set_hashes(backfill)
+                    print(f"[RAG] Hashed {len(backfill)} existing chunks for dedup")
+                self._dedup = dedup
+            return self._dedup
+
+    def _live_sources(self) -> Dict[str, int]:
+        """Stored sources, without chunks being staged or retired"""
+        return {source: count for source, count in self.store.sources().items()
+                if not source.endswith(STAGING_SUFFIX) and RETIRED_SUFFIX not in source}
+
+    def plan_sync(self, directory: Optional[str] = None) -> Dict[str, List[str]]:
+        """
+        Compare the knowledge-base folder with the manifest: new and changed files (by sha256)
+        need ingesting, sources whose file is gone need removing.
+        """
+        directory = directory or KNOWLEDGE_BASE_DIR
+        files = {}
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if name.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.isfile(path):
+                    files[name] = path
+        manifest = self.store.files()
+        known = set(manifest) | set(self._live_sources())
+        plan = {"new": [], "changed": [], "unchanged": [],
+                "removed": sorted(source for source in known if source not in files)}
+        for name, path in files.items():
+            if name not in manifest:
+                plan["new" if name not in known else "changed"].append(path)
+            elif manifest[name]["sha256"] != file_hash(path):
+                plan["changed"].append(path)
+            else:
+                plan["unchanged"].append(path)
+        return plan
+
+    def sync(self, directory: Optional[str] = None) -> Dict:
+        """
+        Ingest new/changed files and remove vanished ones; unchanged files are not re-embedded.
+        Files left stale by a removal or replacement are re-ingested too (each at most once).
+        """
+        directory = directory or KNOWLEDGE_BASE_DIR
+        plan = self.plan_sync(directory)
+        report = {"ingested": [], "failed": {}, "unchanged": len(plan["unchanged"]), "removed": plan["removed"],
+                  "vectors_added": 0, "duplicates_skipped": 0}
+        for source in plan["removed"]:
+            self.remove_source(source)
+        if plan["removed"]:
+            # Files whose duplicates pointed at removed chunks just lost their manifest entry
+            plan = dict(self.plan_sync(directory), removed=plan["removed"])
+            report["unchanged"] = len(plan["unchanged"])
+        pending, requeued = plan["new"] + plan["changed"], set()
+        while pending:
+            path = pending.pop(0)
+            try:
+                result = self.ingest(path)
+            except Exception as e:
+                report["failed"][os.path.basename(path)] = str(e)
+                continue
+            report["ingested"].append(os.path.basename(path))
+            report["vectors_added"] += result["vectors_added"]
+            report["duplicates_skipped"] += result.get("duplicates_skipped", 0)
+            for source in result.get("stale_dependents", []):
+                stale_path = os.path.join(directory, source)
+                if stale_path not in pending and source not in requeued and os.path.isfile(stale_path):
+                    requeued.add(source)
+                    pending.append(stale_path)
+        return report
 
     def ingest_file(self, file_path: str) -> bool:
         """
-        Ingest a file (PDF or TXT) into the vector DB
+        Ingest a file (PDF, TXT, CSV or DOCX) into the vector DB
         """
         if not self.enabled: return False
         
         try:
-            filename = os.path.basename(file_path)
-            ext = filename.split('.')[-1].lower()
-            text = ""
-            
-            # Extract Text
-            if ext == 'pdf':
-                with open(file_path, 'rb') as f:
-                    reader = PyPDF2.PdfReader(f)
-                    for page in reader.pages:
-                        extracted = page.extract_text()
-                        if extracted:
-                            text += extracted + "\n"
-            elif ext == 'txt':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
-            elif ext == 'csv':
-                import csv
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                    text = "\n".join([",".join(row) for row in rows])
-            else:
-                return False
-            
-            if not text.strip(): return False
-            
-            # Chunking (Simple)
-            chunk_size = 500
-            overlap = 50
-            chunks = []
-            
-            for i in range(0, len(text), chunk_size - overlap):
-                batch = text[i:i+chunk_size]
-                if len(batch) > 50: # Ignore very small validation chunks
-                    chunks.append(batch)
-            
-            if not chunks: return False
-
-            # Embed and Add to FAISS
-            embeddings = self.model.encode(chunks)
-            self.index.add(np.array(embeddings).astype('float32'))
-            
-            # Update Metadata
-            for chunk in chunks:
-                self.metadata.append({"text": chunk, "source": filename})
-            
-            # Save persistently
-            self._save_index()
+            self.ingest(file_path)
             return True
-            
         except Exception as e:
             print(f"Error ingesting file {file_path}: {e}")
             return False
 
-    def search(self, query: str, n_results=3) -> str:
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Query embeddings through the LRU cache; uncached queries are encoded in one batch,
+        shared with other request threads' queries when micro-batching is on
+        """
+        encoder = self.query_batcher.encode if self.query_batcher else self.model.encode
+        return self.embedding_cache.get_many(queries, encoder)
+
+    def _filter_candidates(self, snapshot: IndexSnapshot, filters: Optional[tuple]) -> Optional[FilterCandidates]:
+        """Ids allowed by normalized filters (None = no filtering), cached per snapshot version"""
+        if filters is None:
+            return None
+        key = (snapshot.version, self._filter_generation, filters)
+        with self._filter_lock:
+            candidates = self._filter_cache.get(key)
+            if candidates is not None:
+                self._filter_cache.move_to_end(key)
+                return candidates
+        ids = self.store.ids_matching(filters)
+        candidates = FilterCandidates(set(ids), faiss.IDSelectorBatch(np.array(ids, dtype="int64")))
+        with self._filter_lock:
+            self._filter_cache[key] = candidates
+            while len(self._filter_cache) > RAG_FILTER_CACHE_SIZE:
+                self._filter_cache.popitem(last=False)
+        return candidates
+
+    def _vector_ids(self, snapshot: IndexSnapshot, query_vectors: np.ndarray, k: int,
+                    candidates: Optional[FilterCandidates] = None) -> List[List[int]]:
+        """
+        Top-k live chunk ids for each query vector (skipping tombstoned ids). With candidates, FAISS
+        only scores the allowed ids (an IDSelector), so a narrow filter scans a fraction of the index.
+        """
+        query_vectors = np.ascontiguousarray(query_vectors, dtype='float32')
+        # Over-fetch so tombstoned hits do not leave the result short
+        fetch = min(k + len(snapshot.tombstones), snapshot.index.ntotal)
+        if candidates is None:
+            D, I = snapshot.index.search(query_vectors, k=fetch)
+        elif not candidates.ids:
+            return [[] for _ in query_vectors]
+        elif supports_selector(snapshot.index):
+            params = search_params(snapshot.index, candidates.selector)
+            D, I = snapshot.index.search(query_vectors, k=min(fetch, len(candidates.ids)), params=params)
+        else:
+            # No selector support (PQ): widen the search in proportion to the filter, then drop the rest
+            fetch = min(snapshot.index.ntotal, fetch * max(2, 2 * snapshot.index.ntotal // len(candidates.ids)))
+            D, I = snapshot.index.search(query_vectors, k=fetch)
+            I = [[idx for idx in row if int(idx) in candidates.ids] for row in I]
+        return [[int(idx) for idx in row if idx != -1 and int(idx) not in snapshot.tombstones][:k] for row in I]
+
+    def _lexical_fast_path(self, hits, coverage: float) -> bool:
+        """Skip embedding when the best keyword hit contains (nearly) every query term and clearly leads"""
+        if RAG_LEXICAL_FASTPATH_COVERAGE <= 0 or not hits or coverage < RAG_LEXICAL_FASTPATH_COVERAGE:
+            return False
+        return len(hits) == 1 or hits[0][1] >= RAG_LEXICAL_FASTPATH_MARGIN * hits[1][1]
+
+    def _retrieve(self, queries: List[str], n_results: int, filters: Optional[Dict] = None,
+                  snapshot: Optional[IndexSnapshot] = None) -> List[List[int]]:
+        """
+        Chunk ids per query: lexical-only when keyword confidence is high, otherwise
+        vector search fused with BM25 by weighted reciprocal rank fusion.
+        Both sides read one published snapshot, so ids always come from the same version;
+        pass the snapshot pinned by _reading() to look their texts up afterwards.
+        filters ({source, doc_type, level, campus}: value or list) restrict both sides to matching chunks.
+        """
+        snapshot = snapshot or self._snapshot
+        candidates = self._filter_candidates(snapshot, normalize_filters(filters))
+        counts = {"filtered": len(queries) if candidates is not None else 0}
+        hybrid = RAG_HYBRID_WEIGHT > 0 and len(snapshot.lexical) > 0
+        fetch = max(n_results, RAG_HYBRID_CANDIDATES) if hybrid else n_results
+        results: List[Optional[List[int]]] = [None] * len(queries)
+        lexical_hits = [[] for _ in queries]
+        
+        if hybrid:
+            for i, query in enumerate(queries):
+                hits, coverage = snapshot.lexical.search(query, fetch,
+                                                         allowed=candidates.ids if candidates else None)
+                lexical_hits[i] = [doc_id for doc_id, _ in hits]
+                if self._lexical_fast_path(hits, coverage):
+                    results[i] = lexical_hits[i][:n_results]
+                    counts["lexical_only"] = counts.get("lexical_only", 0) + 1
+        
+        pending = [i for i, ids in enumerate(results) if ids is None]
+        if pending:
+            query_vectors = self.embed_queries([queries[i] for i in pending])
+            vector_hits = self._vector_ids(snapshot, query_vectors, fetch, candidates)
+            for i, vector_ids in zip(pending, vector_hits):
+                if hybrid and lexical_hits[i]:
+                    fused = reciprocal_rank_fusion([(vector_ids, 1 - RAG_HYBRID_WEIGHT),
+                                                    (lexical_hits[i], RAG_HYBRID_WEIGHT)])
+                    results[i] = fused[:n_results]
+                    counts["hybrid"] = counts.get("hybrid", 0) + 1
+                else:
+                    results[i] = vector_ids[:n_results]
+                    counts["vector_only"] = counts.get("vector_only", 0) + 1
+        with self._filter_lock:
+            for key, n in counts.items():
+                self._retrieval_stats[key] += n
+        return results
+
+    def _texts(self, ids: List[int]) -> str:
+        texts = self.store.get_texts(ids)
+        return "\n\n".join(texts[i] for i in ids if i in texts)
+
+    def search(self, query: str, n_results=3, filters: Optional[Dict] = None) -> str:
         """
-        Search for relevant context
+        Search for relevant context, optionally restricted by chunk metadata, e.g.
+        filters={"level": ["postgraduate_coursework", "postgraduate"], "doc_type": "academic_calendar"}.
+        Chunks without a level/campus are general and match any level/campus filter.
         """
-        if not self.enabled or self.index is None or self.index.ntotal == 0:
+        if not self.enabled or self._snapshot.index is None or self._snapshot.index.ntotal == 0:
             return ""
         
         try:
-            query_vector = self.model.encode([query])
-            D, I = self.index.search(np.array(query_vector).astype('float32'), k=n_results)
-            
-            results = []
-            for idx in I[0]:
-                if idx != -1 and idx < len(self.metadata):
-                    results.append(self.metadata[idx]['text'])
-            
-            return "\n\n".join(results)
+            with self._reading() as snapshot:
+                return self._texts(self._retrieve([query], n_results, filters, snapshot)[0])
             
         except Exception as e:
             print(f"RAG Search Error: {e}")
             return ""
 
-# Singleton
-rag_engine = RAGEngine()
+    def search_many(self, queries: List[str], n_results=3, filters: Optional[Dict] = None) -> List[str]:
+        """
+        Search several queries at once (one batched encode for the uncached ones, one FAISS call)
+        """
+        if not queries:
+            return []
+        if not self.enabled or self._snapshot.index is None or self._snapshot.index.ntotal == 0:
+            return [""] * len(queries)
+        
+        try:
+            with self._reading() as snapshot:
+                return [self._texts(ids) for ids in self._retrieve(queries, n_results, filters, snapshot)]
+            
+        except Exception as e:
+            print(f"RAG Search Error: {e}")
+            return [""] * len(queries)
+
+    def get_stats(self) -> Dict:
+        snapshot = self._snapshot  # no lock, so stats stay available during a long ingest
+        if not self.enabled or snapshot.index is None:
+            return {"enabled": False}
+        stats = {
+            "enabled": True,
+            "version": snapshot.version,
+            "index_type": index_kind(snapshot.index),
+            "vectors": snapshot.index.ntotal,
+            "bytes_per_vector": round(bytes_per_vector(snapshot.index), 1),
+            "chunks": len(self.store),
+            "sources": len(self._live_sources()),
+            "retired_pending": len(self._retired),
+            "tombstones": len(snapshot.tombstones),
+            "dedup": self._dedup_stats(snapshot),
+            "lexical_terms": len(snapshot.lexical.postings),
+            "retrieval": dict(self._retrieval_snapshot(), hybrid_weight=RAG_HYBRID_WEIGHT,
+                              cached_filters=len(self._filter_cache))
+        }
+        stats["embedding_cache"] = self.embedding_cache.get_stats()
+        if self.query_batcher:
+            stats["embedding_batcher"] = self.query_batcher.get_stats()
+        return stats
+
+    def _retrieval_snapshot(self) -> Dict:
+        with self._filter_lock:
+            return dict(self._retrieval_stats)
+
+    def _dedup_stats(self, snapshot: IndexSnapshot) -> Dict:
+        """Vectors not stored because the chunk duplicated an existing one, and the index bytes that saves"""
+        counts = self.store.duplicate_count()
+        saved = sum(counts.values())
+        return {"enabled": DEDUP_ENABLED, "files": len(self.store.files()), "exact": counts.get("exact", 0),
+                "near": counts.get("near", 0), "vectors_saved": saved,
+                "bytes_saved": int(saved * bytes_per_vector(snapshot.index))}
+
+    def warm_up(self):
+        """Load the model and index ahead of the first request and run one encode to initialise torch"""
+        if self.enabled:
+            self.model.encode(["warm up"])
+        return self.enabled
+
+# Singleton (built on first use; see main.py for the optional warm-up)
+rag_engine = LazyProxy(RAGEngine, "rag_engine")
 
 if __name__ == "__main__":
-    if HAS_DEPENDENCIES:
-        print("Dependencies found. Initializing FAISS RAG...")
-    else:
+    import sys
+    if not HAS_DEPENDENCIES:
         print("RAG dependencies missing.")
+    elif len(sys.argv) > 2 and sys.argv[1] in ("rebuild", "migrate"):
+        # python -m app.engines.rag_engine rebuild hnsw
+        # python -m app.engines.rag_engine migrate sq8   (convert faiss_index.bin to compressed storage)
+        before = bytes_per_vector(rag_engine.index)
+        kind = rag_engine.rebuild_index(sys.argv[2])
+        print(f"Rebuilt index as {kind} ({rag_engine.index.ntotal} vectors, "
+              f"{before:.0f} -> {bytes_per_vector(rag_engine.index):.0f} bytes/vector)")
+    elif len(sys.argv) > 1 and sys.argv[1] == "sync":
+        # python -m app.engines.rag_engine sync   (ingest new/changed files in data/knowledge_base)
+        report = rag_engine.sync()
+        print(f"Synced: {len(report['ingested'])} ingested, {report['unchanged']} unchanged, "
+              f"{len(report['removed'])} removed, {len(report['failed'])} failed; "
+              f"{report['vectors_added']} vectors added, {report['duplicates_skipped']} duplicate chunks skipped")
+        for name, error in report["failed"].items():
+            print(f"  {name}: {error}")
+        print(f"Dedup totals: {rag_engine.get_stats()['dedup']}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "compact":
+        # python -m app.engines.rag_engine compact [--force]
+        before = rag_engine.index.ntotal
+        if rag_engine.compact(force="--force" in sys.argv):
+            print(f"Compacted index: {before} -> {rag_engine.index.ntotal} vectors")
+        else:
+            print(f"Nothing to compact ({len(rag_engine.tombstones)} tombstones, "
+                  f"{rag_engine.tombstone_ratio():.0%} < {RAG_COMPACT_RATIO:.0%}; use --force)")
+    else:
+        print("Dependencies found. Initializing FAISS RAG...")
+        print(f"Index: {index_kind(rag_engine.index)}, {rag_engine.index.ntotal} vectors, "
+              f"{len(rag_engine.store.sources())} sources, {len(rag_engine.tombstones)} tombstones")
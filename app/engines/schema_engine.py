@@ -0,0 +1,113 @@
+"""
+Schema Engine - sampled field inventory of the student collection
+Field names, BSON types and fill rates are computed server-side over a $sample
+of documents (one aggregation that returns per-field counts, not documents),
+cached, and refreshed in the background once stale, instead of downloading the
+whole collection to read the keys of its first document.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.utils.lazy_utils import LazyProxy
+
+# Configuration (override via .env)
+SCHEMA_SAMPLE_SIZE = int(os.getenv("SCHEMA_SAMPLE_SIZE", "500"))
+SCHEMA_REFRESH_SECONDS = float(os.getenv("SCHEMA_REFRESH_SECONDS", "3600"))  # served stale while refreshing
+
+
+def schema_pipeline(sample_size: int = SCHEMA_SAMPLE_SIZE) -> List[Dict]:
+    """$sample N documents, then count (field, type) pairs and the documents actually sampled"""
+    return [
+        {"$sample": {"size": sample_size}},
+        {"$facet": {
+            "fields": [
+                {"$project": {"kv": {"$objectToArray": "$$ROOT"}}},
+                {"$unwind": "$kv"},
+                {"$group": {"_id": {"field": "$kv.k", "type": {"$type": "$kv.v"}}, "count": {"$sum": 1}}},
+            ],
+            "sampled": [{"$count": "n"}],
+        }},
+    ]
+
+
+def summarize(result: Dict) -> Dict:
+    """Facet result -> {"sampled", "fields": [{"name", "types", "fill_rate"}]} (most filled first)"""
+    sampled = (result.get("sampled") or [{"n": 0}])[0]["n"]
+    fields: Dict[str, Dict[str, int]] = {}
+    for row in result.get("fields", []):
+        fields.setdefault(row["_id"]["field"], {})[row["_id"]["type"]] = row["count"]
+    summary = []
+    for name, types in fields.items():
+        filled = sum(count for bson_type, count in types.items() if bson_type != "null")
+        summary.append({"name": name, "types": types, "fill_rate": round(filled / sampled, 4) if sampled else 0.0})
+    summary.sort(key=lambda field: (-field["fill_rate"], field["name"]))
+    return {"sampled": sampled, "fields": summary}
+
+
+class SchemaEngine:
+    def __init__(self, db=None, sample_size: int = SCHEMA_SAMPLE_SIZE, max_age: float = SCHEMA_REFRESH_SECONDS):
+        self._db = db
+        self.sample_size = sample_size
+        self.max_age = max_age
+        self.schema: Optional[Dict] = None
+        self._refreshing = threading.Lock()
+        self._stats = {"refreshes": 0, "refresh_errors": 0, "stale_served": 0}
+
+    @property
+    def db(self):
+        if self._db is None:
+            from .db_engine import db_engine
+            self._db = db_engine
+        return self._db
+
+    def refresh(self) -> Optional[Dict]:
+        """Sample the collection now; keeps the previous schema if it fails"""
+        if not self.db.connected or self.db.student_coll is None:
+            return self.schema
+        with self._refreshing:
+            started = time.perf_counter()
+            try:
+                result = next(self.db.student_coll.aggregate(schema_pipeline(self.sample_size), allowDiskUse=True), {})
+                schema = summarize(result)
+                schema["estimated_documents"] = self.db.student_coll.estimated_document_count()
+            except Exception as e:
+                self._stats["refresh_errors"] += 1
+                print(f"[Schema] Sampling failed: {e}")
+                return self.schema
+            schema["built_at"] = time.time()
+            schema["build_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.schema = schema
+            self._stats["refreshes"] += 1
+            print(f"[Schema] {len(schema['fields'])} fields from {schema['sampled']} sampled documents "
+                  f"in {schema['build_ms']:.0f} ms")
+            return schema
+
+    def get(self) -> Optional[Dict]:
+        """Cached schema; the first call samples, later stale calls refresh in the background"""
+        schema = self.schema
+        if schema is None:
+            return self.refresh()
+        if time.time() - schema["built_at"] > self.max_age and not self._refreshing.locked():
+            self._stats["stale_served"] += 1
+            threading.Thread(target=self.refresh, name="schema-refresh", daemon=True).start()
+        return schema
+
+    def field_names(self) -> List[str]:
+        schema = self.get()
+        return [field["name"] for field in schema["fields"]] if schema else []
+
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        schema = self.schema
+        if schema:
+            stats.update(fields=len(schema["fields"]), sampled=schema["sampled"],
+                         estimated_documents=schema.get("estimated_documents"), build_ms=schema["build_ms"],
+                         built_at=datetime.fromtimestamp(schema["built_at"]).isoformat(timespec="seconds"))
+        return stats
+
+
+# Singleton (samples on first use)
+schema_engine = LazyProxy(SchemaEngine, "schema_engine")
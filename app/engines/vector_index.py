@@ -0,0 +1,189 @@
+"""
+Vector Index - FAISS index construction and tuning for RAGEngine
+Supports flat (exact), IVF-Flat, IVF-PQ and HNSW indexes, plus compressed
+flat storage: scalar quantization (fp16 / int8) and product quantization.
+Kept free of the embedding model so benchmarks can import it cheaply.
+"""
+import os
+from typing import Optional
+
+import numpy as np
+
+try:
+    import faiss
+    HAS_FAISS = True
+except ImportError:
+    HAS_FAISS = False
+
+INDEX_TYPES = ["flat", "sq_fp16", "sq8", "pq", "ivf_flat", "ivf_pq", "hnsw"]
+QUANTIZED_TYPES = {"sq_fp16", "sq8", "pq", "ivf_pq"}  # reconstructing these gives approximate vectors
+
+# Configuration (override via .env)
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat").lower()          # target type once the corpus is large
+RAG_INDEX_SWITCH_THRESHOLD = int(os.getenv("RAG_INDEX_SWITCH_THRESHOLD", "20000"))  # stay flat below this
+RAG_NLIST = int(os.getenv("RAG_NLIST", "0"))                           # 0 = 4 * sqrt(ntotal)
+RAG_NPROBE = int(os.getenv("RAG_NPROBE", "16"))
+RAG_PQ_M = int(os.getenv("RAG_PQ_M", "48"))                            # sub-quantizers, must divide the dimension
+RAG_HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+RAG_EF_CONSTRUCTION = int(os.getenv("RAG_EF_CONSTRUCTION", "80"))
+RAG_EF_SEARCH = int(os.getenv("RAG_EF_SEARCH", "64"))
+
+MIN_POINTS_PER_CENTROID = 39  # FAISS warns below this
+
+
+def choose_nlist(ntotal: int, nlist: int = RAG_NLIST) -> int:
+    """Number of IVF cells: configured value, else 4*sqrt(n), capped so each cell gets enough training points."""
+    if nlist <= 0:
+        nlist = int(4 * np.sqrt(max(ntotal, 1)))
+    return max(1, min(nlist, ntotal // MIN_POINTS_PER_CENTROID))
+
+
+def index_kind(index) -> str:
+    """Best-effort name of an index's type (unwrapping ID maps)."""
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(inner, faiss.IndexScalarQuantizer):
+        return "sq_fp16" if inner.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    if isinstance(inner, faiss.IndexPQ):
+        return "pq"
+    return "flat"
+
+
+def create_index(index_type: str, dimension: int, ntotal: int = 0):
+    """Create an empty (untrained) index of the requested type."""
+    if index_type == "ivf_flat":
+        quantizer = faiss.IndexFlatL2(dimension)
+        return faiss.IndexIVFFlat(quantizer, dimension, choose_nlist(ntotal))
+    if index_type == "ivf_pq":
+        quantizer = faiss.IndexFlatL2(dimension)
+        return faiss.IndexIVFPQ(quantizer, dimension, choose_nlist(ntotal), RAG_PQ_M, 8)
+    if index_type == "sq_fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    if index_type == "pq":
+        return faiss.IndexPQ(dimension, RAG_PQ_M, 8)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, RAG_HNSW_M)
+        index.hnsw.efConstruction = RAG_EF_CONSTRUCTION
+        return index
+    return faiss.IndexFlatL2(dimension)
+
+
+def build_index(vectors: np.ndarray, index_type: str, dimension: Optional[int] = None,
+                ids: Optional[np.ndarray] = None):
+    """
+    Create, train (if needed) and fill an index from float32 vectors.
+    When ids are given the index is wrapped in IndexIDMap2 so vectors can be removed by id.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    dimension = dimension or vectors.shape[1]
+    index = create_index(index_type, dimension, len(vectors))
+    if not index.is_trained:
+        index.train(vectors)
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+        if len(vectors):
+            index.add_with_ids(vectors, np.ascontiguousarray(ids, dtype="int64"))
+    elif len(vectors):
+        index.add(vectors)
+    tune_index(index)
+    return index
+
+
+def tune_index(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply query-time knobs (nprobe for IVF, efSearch for HNSW)."""
+    nprobe = nprobe or RAG_NPROBE
+    ef_search = ef_search or RAG_EF_SEARCH
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(nprobe, inner.nlist)
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+    return index
+
+
+def supports_selector(index) -> bool:
+    """IndexPQ cannot restrict its scan to an IDSelector; every other type here can."""
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    return not isinstance(inner, faiss.IndexPQ)
+
+
+def search_params(index, selector):
+    """
+    Search parameters that restrict a search to the ids in `selector` (e.g. IDSelectorBatch),
+    carrying the index's current nprobe/efSearch. Keep a reference to the selector while searching.
+    """
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if isinstance(inner, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=inner.nprobe)
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=inner.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def should_switch(index, target_type: str = RAG_INDEX_TYPE, threshold: int = RAG_INDEX_SWITCH_THRESHOLD) -> bool:
+    """True when a flat index has grown past the threshold and a different type is configured."""
+    if target_type not in INDEX_TYPES or target_type == "flat":
+        return False
+    return index_kind(index) == "flat" and index.ntotal >= threshold
+
+
+def reconstruct_all(index) -> np.ndarray:
+    """Return every stored vector in insertion order (float32). Approximate for QUANTIZED_TYPES."""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype="float32")
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexIVF):
+        inner.make_direct_map()
+    vectors = inner.reconstruct_n(0, index.ntotal)
+    if isinstance(inner, faiss.IndexIVF):
+        inner.make_direct_map(False)  # remove_ids is not supported with an array direct map
+    return vectors
+
+
+def reconstruct_with_ids(index):
+    """Return (ids, vectors) for an ID-mapped index; plain indexes get positional ids."""
+    vectors = reconstruct_all(index)
+    if hasattr(index, "id_map"):
+        ids = faiss.vector_to_array(index.id_map).astype("int64")
+    else:
+        ids = np.arange(index.ntotal, dtype="int64")
+    return ids, vectors
+
+
+def bytes_per_vector(index) -> float:
+    """In-memory bytes per stored vector: codes plus per-vector structure (list ids, graph links)."""
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else faiss.downcast_index(index)
+    id_map = 8 if hasattr(index, "id_map") else 0
+    if isinstance(inner, faiss.IndexHNSW):
+        storage = faiss.downcast_index(inner.storage)
+        return storage.code_size + inner.hnsw.nb_neighbors(0) * 4 + id_map  # level-0 links dominate
+    if isinstance(inner, faiss.IndexIVF):
+        return inner.code_size + 8 + id_map  # plus the inverted-list id
+    return getattr(inner, "code_size", 4 * index.d) + id_map
+
+
+def migrate_index_file(source: str, destination: str, index_type: str):
+    """Convert a saved index (e.g. float32 faiss_index.bin) to another type, keeping ids. Returns the new index."""
+    index = faiss.read_index(source)
+    if index_kind(index) in QUANTIZED_TYPES:
+        print(f"Warning: {source} is already {index_kind(index)}; vectors are reconstructed approximately")
+    ids, vectors = reconstruct_with_ids(index)
+    migrated = build_index(vectors, index_type, index.d, ids=ids if hasattr(index, "id_map") else None)
+    faiss.write_index(migrated, destination + ".tmp")
+    os.replace(destination + ".tmp", destination)
+    return migrated
+
+
+def supports_remove(index) -> bool:
+    """
+    Flat and quantized-flat indexes renumber on remove_ids. HNSW graphs cannot delete nodes, and
+    IVF lists keep their positional ids, which breaks IndexIDMap2's id map, so both use tombstones.
+    """
+    return index_kind(index) not in ("hnsw", "ivf_flat", "ivf_pq")
@@ -0,0 +1,127 @@
+"""
+Query-embedding throughput and latency: one encode call per request (each chat thread
+calling the model itself) vs the micro-batching EmbeddingBatcher, at 1, 8, 32 and 128
+concurrent clients.
+
+Uses all-MiniLM-L6-v2 when it can be loaded. Without it (offline), it falls back to a
+model with the same architecture (6-layer BERT, 384 hidden, 12 heads) and random weights.
+The compute per query is the same, and the fallback skips sentence-transformers' Python
+overhead, so per-call numbers are, if anything, flattering.
+
+Usage:
+    python -m app.utils.bench_embedding_batching
+    python -m app.utils.bench_embedding_batching --clients 1 8 32 128 --seconds 5 --torch-threads 4
+"""
+import argparse
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from app.engines.embedding_service import EmbeddingBatcher, configure_torch_threads
+
+QUESTIONS = [
+    "what is the IELTS requirement for computer science", "when does semester 2 start",
+    "how much is the annual fee for nursing", "is there a hostel at the kuching campus",
+    "when is the add drop deadline", "what MUET band do I need for law",
+    "how do I apply for a scholarship", "when are the final exams for foundation",
+]
+
+
+def minilm_shaped_encoder():
+    """6-layer, 384-d BERT with random weights: MiniLM-L6's compute without the download."""
+    import torch
+    from transformers import BertConfig, BertModel
+    config = BertConfig(vocab_size=30522, hidden_size=384, num_hidden_layers=6, num_attention_heads=12,
+                        intermediate_size=1536)
+    model = BertModel(config).eval()
+
+    def encode(texts, batch_size=32, **kwargs):
+        ids = [[101] + [1000 + zlib.crc32(word.encode()) % 29000 for word in text.lower().split()] + [102]
+               for text in texts]
+        width = max(map(len, ids))
+        input_ids = torch.zeros((len(ids), width), dtype=torch.long)
+        mask = torch.zeros((len(ids), width), dtype=torch.long)
+        for row, tokens in enumerate(ids):
+            input_ids[row, :len(tokens)] = torch.tensor(tokens)
+            mask[row, :len(tokens)] = 1
+        with torch.inference_mode():
+            hidden = model(input_ids=input_ids, attention_mask=mask).last_hidden_state
+            pooled = (hidden * mask[..., None]).sum(1) / mask.sum(1, keepdim=True)
+            return torch.nn.functional.normalize(pooled, dim=1).numpy()
+
+    return encode
+
+
+def load_encoder(require_model: bool):
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer("all-MiniLM-L6-v2").encode, "all-MiniLM-L6-v2"
+    except Exception as e:
+        if require_model:
+            raise
+        print(f"MiniLM unavailable ({str(e).splitlines()[0][:80]}); using a MiniLM-shaped model with random weights")
+        return minilm_shaped_encoder(), "MiniLM-L6 architecture, random weights"
+
+
+def drive(call, clients: int, seconds: float):
+    """Each client thread sends one query at a time for `seconds`; returns (queries/s, p50 ms, p99 ms)."""
+    latencies = [[] for _ in range(clients)]
+    stop = threading.Event()
+
+    def client(slot: int):
+        rng = random.Random(slot)
+        while not stop.is_set():
+            query = f"{rng.choice(QUESTIONS)} {rng.randrange(10 ** 6)}"  # unique text, as after a cache miss
+            started = time.perf_counter()
+            call([query])
+            latencies[slot].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    merged = np.array([value for values in latencies for value in values]) * 1000
+    return len(merged) / elapsed, float(np.percentile(merged, 50)), float(np.percentile(merged, 99))
+
+
+def run(clients_list, seconds: float, max_batch: int, max_wait_ms: float, require_model: bool):
+    encode, name = load_encoder(require_model)
+    encode(["warm up"] * 8, batch_size=8)
+    batcher = EmbeddingBatcher(encode, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    import torch
+    print(f"Encoder: {name}; torch threads: {torch.get_num_threads()}; "
+          f"batcher max_batch={max_batch}, max_wait={max_wait_ms} ms; {seconds:.0f}s per cell")
+    print(f"{'clients':>8}{'mode':>10}{'q/s':>10}{'p50_ms':>10}{'p99_ms':>10}{'avg_batch':>11}")
+    for clients in clients_list:
+        for mode in ("per-call", "batched"):
+            if mode == "per-call":
+                qps, p50, p99 = drive(lambda texts: encode(texts, batch_size=1), clients, seconds)
+                avg_batch = "1.0"
+            else:
+                before = batcher.get_stats()
+                qps, p50, p99 = drive(batcher.encode, clients, seconds)
+                after = batcher.get_stats()
+                batches = after["batches"] - before["batches"]
+                avg_batch = f"{(after['texts'] - before['texts']) / batches:.1f}" if batches else "-"
+            print(f"{clients:>8}{mode:>10}{qps:>10.1f}{p50:>10.2f}{p99:>10.2f}{avg_batch:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query embedding micro-batching benchmark")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--torch-threads", type=int, default=0)
+    parser.add_argument("--require-model", action="store_true", help="fail instead of using the random-weight stand-in")
+    args = parser.parse_args()
+    configure_torch_threads(args.torch_threads)
+    run(args.clients, args.seconds, args.max_batch, args.max_wait_ms, args.require_model)
@@ -0,0 +1,125 @@
+"""
+Programme questions: in-memory catalog (facets + fee/IELTS ranges) vs the Mongo regex path
+(DataEngine.search_programme_info -> search_programme_by_keywords: $or of unanchored,
+case-insensitive regexes over four programme fields of the student collection).
+
+With --mongo the real collection is queried through db_engine (MONGO_URI must be set).
+Without it the regex path is emulated in-process over a synthetic student collection:
+every document is tested against every keyword x field regex until limit*3 hits, which is
+what an unanchored $regex does server-side (no index can serve it), minus the network.
+Also prints what each path returned: the regex path has no notion of campus, level,
+fee or IELTS, so it can only echo programme names containing a question word.
+
+Usage:
+    python -m app.utils.bench_programme_catalog
+    python -m app.utils.bench_programme_catalog --students 50000 --repeat 200
+    python -m app.utils.bench_programme_catalog --mongo
+"""
+import argparse
+import random
+import re
+import time
+
+from app.engines.catalog_engine import CatalogEngine
+
+QUESTIONS = [
+    "which engineering degrees in Kuala Lumpur cost under 30k for internationals?",
+    "What programmes can I study with IELTS 5.5 in Kuching?",
+    "how much is the fee for nursing?",
+    "cheapest computer science degree for locals",
+    "Do you offer an MBA?",
+    "which health sciences programmes need IELTS 6?",
+    "courses between RM20,000 and 25k",
+    "Foundation in science fees at springhill",
+]
+FIELDS = ["PROGRAMME_NAME", "PROGRAMME", "PROGRAMME_TITLE", "PROGRAMME_NAME_FULL"]
+
+
+def regex_keywords(message):
+    """Same tokenization as DataEngine.search_programme_info"""
+    tokens = [tok for tok in re.split(r'[^A-Za-z0-9]+', str(message)) if len(tok) > 3]
+    return [tok for tok in (tokens or [message]) if len(tok.strip()) >= 3]
+
+
+def synthetic_students(catalog, count, seed=7):
+    """Student documents enrolled on the catalog's programmes (only the fields the regex path reads)"""
+    rng = random.Random(seed)
+    table = catalog._current()
+    documents = []
+    for i in range(count):
+        row = rng.randrange(table.size)
+        documents.append({
+            "STUDENT_NUMBER": str(5000000 + i),
+            "PROGRAMME_NAME": f"Bachelor of {table.text['programme'][row]} (Hons)",
+            "PROGRAMME_CODE": f"P{row:03d}",
+            "FACULTY": table.text["faculty"][row],
+            "CAMPUS": table.text["campus"][row],
+            "PROGRAMME_LEVEL": table.text["level"][row],
+        })
+    return documents
+
+
+def emulated_regex_search(documents, keywords, limit=5):
+    """search_programme_by_keywords' query, evaluated like a collection scan"""
+    patterns = [re.compile(re.escape(keyword), re.IGNORECASE) for keyword in keywords]
+    results, seen, matched = [], set(), 0
+    for doc in documents:
+        if not any(pattern.search(doc.get(field) or "") for pattern in patterns for field in FIELDS):
+            continue
+        matched += 1
+        key = doc["PROGRAMME_NAME"].strip().lower()
+        if key not in seen:
+            seen.add(key)
+            results.append({"programme_name": doc["PROGRAMME_NAME"], "campus": doc["CAMPUS"],
+                            "level": doc["PROGRAMME_LEVEL"]})
+        if len(results) >= limit or matched >= limit * 3:  # .limit(limit * 3) on the cursor
+            break
+    return results
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=20000, help="synthetic collection size")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--mongo", action="store_true", help="query the real collection via db_engine")
+    args = parser.parse_args()
+
+    catalog = CatalogEngine()
+    if args.mongo:
+        from app.engines.db_engine import db_engine
+        if not db_engine.connected:
+            raise SystemExit("MongoDB is not connected (check MONGO_URI)")
+        regex_path = lambda keywords: db_engine.search_programme_by_keywords(keywords)
+        label = "mongo $regex"
+    else:
+        documents = synthetic_students(catalog, args.students)
+        regex_path = lambda keywords: emulated_regex_search(documents, keywords)
+        label = f"regex scan ({args.students} docs)"
+
+    print(f"{'question':<70} {'catalog ms':>10} {'hits':>5} {label + ' ms':>28} {'hits':>5}")
+    totals = [0.0, 0.0]
+    for question in QUESTIONS:
+        catalog_ms, context = timed(lambda: catalog.context_for(question), args.repeat)
+        hits = int(re.search(r"\((\d+) of", context).group(1)) if context else 0
+        keywords = regex_keywords(question)
+        regex_ms, results = timed(lambda: regex_path(keywords), max(1, args.repeat // 10))
+        totals[0] += catalog_ms
+        totals[1] += regex_ms
+        print(f"{question[:70]:<70} {catalog_ms:>10.3f} {hits:>5} {regex_ms:>28.3f} {len(results):>5}")
+        if context:
+            print("    catalog:", context.splitlines()[0])
+        print("    regex keywords:", keywords, "->", sorted({r["programme_name"] for r in results})[:4])
+    print(f"\nmean per question: catalog {totals[0] / len(QUESTIONS):.3f} ms, "
+          f"regex path {totals[1] / len(QUESTIONS):.3f} ms")
+    print("catalog stats:", catalog.get_stats())
+
+
+if __name__ == "__main__":
+    main()
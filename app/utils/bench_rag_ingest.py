@@ -0,0 +1,129 @@
+"""
+Ingestion throughput benchmark (pages/s, chunks/s, peak memory) for the RAG extraction
+and chunking pipeline on the bundled academic calendar PDFs.
+Compares the old path (whole document built with text += page, then one chunk list)
+with the streaming pipeline, in-process and across a process pool. Each mode runs in a
+fresh interpreter so peak RSS is its own. The calendars are only 4 pages each, so
+--pages merges their pages into one larger PDF to show how each path scales.
+
+Usage:
+    python -m app.utils.bench_rag_ingest                      # the 4 calendar PDFs
+    python -m app.utils.bench_rag_ingest --pages 800 --workers 4
+    python -m app.utils.bench_rag_ingest --embed              # include MiniLM encoding (needs the model)
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_FILES = sorted(glob.glob("data/academic_calendar_2026_*.pdf"))
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def merge_pages(files, pages: int, path: str):
+    """Write a PDF of `pages` pages cycling through the pages of files."""
+    import PyPDF2
+    readers = [PyPDF2.PdfReader(f) for f in files]
+    source = [page for reader in readers for page in reader.pages]
+    writer = PyPDF2.PdfWriter()
+    for i in range(pages):
+        writer.add_page(source[i % len(source)])
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def legacy_chunks(path: str):
+    """The pre-streaming ingestion: concatenate every page, then slice the whole text."""
+    import PyPDF2
+    text = ""
+    with open(path, "rb") as f:
+        for page in PyPDF2.PdfReader(f).pages:
+            extracted = page.extract_text()
+            if extracted:
+                text += extracted + "\n"
+    chunks = []
+    for i in range(0, len(text), 450):
+        batch = text[i:i + 500]
+        if len(batch) > 50:
+            chunks.append(batch)
+    return chunks
+
+
+def measure(files, mode: str, workers: int, embed: bool) -> dict:
+    """Runs inside a fresh interpreter."""
+    from app.engines import extract_engine
+    from app.engines.extract_engine import batched, iter_chunks, iter_pdf_pages
+
+    model = None
+    if embed:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer("all-MiniLM-L6-v2")
+        model.encode(["warm up"])
+    extract_engine.RAG_EXTRACT_PARALLEL_MIN_PAGES = 1  # let the pool mode use the pool even on small files
+
+    baseline = peak_rss_mb()
+    pages = chunks = 0
+    started = time.perf_counter()
+    for path in files:
+        counter = {}
+        if mode == "legacy":
+            all_chunks = legacy_chunks(path)
+            batches = [all_chunks[i:i + 64] for i in range(0, len(all_chunks), 64)]
+        else:
+            page_stream = iter_pdf_pages(path, progress=lambda **fields: counter.update(fields), workers=workers)
+            batches = batched(iter_chunks(page + "\n" for page in page_stream if page), 64)
+        for batch in batches:
+            chunks += len(batch)
+            if model is not None:
+                model.encode(batch, batch_size=64)
+        if mode == "legacy":
+            import PyPDF2
+            with open(path, "rb") as f:
+                pages += len(PyPDF2.PdfReader(f).pages)
+        else:
+            pages += counter.get("pages_total", 0)
+    seconds = time.perf_counter() - started
+    return {"mode": mode, "workers": workers, "pages": pages, "chunks": chunks, "seconds": seconds,
+            "peak_mb": peak_rss_mb() - baseline}
+
+
+def run(files, workers: int, embed: bool):
+    modes = [("legacy", 1), ("stream", 1)] + ([("stream", workers)] if workers > 1 else [])
+    print(f"{len(files)} file(s), {os.cpu_count()} CPU(s), embedding {'on' if embed else 'off'}")
+    print(f"{'mode':<10}{'workers':>8}{'pages':>8}{'chunks':>8}{'seconds':>10}{'pages/s':>10}{'chunks/s':>10}"
+          f"{'peak_mb':>10}")
+    for mode, mode_workers in modes:
+        command = [sys.executable, "-m", "app.utils.bench_rag_ingest", "--measure", mode,
+                   "--workers", str(mode_workers), "--files", *files] + (["--embed"] if embed else [])
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{r['mode']:<10}{r['workers']:>8}{r['pages']:>8}{r['chunks']:>8}{r['seconds']:>10.2f}"
+              f"{r['pages'] / r['seconds']:>10.1f}{r['chunks'] / r['seconds']:>10.1f}{r['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG ingestion throughput benchmark")
+    parser.add_argument("--files", nargs="+", default=DEFAULT_FILES)
+    parser.add_argument("--pages", type=int, default=0, help="merge the files' pages into one PDF of this many pages")
+    parser.add_argument("--workers", type=int, default=max(2, min(4, os.cpu_count() or 1)))
+    parser.add_argument("--embed", action="store_true", help="also encode chunks with MiniLM")
+    parser.add_argument("--measure", choices=["legacy", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.files, args.measure, args.workers, args.embed)))
+    elif args.pages:
+        with tempfile.TemporaryDirectory() as directory:
+            merged = os.path.join(directory, f"merged_{args.pages}.pdf")
+            merge_pages(args.files, args.pages, merged)
+            run([merged], args.workers, args.embed)
+    else:
+        run(args.files, args.workers, args.embed)
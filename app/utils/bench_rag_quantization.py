@@ -0,0 +1,64 @@
+"""
+Report memory per chunk, recall@k against the float32 flat baseline and query latency
+for the compressed RAG storage options (fp16 / int8 scalar quantization, product quantization).
+
+Usage:
+    python -m app.utils.bench_rag_quantization --chunks 50000
+    python -m app.utils.bench_rag_quantization --index data/knowledge_base/faiss_index.bin
+    python -m app.utils.bench_rag_quantization --migrate data/knowledge_base/faiss_index.bin --type sq8 --out sq8.bin
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.engines.vector_index import build_index, bytes_per_vector, migrate_index_file, reconstruct_with_ids
+from app.utils.bench_rag_index import latency_percentiles, make_queries, recall_at_k, synthetic_corpus
+
+STORAGE_TYPES = ["flat", "sq_fp16", "sq8", "pq", "ivf_pq"]
+
+
+def run(corpus: np.ndarray, types, k: int, query_count: int):
+    queries = make_queries(corpus, query_count)
+    n, dimension = corpus.shape
+    print(f"=== {n:,} chunks x {dimension}d, {query_count} queries, recall@{k} vs float32 flat ===")
+    print(f"{'type':<10}{'bytes/chunk':>12}{'vs_f32':>8}{'MB/1M':>9}{'build_s':>9}{'recall':>8}{'p50_ms':>9}{'p99_ms':>9}")
+
+    truth, baseline = None, None
+    for index_type in ["flat"] + [t for t in types if t != "flat"]:
+        started = time.perf_counter()
+        index = build_index(corpus, index_type, dimension, ids=np.arange(n))
+        build_seconds = time.perf_counter() - started
+        _, found = index.search(queries, k)
+        if truth is None:
+            truth = found
+        size = bytes_per_vector(index)
+        baseline = baseline or size
+        p50, p99 = latency_percentiles(index, queries, k)
+        print(f"{index_type:<10}{size:>12.0f}{baseline / size:>7.1f}x{size * 1e6 / 2**20:>9.0f}{build_seconds:>9.2f}"
+              f"{recall_at_k(found, truth):>8.3f}{p50:>9.3f}{p99:>9.3f}")
+        del index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG quantized storage report / index migration")
+    parser.add_argument("--chunks", type=int, default=50000, help="synthetic corpus size")
+    parser.add_argument("--index", help="report on the vectors of an existing (float32) index file instead")
+    parser.add_argument("--types", nargs="+", default=STORAGE_TYPES, choices=STORAGE_TYPES)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--migrate", help="convert this index file instead of reporting")
+    parser.add_argument("--type", default="sq8", choices=STORAGE_TYPES, help="target type for --migrate")
+    parser.add_argument("--out", help="output path for --migrate (default: overwrite in place)")
+    args = parser.parse_args()
+
+    if args.migrate:
+        migrated = migrate_index_file(args.migrate, args.out or args.migrate, args.type)
+        print(f"Wrote {args.out or args.migrate}: {args.type}, {migrated.ntotal} vectors, "
+              f"{bytes_per_vector(migrated):.0f} bytes/vector")
+    elif args.index:
+        import faiss
+        _, vectors = reconstruct_with_ids(faiss.read_index(args.index))
+        run(vectors, args.types, args.k, min(args.queries, len(vectors)))
+    else:
+        run(synthetic_corpus(args.chunks), args.types, args.k, args.queries)
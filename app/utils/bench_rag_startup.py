@@ -0,0 +1,133 @@
+"""
+Cold-start benchmark for the RAG storage layer.
+Writes a synthetic corpus in the old layout (in-memory FAISS read + faiss_metadata.pkl)
+and the current one (mmap FAISS read + SQLite chunk store), then loads each in a fresh
+subprocess and reports load time and resident memory, plus the first query.
+The BM25 keyword index is loaded the same way in both layouts and is left out.
+
+Usage:
+    python -m app.utils.bench_rag_startup --chunks 100000
+"""
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+DIMENSION = 384  # all-MiniLM-L6-v2
+CHUNK_CHARS = 500
+
+
+def rss_mb(field: str = "VmRSS") -> float:
+    """
+    Resident memory from /proc/self/status: VmRSS (total), RssAnon (private to this
+    process) or RssFile (file-backed pages, shared between workers). Falls back to peak RSS.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_corpus(directory: str, chunks: int, seed: int = 0):
+    import faiss
+    from app.engines.chunk_store import ChunkStore
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((chunks, DIMENSION)).astype("float32")
+    ids = np.arange(chunks, dtype="int64")
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(DIMENSION))
+    index.add_with_ids(vectors, ids)
+    faiss.write_index(index, os.path.join(directory, "faiss_index.bin"))
+
+    words = np.array(["semester", "programme", "IELTS", "5.5", "campus", "fee", "week", "exam", "MUET", "band"])
+    texts = [" ".join(rng.choice(words, CHUNK_CHARS // 7)) for _ in range(min(chunks, 1000))]
+    chunk_text = lambda i: texts[i % len(texts)] + f" #{i}"  # noqa: E731
+    source = lambda i: f"doc_{i // 200}.pdf"  # noqa: E731
+
+    with open(os.path.join(directory, "faiss_metadata.pkl"), "wb") as f:
+        pickle.dump({"chunks": {i: {"text": chunk_text(i), "source": source(i)} for i in range(chunks)},
+                     "sources": {}, "tombstones": [], "next_id": chunks}, f)
+
+    store = ChunkStore(os.path.join(directory, "chunks.sqlite3"))
+    for start in range(0, chunks, 10000):
+        store.add((i, source(i), chunk_text(i)) for i in range(start, min(chunks, start + 10000)))
+    store.close()
+
+
+def load(directory: str, layout: str) -> dict:
+    """Runs inside a fresh interpreter; imports are paid before the clock starts."""
+    import faiss
+    from app.engines.chunk_store import ChunkStore
+
+    baseline, baseline_anon, baseline_file = rss_mb(), rss_mb("RssAnon"), rss_mb("RssFile")
+    started = time.perf_counter()
+    index_file = os.path.join(directory, "faiss_index.bin")
+    if layout == "pickle":
+        index = faiss.read_index(index_file)
+        with open(os.path.join(directory, "faiss_metadata.pkl"), "rb") as f:
+            chunks = pickle.load(f)["chunks"]
+        lookup = lambda ids: [chunks[i]["text"] for i in ids]  # noqa: E731
+    else:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY  # as RAGEngine
+        index = faiss.read_index(index_file, flags)
+        store = ChunkStore(os.path.join(directory, "chunks.sqlite3"))
+        lookup = lambda ids: list(store.get_texts(ids).values())  # noqa: E731
+    load_seconds = time.perf_counter() - started
+    load_rss = rss_mb() - baseline
+
+    query = np.random.default_rng(1).standard_normal((1, DIMENSION)).astype("float32")
+    started = time.perf_counter()
+    _, found = index.search(query, 3)
+    lookup([int(i) for i in found[0]])
+    first_query_ms = (time.perf_counter() - started) * 1000
+
+    return {"layout": layout, "load_s": load_seconds, "load_rss_mb": load_rss,
+            "first_query_ms": first_query_ms, "rss_after_query_mb": rss_mb() - baseline,
+            "private_mb": rss_mb("RssAnon") - baseline_anon, "shared_file_mb": rss_mb("RssFile") - baseline_file}
+
+
+def run(chunks: int):
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        write_corpus(directory, chunks)
+        print(f"Wrote {chunks:,} chunks in {time.perf_counter() - started:.1f}s")
+        for name in ("faiss_index.bin", "faiss_metadata.pkl", "chunks.sqlite3"):
+            print(f"  {name}: {os.path.getsize(os.path.join(directory, name)) / 2**20:.1f} MB")
+
+        print("\nRSS after the first query is split into private pages (duplicated per worker)"
+              " and file-backed pages (shared through the page cache).")
+        print(f"{'layout':<10}{'load_s':>10}{'load_rss_mb':>14}{'first_query_ms':>16}{'rss_after_mb':>14}"
+              f"{'private_mb':>12}{'shared_mb':>12}")
+        for layout in ("pickle", "mmap"):
+            output = subprocess.run(
+                [sys.executable, "-m", "app.utils.bench_rag_startup", "--load", directory, "--layout", layout],
+                capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+            print(f"{r['layout']:<10}{r['load_s']:>10.3f}{r['load_rss_mb']:>14.1f}"
+                  f"{r['first_query_ms']:>16.1f}{r['rss_after_query_mb']:>14.1f}"
+                  f"{r['private_mb']:>12.1f}{r['shared_file_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG storage cold-start benchmark")
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--load", help=argparse.SUPPRESS)
+    parser.add_argument("--layout", choices=["pickle", "mmap"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        print(json.dumps(load(args.load, args.layout)))
+    else:
+        run(args.chunks)
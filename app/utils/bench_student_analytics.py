@@ -0,0 +1,85 @@
+"""
+Student count questions: in-memory analytics cube vs live MongoDB aggregation.
+
+Without --mongo the cube is built from a synthetic student registry (uniformly random
+over every dimension, so nearly every student is their own cell: a worst case for the
+cube's size). With --mongo the cube is built from the real collection with the same
+$facet pipeline the engine uses, and each slice is also timed as a live count_documents.
+
+Usage:
+    python -m app.utils.bench_student_analytics
+    python -m app.utils.bench_student_analytics --students 100000 --repeat 500
+    python -m app.utils.bench_student_analytics --mongo
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+from app.engines.analytics_engine import ANALYTICS_MAX_GROUPS, DIMENSIONS, StudentCube, cube_pipeline
+
+QUERIES = [
+    ("total", {}, []),
+    ("female Malaysians", {"gender": "Female", "nationality": "Malaysian"}, []),
+    ("Kuching by nationality", {"campus": "Kuching"}, ["nationality"]),
+    ("active by gender", {"profile_status": "Active"}, ["gender"]),
+    ("by programme and intake", {}, ["programme", "intake"]),
+]
+
+
+def synthetic_cells(students, seed=3):
+    rng = random.Random(seed)
+    values = {
+        "gender": ["Male", "Female"],
+        "nationality": ["Malaysian", "Chinese", "Indonesian", "Nigerian", "Indian"] + [f"Country {i}" for i in range(60)],
+        "programme": [f"Bachelor of Programme {i} (Hons)" for i in range(150)],
+        "intake": [f"{year}-{month:02d}" for year in (2023, 2024, 2025) for month in (1, 5, 9)],
+        "campus": ["Kuala Lumpur", "Kuching", "Springhill (Negeri Sembilan)"],
+        "profile_status": ["Active", "Graduated", "Deferred", "Withdrawn"],
+        "profile_type": ["Undergraduate", "Postgraduate", "Foundation"],
+    }
+    cells = Counter(tuple(rng.choice(values[dim]) for dim in DIMENSIONS) for _ in range(students))
+    return [dict(zip(DIMENSIONS, key), count=count) for key, count in cells.items()]
+
+
+def mongo_filter(filters):
+    return {DIMENSIONS[dim][0]: {"$regex": f"^{value}$", "$options": "i"} for dim, value in filters.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=40000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--mongo", action="store_true", help="build from the real collection and time live counts")
+    args = parser.parse_args()
+
+    collection = None
+    started = time.perf_counter()
+    if args.mongo:
+        from app.engines.db_engine import db_engine
+        if not db_engine.connected:
+            raise SystemExit("MongoDB is not connected (check MONGO_URI)")
+        collection = db_engine.student_coll
+        result = next(collection.aggregate(cube_pipeline(), allowDiskUse=True), {})
+        cube = StudentCube.from_facet(result, build_ms=(time.perf_counter() - started) * 1000)
+    else:
+        cells = synthetic_cells(args.students)
+        cube = StudentCube(cells, build_ms=(time.perf_counter() - started) * 1000)
+    print(f"Cube: {cube.total} students, {len(cube.counts)} cells, built in {cube.build_ms:.0f} ms")
+
+    print(f"{'query':<26} {'cube us':>10} {'groups':>7} {'live ms':>9}")
+    for label, filters, group_by in QUERIES:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            result = cube.count(filters, group_by, top=ANALYTICS_MAX_GROUPS)  # as in chat context
+        cube_us = (time.perf_counter() - started) / args.repeat * 1e6
+        live = ""
+        if collection is not None and not group_by:
+            started = time.perf_counter()
+            collection.count_documents(mongo_filter(filters))
+            live = f"{(time.perf_counter() - started) * 1000:9.1f}"
+        print(f"{label:<26} {cube_us:>10.1f} {result.get('group_count', 0):>7} {live:>9}")
+
+
+if __name__ == "__main__":
+    main()
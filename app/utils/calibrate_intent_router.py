@@ -0,0 +1,133 @@
+"""
+Calibrate the intent router's softmax temperature and confidence threshold on a held-out
+labelled set (data/intent_holdout.json, never used for training).
+
+For every (temperature, threshold) pair it reports how many held-out questions would be
+routed locally (coverage), how many of those routes are right (precision), and how many
+confident routes involve personal/grade on either side (sensitive errors: those skip the
+phase-1 LLM check with the wrong data path). The recommended pair has no sensitive errors
+and at least --target-precision, with the highest coverage. The previous setup (QA stress
+test CSV in the "general" centroid, temperature 0.05, threshold 0.6) is shown for comparison.
+
+--embedder tfidf uses a character n-gram TF-IDF stand-in for environments without the
+MiniLM model; its numbers only exercise the procedure and are never written.
+
+Usage:
+    python -m app.utils.calibrate_intent_router
+    python -m app.utils.calibrate_intent_router --write           # save to INTENT_CALIBRATION_FILE
+    python -m app.utils.calibrate_intent_router --embedder tfidf
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from app.engines.intent_engine import (INTENT_CALIBRATION_FILE, INTENT_HOLDOUT_FILE, IntentRouter,
+                                       intent_probabilities)
+
+STRESS_TEST_FILE = "chatbot_qa_stress_test_200.csv"
+SENSITIVE = {"personal", "grade"}
+TEMPERATURES = [0.02, 0.05, 0.1, 0.15, 0.2, 0.3]
+THRESHOLDS = [round(0.4 + 0.05 * i, 2) for i in range(12)]
+
+
+def tfidf_embedder(training_texts):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True).fit(training_texts)
+    return lambda texts: vectorizer.transform(texts).toarray().astype("float32")
+
+
+def stress_test_questions(path=STRESS_TEST_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return [row["Question"] for row in csv.DictReader(f) if row.get("Question")]
+
+
+def evaluate(router, holdout, temperature, threshold):
+    """coverage, precision, sensitive errors and accuracy over the held-out set"""
+    texts = [text for _, text in holdout]
+    truth = [label for label, _ in holdout]
+    vectors = np.asarray(router.embedder(texts), dtype="float32")
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    probs = intent_probabilities(vectors @ router.centroids.T, temperature)
+    predicted = [router.labels[i] for i in probs.argmax(axis=1)]
+    confident = probs.max(axis=1) >= threshold
+    routed = [(p, t) for p, t, c in zip(predicted, truth, confident) if c]
+    correct = sum(p == t for p, t in routed)
+    return {
+        "coverage": len(routed) / len(holdout),
+        "precision": correct / len(routed) if routed else 1.0,
+        "sensitive_errors": sum(p != t and (p in SENSITIVE or t in SENSITIVE) for p, t in routed),
+        "accuracy": sum(p == t for p, t in zip(predicted, truth)) / len(holdout),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--holdout", default=INTENT_HOLDOUT_FILE)
+    parser.add_argument("--embedder", choices=["minilm", "tfidf"], default="minilm")
+    parser.add_argument("--target-precision", type=float, default=0.95)
+    parser.add_argument("--write", action="store_true", help=f"save the recommendation to {INTENT_CALIBRATION_FILE}")
+    args = parser.parse_args()
+
+    with open(args.holdout, "r", encoding="utf-8") as f:
+        holdout = [(label, text) for label, texts in json.load(f).items() for text in texts]
+    router = IntentRouter(embedder=None)
+    training = router.load_examples()
+    seen = {text.strip().lower() for texts in training.values() for text in texts}
+    leaked = [text for _, text in holdout if text.strip().lower() in seen]
+    if leaked:
+        raise SystemExit(f"Held-out questions also in training: {leaked}")
+
+    if args.embedder == "tfidf":
+        texts = [text for items in training.values() for text in items] + stress_test_questions()
+        router.embedder = tfidf_embedder(texts)
+    else:
+        from app.engines.cache_engine import rag_embedder
+        router.embedder = rag_embedder
+        if rag_embedder(["warm up"]) is None:
+            raise SystemExit("MiniLM model is not available (run with --embedder tfidf for a dry run)")
+    print(f"Held-out: {len(holdout)} questions; training: {({k: len(v) for k, v in training.items()})}")
+
+    previous = {label: list(texts) for label, texts in training.items()}
+    previous.setdefault("general", []).extend(stress_test_questions())
+    router.train(previous)
+    before = evaluate(router, holdout, 0.05, 0.6)
+    router.train(training)
+
+    started = time.perf_counter()
+    grid = [(t, th, evaluate(router, holdout, t, th)) for t in TEMPERATURES for th in THRESHOLDS]
+    print(f"{len(grid)} settings evaluated in {time.perf_counter() - started:.1f}s\n")
+    print(f"{'temp':>5} {'thresh':>6} {'coverage':>9} {'precision':>10} {'sensitive':>10} {'accuracy':>9}")
+    for temperature, threshold, result in grid:
+        if threshold in (0.5, 0.6, 0.7, 0.8, 0.9):
+            print(f"{temperature:>5} {threshold:>6} {result['coverage']:>9.2f} {result['precision']:>10.2f} "
+                  f"{result['sensitive_errors']:>10} {result['accuracy']:>9.2f}")
+
+    safe = [entry for entry in grid if entry[2]["sensitive_errors"] == 0
+            and entry[2]["precision"] >= args.target_precision]
+    pool = safe or grid
+    temperature, threshold, result = max(pool, key=lambda e: (e[2]["coverage"], e[2]["precision"], e[1]))
+    print(f"\nPrevious (stress test in 'general', T=0.05, threshold 0.6): coverage {before['coverage']:.2f}, "
+          f"precision {before['precision']:.2f}, sensitive errors {before['sensitive_errors']}, "
+          f"accuracy {before['accuracy']:.2f}")
+    print(f"Recommended: temperature {temperature}, threshold {threshold}: coverage {result['coverage']:.2f}, "
+          f"precision {result['precision']:.2f}, sensitive errors {result['sensitive_errors']}"
+          f"{'' if safe else ' (no setting met the target; best precision shown)'}")
+
+    if args.write:
+        if args.embedder != "minilm":
+            raise SystemExit("Not writing: stand-in embedder numbers do not apply to MiniLM")
+        with open(INTENT_CALIBRATION_FILE, "w", encoding="utf-8") as f:
+            json.dump({"temperature": temperature, "threshold": threshold, "holdout": args.holdout,
+                       "holdout_size": len(holdout), **{k: round(v, 4) for k, v in result.items()},
+                       "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
+        print(f"Saved to {INTENT_CALIBRATION_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Regression check for the calendar fast path on the bundled academic calendars.
+Each question is matched with today fixed at 2026-03-01 and must either be answered
+with the expected date line or fall through to the LLM (None).
+
+Usage:
+    python -m app.utils.check_calendar_answers
+"""
+import sys
+from datetime import date
+
+from app.engines.calendar_engine import CalendarEngine, parse_period
+
+TODAY = date(2026, 3, 1)
+
+# (question, expected text fragment, or None when the turn must fall through to the LLM)
+CASES = [
+    ("When does the September semester start?", "Class Commencement (long semester): Mon 28 Sep 2026"),
+    ("When is the January 2027 orientation?", None),  # not in the 2026 calendars
+    ("September intake orientation date?", "Orientation (long semester; 2026-09 intake): Thu 24 Sep 2026"),
+    ("When is orientation for the 2026-09 intake?", "2026-09 intake): Thu 24 Sep 2026"),
+    ("When does the may 2026 semester start?", "Class Commencement (long semester): Mon 25 May 2026"),
+    ("When does the semester start?", "Class Commencement (long semester): Mon 25 May 2026"),
+    ("When is the final exam for the september semester?", "2026-09 intake): Fri 8 Jan - Thu 21 Jan 2027"),
+    ("When does class start in 2025?", None),
+    ("When is chinese new year 2027?", "Chinese New Year (all campuses): Sat 6 Feb - Mon 8 Feb 2027"),
+    ("When are exam results out?", None),
+]
+
+# Month words that are not months here
+NO_PERIOD = ["when may I drop a course?", "when does the semester start?"]
+
+
+def main() -> bool:
+    engine = CalendarEngine()
+    if not engine.events:
+        print("No calendar events parsed (are the PDFs and PyPDF2 available?)")
+        return False
+    failures = []
+    for question, expected in CASES:
+        result = engine.match(question, None, TODAY)
+        text = result["text"] if result else None
+        if expected is None and text is not None:
+            failures.append(f"{question!r} should fall through, got: {text.splitlines()[1:]}")
+        elif expected is not None and (text is None or expected not in text):
+            failures.append(f"{question!r} should contain {expected!r}, got: {text}")
+    for question in NO_PERIOD:
+        if parse_period(question.lower()) is not None:
+            failures.append(f"{question!r} parsed a period: {parse_period(question.lower())}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    total = len(CASES) + len(NO_PERIOD)
+    print(f"{total - len(failures)}/{total} calendar checks passed")
+    return not failures
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
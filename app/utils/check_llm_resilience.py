@@ -0,0 +1,67 @@
+"""
+Resilience check for the LLM client layer against the fake Gemini server.
+Runs a few fault scenarios (healthy, flaky, slow tail, outage) and prints
+per-model latency/error counters and circuit state.
+
+Usage:
+    python -m app.utils.check_llm_resilience
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google import genai
+from google.genai import types
+
+from app.engines.llm_client import ResilientLLMClient, LLMUnavailableError
+from app.utils.fake_llm_server import FaultConfig, start_server
+
+MODEL = "fake-model"
+
+
+def run_scenario(name, config, base_url, requests=40, concurrency=8, **client_kwargs):
+    sdk = genai.Client(api_key="fake", http_options=types.HttpOptions(base_url=base_url, timeout=5000))
+    llm = ResilientLLMClient(sdk, **client_kwargs)
+    ok, failed = 0, 0
+
+    def one(_):
+        try:
+            llm.generate_content(model=MODEL, contents="ping")
+            return True
+        except LLMUnavailableError:
+            return False
+        except Exception:
+            return False
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for success in pool.map(one, range(requests)):
+            ok += success
+            failed += not success
+    elapsed = time.monotonic() - started
+
+    stats = llm.get_stats().get(MODEL, {})
+    print(f"\n=== {name} ===")
+    print(f"ok={ok} failed={failed} wall={elapsed:.2f}s upstream_requests={config.requests}")
+    for key in ("retries", "timeouts", "hedges", "hedge_wins", "circuit_rejections", "overload_rejections",
+                "p50_ms", "p95_ms", "p99_ms", "circuit"):
+        print(f"  {key}: {stats.get(key)}")
+
+
+if __name__ == "__main__":
+    config = FaultConfig()
+    server, base_url = start_server(config)
+    try:
+        config.delay, config.jitter = 0.02, 0.02
+        run_scenario("healthy", config, base_url)
+
+        config.requests, config.error_rate = 0, 0.3
+        run_scenario("flaky (30% 503)", config, base_url, backoff_base=0.05)
+
+        config.requests, config.error_rate, config.stall_rate, config.stall_seconds = 0, 0.0, 0.1, 1.0
+        run_scenario("slow tail (10% stall 1s), hedging at p90", config, base_url,
+                     hedge_percentile=90, hedge_min_samples=5, attempt_timeout=3)
+
+        config.requests, config.stall_rate, config.error_rate = 0, 0.0, 1.0
+        run_scenario("outage (100% 503)", config, base_url, backoff_base=0.05, breaker_threshold=5)
+    finally:
+        server.shutdown()
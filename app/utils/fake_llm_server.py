@@ -0,0 +1,119 @@
+"""
+Fake Gemini server for resilience testing.
+Speaks enough of the generateContent / streamGenerateContent REST API for the
+google-genai SDK, and injects configurable latency and errors.
+
+Usage:
+    python -m app.utils.fake_llm_server --port 8765 --delay 0.2 --jitter 0.5 --error-rate 0.2
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GOOGLE_API_KEY=fake python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = {"text": "This is a canned answer from the fake LLM server.", "suggestions": ["Menu", "Contact", "Help"]}
+
+
+class FaultConfig:
+    """Latency/error injection knobs, adjustable at runtime (e.g. from a test script)."""
+
+    def __init__(self, delay=0.0, jitter=0.0, error_rate=0.0, error_code=503, stall_rate=0.0, stall_seconds=30.0,
+                 reply=None):
+        self.delay = delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.reply = reply or DEFAULT_REPLY
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def _candidate(text):
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": 1, "candidatesTokenCount": 1, "totalTokenCount": 2}
+    }
+
+
+def make_handler(config: FaultConfig):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass  # Keep test output quiet
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            with config.lock:
+                config.requests += 1
+
+            # Latency injection
+            if config.stall_rate and random.random() < config.stall_rate:
+                time.sleep(config.stall_seconds)
+            time.sleep(config.delay + random.uniform(0, config.jitter))
+
+            # Error injection
+            if config.error_rate and random.random() < config.error_rate:
+                self._send_json(config.error_code, {
+                    "error": {"code": config.error_code, "message": "Injected failure", "status": "UNAVAILABLE"}
+                })
+                return
+
+            text = json.dumps(config.reply)
+            if ":streamGenerateContent" in self.path:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i in range(0, len(text), 12):
+                    frame = f"data: {json.dumps(_candidate(text[i:i + 12]))}\r\n\r\n"
+                    self.wfile.write(frame.encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(0.01)
+                self.close_connection = True
+            elif ":generateContent" in self.path:
+                self._send_json(200, _candidate(text))
+            else:
+                self._send_json(404, {"error": {"code": 404, "message": "Unknown path", "status": "NOT_FOUND"}})
+
+    return FakeGeminiHandler
+
+
+def start_server(config: FaultConfig, host="127.0.0.1", port=0):
+    """Start in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini server with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="base latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-code", type=int, default=503)
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fraction of requests that hang")
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    args = parser.parse_args()
+
+    cfg = FaultConfig(args.delay, args.jitter, args.error_rate, args.error_code, args.stall_rate, args.stall_seconds)
+    srv = ThreadingHTTPServer((args.host, args.port), make_handler(cfg))
+    print(f"Fake Gemini server on http://{args.host}:{args.port} (set GEMINI_BASE_URL to this)")
+    srv.serve_forever()
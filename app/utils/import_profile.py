@@ -0,0 +1,70 @@
+"""
+Import-time breakdown for the server (python -X importtime) with a cold-start budget.
+Runs the import in a fresh interpreter with STARTUP_MODE=lazy so warm-up threads don't
+pollute the numbers, then prints the slowest modules by cumulative and self time.
+
+Usage:
+    python -m app.utils.import_profile                 # import main, top 25
+    python -m app.utils.import_profile --budget 3.0    # exit 1 if importing main takes longer
+    python -m app.utils.import_profile --module app.engines.rag_engine --top 40
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile(module: str):
+    """Return (wall_seconds, [(module, self_us, cumulative_us, depth)]) for importing module."""
+    env = dict(os.environ, STARTUP_MODE="lazy", PYTHONDONTWRITEBYTECODE="1")
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return float(result.stdout.strip().splitlines()[-1]), rows
+
+
+def report(module: str, top: int, budget: float) -> bool:
+    wall, rows = profile(module)
+    print(f"Importing {module}: {wall:.3f}s wall, {len(rows)} modules")
+
+    print(f"\nTop {top} by cumulative time (includes children):")
+    print(f"{'cumulative_ms':>14}{'self_ms':>10}  module")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {'  ' * min(depth, 6)}{name}")
+
+    # Group self time by top-level package (torch, google, pymongo, app, ...)
+    packages = {}
+    for name, self_us, _, _ in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    print(f"\nSelf time by top-level package:")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{self_us / 1000:>14.1f}  {package}")
+
+    if budget:
+        within = wall <= budget
+        print(f"\nBudget {budget:.2f}s: {'OK' if within else 'EXCEEDED'} ({wall:.3f}s)")
+        return within
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-module import-time breakdown")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET", "0")),
+                        help="seconds; 0 = report only")
+    args = parser.parse_args()
+    sys.exit(0 if report(args.module, args.top, args.budget) else 1)
@@ -0,0 +1,92 @@
+"""
+Lazy engine proxies and startup lifecycle (warm-up + readiness)
+"""
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Tuple
+
+
+class LazyProxy:
+    """
+    Stands in for an engine singleton and builds it on first attribute access,
+    so importing a module no longer connects to MongoDB or loads a model.
+    """
+
+    def __init__(self, factory: Callable, name: str):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def load(self):
+        """Build the wrapped object if needed and return it."""
+        instance = object.__getattribute__(self, "_instance")
+        if instance is None:
+            with object.__getattribute__(self, "_lock"):
+                instance = object.__getattribute__(self, "_instance")
+                if instance is None:
+                    started = time.perf_counter()
+                    instance = object.__getattribute__(self, "_factory")()
+                    object.__setattr__(self, "_instance", instance)
+                    print(f"[Startup] {object.__getattribute__(self, '_name')} loaded in "
+                          f"{time.perf_counter() - started:.2f}s")
+        return instance
+
+    def is_loaded(self) -> bool:
+        return object.__getattribute__(self, "_instance") is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded() else "not loaded"
+        return f"<LazyProxy {object.__getattribute__(self, '_name')} ({state})>"
+
+
+class Lifecycle:
+    """Ordered warm-up steps with per-step status, for /readyz."""
+
+    def __init__(self):
+        self.steps: List[Tuple[str, Callable]] = []
+        self.status: Dict[str, Dict] = {}
+        self.started = False
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def register(self, name: str, fn: Callable):
+        self.steps.append((name, fn))
+        self.status[name] = {"status": "pending"}
+
+    def warm_up(self):
+        """Run every step in order. A step that raises or returns False is marked failed; the rest still run."""
+        with self._lock:
+            if self.started:
+                return
+            self.started = True
+        for name, fn in self.steps:
+            self.status[name] = {"status": "loading"}
+            started = time.perf_counter()
+            try:
+                error = f"{name} unavailable" if fn() is False else None
+            except Exception as e:
+                traceback.print_exc()
+                error = str(e)
+            seconds = round(time.perf_counter() - started, 3)
+            if error:
+                self.status[name] = {"status": "failed", "error": error, "seconds": seconds}
+            else:
+                self.status[name] = {"status": "ready", "seconds": seconds}
+        self.finished = True
+        print(f"[Startup] Warm-up finished: {self.summary()}")
+
+    def start_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.warm_up, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def summary(self) -> Dict:
+        return {name: dict(state) for name, state in self.status.items()}
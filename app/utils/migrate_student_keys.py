@@ -0,0 +1,63 @@
+"""
+Backfill student_number_key on the student collection and report MongoDB round trips per
+student lookup: the original field-by-field cascade vs the single indexed query, for
+known student numbers and for unknown ones (the failed-login case).
+
+Usage:
+    python -m app.utils.migrate_student_keys --dry-run     # probe + round-trip report only
+    python -m app.utils.migrate_student_keys               # backfill, index, report again
+    python -m app.utils.migrate_student_keys --batch-size 500 --sample 50
+"""
+import argparse
+import time
+
+from app.engines.db_engine import db_engine, ID_FIELDS
+
+
+def round_trips(lookup, numbers):
+    """(round trips per lookup, ms per lookup, found) for a lookup function over the numbers"""
+    before = db_engine.get_lookup_stats()
+    started = time.perf_counter()
+    found = sum(lookup(number) is not None for number in numbers)
+    elapsed = (time.perf_counter() - started) * 1000
+    after = db_engine.get_lookup_stats()
+    lookups = after["lookups"] - before["lookups"]
+    return (after["round_trips"] - before["round_trips"]) / max(lookups, 1), elapsed / max(len(numbers), 1), found
+
+
+def report(numbers, label):
+    known, unknown = numbers
+    print(f"\n{label} (schema: {db_engine.id_schema})")
+    for name, lookup in (("cascade", db_engine._lookup_cascade), ("indexed", db_engine.get_student_by_number)):
+        for kind, sample in (("known", known), ("unknown", unknown)):
+            trips, ms, found = round_trips(lookup, sample)
+            print(f"  {name:<8} {kind:<8} {trips:5.2f} round trips/lookup  {ms:7.2f} ms/lookup  found {found}/{len(sample)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only probe and report, do not write keys")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=20, help="student numbers looked up per report")
+    args = parser.parse_args()
+
+    if not db_engine.connected:
+        raise SystemExit("MongoDB is not connected (check MONGO_URI)")
+    docs = db_engine.student_coll.find({}, {field: 1 for field in ID_FIELDS}).limit(args.sample)
+    known = [next(doc[field] for field in ID_FIELDS if doc.get(field) is not None)
+             for doc in docs if any(doc.get(field) is not None for field in ID_FIELDS)]
+    unknown = [str(990000000 + i) for i in range(args.sample)]
+    numbers = ([str(number) for number in known], unknown)
+
+    report(numbers, "Before")
+    if args.dry_run:
+        return
+    started = time.perf_counter()
+    result = db_engine.backfill_student_keys(batch_size=args.batch_size)
+    print(f"\nBackfilled {result['updated']} documents in {time.perf_counter() - started:.1f}s "
+          f"(key ready: {result['key_ready']})")
+    report(numbers, "After")
+
+
+if __name__ == "__main__":
+    main()
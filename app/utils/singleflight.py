@@ -0,0 +1,64 @@
+"""
+Single-flight request coalescing: concurrent callers with the same key share one computation
+"""
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, wait_timeout: Optional[float] = None):
+        """wait_timeout: followers stop waiting after this many seconds and compute on their own."""
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0, "follower_timeouts": 0, "upstream_calls_saved": 0}
+
+    def do(self, key: str, fn: Callable) -> Tuple[object, bool]:
+        """Run fn once per in-flight key. Returns (result, shared) where shared=True for followers."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["leaders"] += 1
+            else:
+                self._stats["followers"] += 1
+
+        if not leader:
+            if call.event.wait(self.wait_timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result, True
+            with self._lock:
+                self._stats["follower_timeouts"] += 1
+            return fn(), False
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def record_saved(self, upstream_calls: int):
+        """Count upstream (LLM) calls a follower did not have to make."""
+        with self._lock:
+            self._stats["upstream_calls_saved"] += upstream_calls
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
@@ -0,0 +1,133 @@
+"""
+Streaming helpers - incremental JSON envelope parsing and SSE formatting
+"""
+import json
+from typing import Dict, List
+
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JSONEnvelopeParser:
+    """
+    Incrementally scans a streamed `{"text": ..., "suggestions": [...]}` reply and
+    returns the decoded characters of the top-level "text" value as they arrive.
+    Anything before the first '{' (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self, stream_key: str = "text"):
+        self.stream_key = stream_key
+        self._raw: List[str] = []
+        self._streamed: List[str] = []
+        self._out: List[str] = []
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode = None  # pending \uXXXX hex digits
+        self._high_surrogate = None
+        self._key_buf: List[str] = []
+        self._reading_key = False
+        self._last_key = None
+        self._expect_value = False
+        self._streaming = False
+
+    @property
+    def raw_text(self) -> str:
+        return "".join(self._raw)
+
+    @property
+    def streamed_text(self) -> str:
+        return "".join(self._streamed)
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk of model output and return the new text delta (may be empty)."""
+        if not chunk:
+            return ""
+        self._raw.append(chunk)
+        self._out = []
+        for ch in chunk:
+            self._consume(ch)
+        delta = "".join(self._out)
+        if delta:
+            self._streamed.append(delta)
+        return delta
+
+    def remainder(self, final_text: str) -> str:
+        """Text still missing from the stream once the full reply has been parsed."""
+        streamed = self.streamed_text
+        if final_text.startswith(streamed):
+            return final_text[len(streamed):]
+        return ""
+
+    def _emit(self, ch: str):
+        if self._streaming:
+            self._out.append(ch)
+        elif self._reading_key:
+            self._key_buf.append(ch)
+
+    def _emit_codepoint(self, code: int):
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        if 0xD800 <= code <= 0xDFFF:
+            return  # Unpaired surrogate, drop it
+        self._emit(chr(code))
+
+    def _consume(self, ch: str):
+        if not self._started:
+            if ch == "{":
+                self._started = True
+                self._depth = 1
+            return
+
+        if self._in_string:
+            if self._unicode is not None:
+                self._unicode += ch
+                if len(self._unicode) == 4:
+                    try:
+                        self._emit_codepoint(int(self._unicode, 16))
+                    except ValueError:
+                        pass
+                    self._unicode = None
+            elif self._escape:
+                self._escape = False
+                if ch == "u":
+                    self._unicode = ""
+                else:
+                    self._emit(ESCAPES.get(ch, ch))
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._reading_key:
+                    self._last_key = "".join(self._key_buf)
+                self._streaming = False
+                self._reading_key = False
+            else:
+                self._emit(ch)
+            return
+
+        if ch == '"':
+            self._in_string = True
+            if self._depth == 1 and not self._expect_value:
+                self._reading_key = True
+                self._key_buf = []
+            elif self._depth == 1 and self._last_key == self.stream_key:
+                self._streaming = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+        elif ch == ":" and self._depth == 1:
+            self._expect_value = True
+        elif ch == "," and self._depth == 1:
+            self._expect_value = False
+            self._last_key = None
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,190 @@
+"""
+Concurrency stress test for the RAG engine: reader threads search while a writer keeps
+re-ingesting (and occasionally deleting) documents, then the run is checked for consistency.
+
+Every line of a document carries a "docN vM" version marker. Searches read one published
+snapshot, so a single result must never mix two versions of the same document, and every id it
+returns must still have its chunk text. The run fails on mixed versions, missing texts, reader
+exceptions, or an engine/on-disk state that does not add up afterwards (index size vs chunk
+store, keyword index, stale or unpurged rows, reload from disk).
+
+By default chunks are embedded with a hashing encoder, so the test runs without downloading
+MiniLM; consistency does not depend on embedding quality. Pass --model to use MiniLM.
+
+Usage:
+    python -m app.utils.stress_rag_snapshots --seconds 20 --readers 8
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import app.engines.rag_engine as rag_module
+
+MARKER = re.compile(r"\bdoc(\d+) v(\d+) ")  # trailing space: a chunk may end mid-marker
+WORDS = ("semester intake fee campus exam week hostel library scholarship tuition ielts muet "
+         "registration orientation lecture tutorial deadline transcript graduation faculty").split()
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words embedding (384-d, L2-normalised)."""
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        out = np.zeros((len(texts), 384), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", str(text).lower()):
+                out[row, int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % 384] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-6)
+
+
+def use_directory(directory: str):
+    """Point the engine's files at a scratch knowledge base."""
+    rag_module.KNOWLEDGE_BASE_DIR = directory
+    rag_module.INDEX_FILE = os.path.join(directory, "faiss_index.bin")
+    rag_module.METADATA_FILE = os.path.join(directory, "faiss_metadata.pkl")
+    rag_module.CHUNK_STORE_FILE = os.path.join(directory, "chunks.sqlite3")
+    rag_module.LEXICAL_FILE = os.path.join(directory, "lexical_index.pkl")
+
+
+def write_document(directory: str, doc: int, version: int, lines: int) -> str:
+    rng = random.Random(doc * 100003 + version)
+    path = os.path.join(directory, f"doc{doc}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        for line in range(lines):
+            f.write(f"doc{doc} v{version} {' '.join(rng.choice(WORDS) for _ in range(6))} line {line}\n")
+    return path
+
+
+def run(seconds: float, readers: int, docs: int, lines: int, model) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        use_directory(directory)
+        engine = rag_module.RAGEngine(model=model)
+        if not engine.enabled:
+            print("RAG engine unavailable")
+            return False
+        versions = {doc: 0 for doc in range(docs)}
+        for doc in range(docs):
+            engine.ingest(write_document(directory, doc, 0, lines))
+        print(f"Seeded {docs} documents, {engine.get_stats()['vectors']} vectors; "
+              f"{readers} readers for {seconds:.0f}s while a writer re-ingests")
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        results = {"searches": 0, "mixed": [], "errors": [], "missing_texts": 0, "latencies": [],
+                   "ingests": 0, "removes": 0, "versions_seen": set()}
+
+        def reader(seed: int):
+            rng = random.Random(seed)
+            while not stop.is_set():
+                query = f"doc{rng.randrange(docs)} " + " ".join(rng.choice(WORDS) for _ in range(3))
+                started = time.perf_counter()
+                try:
+                    with engine._reading() as snapshot:  # as RAGEngine.search does
+                        ids = engine._retrieve([query], 8, snapshot=snapshot)[0]
+                        texts = engine.store.get_texts(ids)
+                except Exception as e:
+                    with lock:
+                        results["errors"].append(repr(e))
+                    continue
+                latency = time.perf_counter() - started
+                seen = {}
+                for text in texts.values():
+                    for doc, version in MARKER.findall(text):
+                        seen.setdefault(doc, set()).add(version)
+                with lock:
+                    results["searches"] += 1
+                    results["latencies"].append(latency)
+                    results["missing_texts"] += len(ids) - len(texts)
+                    results["versions_seen"].add(engine.get_stats()["version"])
+                    for doc, found in seen.items():
+                        if len(found) > 1:
+                            results["mixed"].append((query, doc, sorted(found)))
+
+        def writer():
+            rng = random.Random(0)
+            while not stop.is_set():
+                doc = rng.randrange(docs)
+                try:
+                    if rng.random() < 0.1:
+                        engine.remove_source(f"doc{doc}.txt")
+                        results["removes"] += 1
+                    versions[doc] += 1
+                    engine.ingest(write_document(directory, doc, versions[doc], lines))
+                    results["ingests"] += 1
+                except Exception as e:
+                    with lock:
+                        results["errors"].append(f"writer: {e!r}")
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies = np.array(results["latencies"] or [0.0]) * 1000
+        print(f"{results['searches']} searches ({results['searches'] / seconds:.0f}/s), "
+              f"p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms; "
+              f"{results['ingests']} ingests, {results['removes']} removes, "
+              f"{len(results['versions_seen'])} snapshot versions observed by readers")
+        print(f"Chunk texts deleted between a reader's snapshot and its text lookup: {results['missing_texts']}")
+
+        failures = []
+        if results["mixed"]:
+            failures.append(f"{len(results['mixed'])} results mixed document versions, e.g. {results['mixed'][0]}")
+        if results["errors"]:
+            failures.append(f"{len(results['errors'])} exceptions, e.g. {results['errors'][0]}")
+        if results["missing_texts"]:
+            failures.append(f"{results['missing_texts']} chunk texts were gone before their reader finished")
+        if engine._retired:
+            failures.append(f"{len(engine._retired)} retired row sets still pending after every reader finished")
+
+        # Final state: index, store and keyword index agree and only the latest versions remain
+        snapshot = engine._snapshot
+        if snapshot.index.ntotal != len(engine.store) + len(snapshot.tombstones):
+            failures.append(f"index has {snapshot.index.ntotal} vectors, store {len(engine.store)} "
+                            f"+ {len(snapshot.tombstones)} tombstones")
+        if len(snapshot.lexical) != len(engine.store):
+            failures.append(f"keyword index has {len(snapshot.lexical)} chunks, store {len(engine.store)}")
+        for chunk_id, source, text in engine.store.iter_chunks():
+            for doc, version in MARKER.findall(text):
+                if f"doc{doc}.txt" != source or int(version) != versions[int(doc)]:
+                    failures.append(f"stale chunk {chunk_id} in {source}: doc{doc} v{version}")
+                    break
+            if len(failures) > 5:
+                break
+
+        # Reload from disk: the atomically written files must describe the same state
+        reloaded = rag_module.RAGEngine(model=model)
+        if reloaded._snapshot.index.ntotal != snapshot.index.ntotal or len(reloaded.store) != len(engine.store):
+            failures.append(f"reloaded engine has {reloaded._snapshot.index.ntotal} vectors / "
+                            f"{len(reloaded.store)} chunks, expected {snapshot.index.ntotal} / {len(engine.store)}")
+        reloaded.store.close()
+        engine.store.close()
+
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        print("OK: no torn reads, state consistent" if not failures else f"{len(failures)} failure(s)")
+        return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG snapshot concurrency stress test")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--docs", type=int, default=6)
+    parser.add_argument("--lines", type=int, default=300, help="lines per document (~60 chars each)")
+    parser.add_argument("--model", action="store_true", help="embed with all-MiniLM-L6-v2 instead of hashing")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.seconds, args.readers, args.docs, args.lines, None if args.model else HashingEncoder())
+             else 1)
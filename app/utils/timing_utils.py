@@ -0,0 +1,34 @@
+"""
+Per-request stage timing (offsets relative to request start, so overlapping stages are visible)
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StageTimer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def _offset_ms(self) -> float:
+        return round((time.perf_counter() - self.origin) * 1000, 1)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Record start/end offsets of a stage; safe to use from worker threads."""
+        start = self._offset_ms()
+        try:
+            yield
+        finally:
+            end = self._offset_ms()
+            with self._lock:
+                self._stages[name] = {"start_ms": start, "end_ms": end, "duration_ms": round(end - start, 1)}
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            stages = dict(self._stages)
+        stages["total_ms"] = self._offset_ms()
+        return stages
@@ -7,21 +7,36 @@ Features:
 - RAG (Retrieval-Augmented Generation)
 - Log Anonymization
 """
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from app.engines.data_engine import DataEngine
+from app.engines.db_engine import db_engine
 from app.engines.ai_engine import AIEngine
 from app.engines.feedback_engine import FeedbackEngine
+from app.engines.cache_engine import response_cache, hash_context, normalize_question
+from app.engines.intent_engine import intent_router
+from app.engines.ingest_engine import ingest_queue
+from app.engines.metadata_engine import normalize_campus, student_levels
+from app.engines.calendar_engine import calendar_engine, CALENDAR_FAST_PATH
+from app.engines.catalog_engine import catalog_engine
+from app.engines.analytics_engine import analytics_engine, DIMENSIONS as ANALYTICS_DIMENSIONS
 import os
 import json
 import logging
 from datetime import datetime, timedelta
 import secrets
+import threading
+import zlib
 from functools import wraps
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Custom Modules
 from app.utils import auth_utils
 from app.utils import logging_utils
+from app.utils.stream_utils import sse_event
+from app.utils.timing_utils import StageTimer
+from app.utils.singleflight import SingleFlight
+from app.utils.lazy_utils import LazyProxy, Lifecycle
 from app.engines.learning_engine import learning_engine
 
 # Setup Logging
@@ -36,9 +51,9 @@ logging.getLogger("werkzeug").setLevel(logging.WARNING) # Optional: cleaner flas
 app = Flask(__name__, static_folder="static/site", static_url_path="/site")
 app.secret_key = auth_utils.SECRET_KEY
 
-# Initialize Engines
+# Initialize Engines (MongoDB and the RAG model load on first use or during warm-up)
 DATA_FILE = "data/Chatbot_TestData.xlsx" # Config artifact, logic moved to MongoDB
-data_engine = DataEngine(DATA_FILE)
+data_engine = LazyProxy(lambda: DataEngine(DATA_FILE), "data_engine")
 
 MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
 ai_engine = AIEngine(MODEL_NAME)
@@ -52,6 +67,53 @@ high_security_sessions = {}
 CONVERSATION_HISTORY_LIMIT = 12  # store last 6 exchanges
 conversation_history_store = {}
 
+# Speculative RAG: run retrieval alongside the phase-1 LLM decision call.
+# off | on | ab (A/B split by conversation id so both arms can be compared)
+SPECULATIVE_RAG_MODE = os.getenv("SPECULATIVE_RAG_MODE", "off").lower()
+SPECULATIVE_RAG_TIMEOUT = float(os.getenv("SPECULATIVE_RAG_TIMEOUT", "5"))
+rag_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SPECULATIVE_RAG_WORKERS", "4")), thread_name_prefix="rag")
+speculation_stats = {"launched": 0, "used": 0, "failed": 0, "discarded": 0}
+speculation_lock = threading.Lock()
+
+# Metadata-filtered retrieval: logged-in students search their own programme level's documents
+# (plus general ones) instead of every calendar
+RAG_PROFILE_FILTERS = os.getenv("RAG_PROFILE_FILTERS", "true").lower() == "true"
+
+# Single-flight coalescing of identical concurrent guest questions
+chat_flights = SingleFlight(wait_timeout=float(os.getenv("CHAT_COALESCE_WAIT", "30")))
+
+# Background ingestion: drop cached answers once a document's vectors are live
+KNOWLEDGE_BASE_PATH = "data/knowledge_base"
+
+def on_ingest_complete(job):
+    if "calendar" in job["filename"].lower():
+        calendar_engine.refresh()
+    # Files that reused chunks of the replaced version lost them: ingest them again
+    ingest_queue.submit_stale(job.get("stale_dependents", []), KNOWLEDGE_BASE_PATH)
+    response_cache.invalidate(f"ingested {job['filename']}")
+
+ingest_queue.on_complete = on_ingest_complete
+
+# Startup lifecycle: lazy (load on first use) | warm (background warm-up) | eager (warm up before serving)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "warm").lower()
+lifecycle = Lifecycle()
+
+def warm_rag():
+    from app.engines.rag_engine import rag_engine
+    return rag_engine.warm_up()
+
+lifecycle.register("database", lambda: data_engine.load().db.connected)
+lifecycle.register("rag", warm_rag)
+lifecycle.register("intent_router", intent_router.warm_up)
+lifecycle.register("calendar", lambda: calendar_engine.load().events)
+lifecycle.register("catalog", lambda: catalog_engine.get_stats()["programmes"])
+lifecycle.register("analytics", lambda: analytics_engine.warm_up())
+
+if STARTUP_MODE == "eager":
+    lifecycle.warm_up()
+elif STARTUP_MODE == "warm":
+    lifecycle.start_background()
+
 # Ensure directories exist
 if not os.path.exists("knowledge_base"):
     os.makedirs("knowledge_base")
@@ -149,6 +211,164 @@ def check_personal_intent(message, search_term):
         return True
     return False
 
+def classify_context_intent(message):
+    """Map an LLM 'needs_context' decision onto a router intent using keyword heuristics."""
+    if check_personal_intent(message, None):
+        return "grade" if is_grade_query(message) else "personal"
+    # Simple heuristic: if query mentions "how many" or "stats", check stats first
+    if "count" in message.lower() or "how many" in message.lower():
+        return "stats"
+    return "needs_context"
+
+def speculative_rag_enabled(conversation_id):
+    """Config switch for speculative retrieval ('ab' buckets conversations 50/50)."""
+    if SPECULATIVE_RAG_MODE == "on":
+        return True
+    if SPECULATIVE_RAG_MODE == "ab":
+        return zlib.crc32(str(conversation_id).encode("utf-8")) % 2 == 0
+    return False
+
+def record_speculation(outcome):
+    with speculation_lock:
+        speculation_stats[outcome] += 1
+
+def speculation_snapshot():
+    with speculation_lock:
+        return dict(speculation_stats)
+
+def retrieval_filters(current_user):
+    """RAG metadata filters for the logged-in student's level/campus (token claims); None for guests."""
+    if not RAG_PROFILE_FILTERS or not current_user:
+        return None
+    filters = {}
+    if current_user.get("levels"):
+        filters["level"] = current_user["levels"]
+    if current_user.get("campus"):
+        filters["campus"] = current_user["campus"]
+    return filters or None
+
+def filter_scope(filters):
+    """Stable response-cache scope for a filter set, so levels never share cached answers."""
+    if not filters:
+        return ""
+    return ";".join(f"{key}={','.join(sorted([value] if isinstance(value, str) else value))}"
+                    for key, value in sorted(filters.items()))
+
+def calendar_answer(user_message, conversation_history, current_user):
+    """
+    Date questions answered from the structured calendar index.
+    Returns (payload, llm_calls) or None when the question is not a calendar lookup (including
+    matches that leave part of the question unexplained): confident matches use the templated
+    text as-is, the rest get one LLM call to phrase it.
+    """
+    if not CALENDAR_FAST_PATH:
+        return None
+    filters = retrieval_filters(current_user)
+    match = calendar_engine.match(user_message, filters.get("level") if filters else None)
+    if match is None:
+        return None
+    if match["confident"]:
+        calendar_engine.record(True)
+        return {"text": match["text"], "suggestions": []}, 0
+    result = ai_engine.process_message(user_message, data_context=match["text"],
+                                       conversation_history=list(conversation_history))
+    if result.get("error"):
+        # The templated answer is still correct, just less conversational
+        calendar_engine.record(True)
+        return {"text": match["text"], "suggestions": []}, 1
+    calendar_engine.record(False)
+    return {"text": result.get("response", match["text"]), "suggestions": result.get("suggestions", [])}, 1
+
+def search_knowledge_base(user_message, timer=None, filters=None):
+    """RAG search, timed as the 'rag' stage when a timer is given."""
+    from app.engines.rag_engine import rag_engine
+    if timer is None:
+        return rag_engine.search(user_message, filters=filters)
+    with timer.stage("rag"):
+        return rag_engine.search(user_message, filters=filters)
+
+class SpeculativeSearch:
+    """RAG search started alongside the phase-1 LLM call; consumed or discarded later."""
+
+    def __init__(self, user_message, timer=None, filters=None):
+        self.future = rag_executor.submit(search_knowledge_base, user_message, timer, filters)
+        self.settled = False  # every launch ends as exactly one of used / failed / discarded
+        record_speculation("launched")
+
+    def result(self):
+        self.settled = True
+        outcome = "failed"  # timeout or search error: the caller searches inline
+        try:
+            value = self.future.result(timeout=SPECULATIVE_RAG_TIMEOUT)
+            outcome = "used"
+            return value
+        finally:
+            record_speculation(outcome)
+
+    def discard(self):
+        if not self.settled:
+            self.settled = True
+            self.future.cancel()
+            record_speculation("discarded")
+
+def fetch_context(user_message, intent, current_user, speculation=None, timer=None):
+    """
+    Resolve the data context for a routed intent.
+    Returns (context, security_response, used_student_context); security_response
+    is a login/password challenge dict that must be returned instead of an answer.
+    speculation: SpeculativeSearch already running for this message (optional).
+    """
+    # A. Check for Personal Data / Grades first (Security)
+    if intent in ("personal", "grade"):
+        if not current_user:
+            return "", {
+                "response": "🔒 Please login to access personal information.",
+                "type": "login_hint"
+            }, False
+        # Dual Auth Check for Grades
+        if intent == "grade" or is_grade_query(user_message):
+            expiry = high_security_sessions.get(current_user.get("student_number"))
+            if not expiry or datetime.now() > expiry:
+                return "", {
+                    "response": "🔒 Security Check: Please enter your password to view examination results.",
+                    "type": "password_prompt"
+                }, False
+
+        student_data = data_engine.get_student_info(current_user.get("student_number"))
+        if student_data:
+            return build_student_context(student_data), None, True
+        return "Student record not found.", None, True
+
+    # B. If not personal, check DB Stats or RAG
+    context_used = ""
+    if intent == "stats":
+        # Counts from the in-memory cube; the live aggregation only while it is unavailable
+        context_used = analytics_engine.context_for(user_message) or data_engine.get_summary_stats()
+
+    # If still no context, try the programme catalog (structured) and RAG
+    if not context_used or "error" in str(context_used).lower():
+        catalog_context = catalog_engine.context_for(user_message)
+        context_used = None
+        if speculation is not None:
+            try:
+                context_used = speculation.result()
+            except Exception as e:
+                logger.warning(f"Speculative RAG failed, searching inline: {e}")
+        if context_used is None:
+            context_used = search_knowledge_base(user_message, timer, retrieval_filters(current_user))
+        if catalog_context:
+            context_used = f"{catalog_context}\n\n{context_used}" if context_used else catalog_context
+    return context_used, None, False
+
+
+def get_optional_user():
+    """Decode the Bearer token if present (guests get None)."""
+    if 'Authorization' in request.headers:
+        token = request.headers['Authorization'].split(" ")[1] if "Bearer " in request.headers['Authorization'] else None
+        if token:
+            return auth_utils.decode_access_token(token)
+    return None
+
 
 def token_required(f):
     @wraps(f)
@@ -179,6 +399,26 @@ def token_required(f):
 def home():
     return jsonify({"status": "University Chatbot API is running", "docs": "/site/code_hompage.html"})
 
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: warm-up finished (always ready in lazy mode, where engines load on first use)"""
+    from app.engines.rag_engine import rag_engine
+    components = lifecycle.summary()
+    ready = STARTUP_MODE == "lazy" or lifecycle.finished
+    degraded = any(state.get("status") == "failed" for state in components.values())
+    return jsonify({
+        "ready": ready,
+        "status": "degraded" if ready and degraded else ("ready" if ready else "warming_up"),
+        "mode": STARTUP_MODE,
+        "components": components,
+        "loaded": {"database": db_engine.is_loaded(), "rag": rag_engine.is_loaded()}
+    }), 200 if ready else 503
+
 @app.route('/site/<path:filename>')
 def serve_static(filename):
     return send_from_directory('static/site', filename)
@@ -199,11 +439,14 @@ def login():
         is_valid, student_data, msg = data_engine.verify_student(student_number, name)
         
         if is_valid:
-            # Generate JWT
+            # Generate JWT (level/campus claims scope knowledge-base retrieval to the student's programme)
             token = auth_utils.create_access_token({
                 "student_number": student_number,
                 "name": name,
-                "role": "student"
+                "role": "student",
+                "levels": student_levels(student_data.get("PROGRAMME_LEVEL"), student_data.get("PROFILE_TYPE"),
+                                         student_data.get("PROGRAMME_NAME") or student_data.get("PROGRAMME")),
+                "campus": normalize_campus(student_data.get("CAMPUS"))
             })
             
             logging_utils.log_audit("LOGIN", f"{name} ({student_number})", "Login successful")
@@ -226,7 +469,7 @@ def verify_high_security(current_user):
         student_number = current_user.get('student_number')
         
         # Get actual student record securely
-        student = data_engine.get_student_info(student_number)
+        student = data_engine.get_student_info(student_number, raise_errors=True)
         
         if not student:
             return jsonify({"success": False, "message": "Student record not found"}), 404
@@ -252,6 +495,140 @@ def verify_high_security(current_user):
 # CHAT ENDPOINTS
 # ===========================================
 
+def answer_message(user_message, conversation_history, current_user, conversation_id, cacheable):
+    """
+    Route, fetch context and call the LLM for one chat turn.
+    Returns { payload, routing, security_response, timings }; shared read-only
+    between coalesced requests, so callers must copy before modifying.
+    """
+    timer = StageTimer()
+
+    # 0. Calendar fast path (dates straight from the parsed academic calendars)
+    with timer.stage("calendar"):
+        calendar_result = calendar_answer(user_message, conversation_history, current_user)
+    if calendar_result:
+        response_payload, llm_calls = calendar_result
+        if cacheable:
+            response_cache.put(user_message, response_payload, conversation_history,
+                               scope=filter_scope(retrieval_filters(current_user)))
+        return {
+            "payload": response_payload,
+            "routing": {"intent": "calendar", "confidence": 1.0, "source": "calendar", "llm_calls": llm_calls},
+            "security_response": None,
+            "timings": timer.as_dict()
+        }
+
+    # 1. Local Intent Routing (no LLM call when the classifier is confident)
+    with timer.stage("route"):
+        route = intent_router.classify(user_message)
+    routing = {
+        "intent": route.get("intent"),
+        "confidence": route.get("confidence", 0.0),
+        "source": "local",
+        "llm_calls": 0
+    }
+
+    initial_result = {}
+    speculation = None
+    if route.get("confident"):
+        intent = route["intent"]
+    else:
+        # Fallback: LLM decides if it can answer directly OR needs data.
+        routing["source"] = "llm"
+        if speculative_rag_enabled(conversation_id) and cacheable:
+            # Start embedding + FAISS search now; discarded if the LLM doesn't need context
+            speculation = SpeculativeSearch(user_message, timer, retrieval_filters(current_user))
+        routing["speculative_rag"] = speculation is not None
+        with timer.stage("phase1_llm"):
+            initial_result = ai_engine.process_message(user_message, conversation_history=list(conversation_history))
+        routing["llm_calls"] += 1
+        intent = classify_context_intent(user_message) if initial_result.get("needs_context") else "general"
+        routing["intent"] = intent
+
+    response_payload = {}
+    response_text = ""
+    used_student_context = False
+    answer_failed = bool(initial_result.get("error"))
+
+    if intent != "general":
+        # 2. Context Required -> Fetch Data & Re-Prompt
+        try:
+            print(f"DEBUG: Fetching '{intent}' context for '{user_message}'")
+            try:
+                with timer.stage("context"):
+                    context_used, security_response, used_student_context = fetch_context(
+                        user_message, intent, current_user, speculation=speculation, timer=timer
+                    )
+            finally:
+                if speculation is not None:
+                    speculation.discard()
+            if security_response:
+                intent_router.record(routing["source"], routing["llm_calls"])
+                return {
+                    "payload": None,
+                    "routing": routing,
+                    "security_response": security_response,
+                    "timings": timer.as_dict()
+                }
+
+            # 3. Final call with context
+            with timer.stage("answer_llm"):
+                final_result = ai_engine.process_message(
+                    user_message, 
+                    data_context=context_used or "No specific data found.", 
+                    conversation_history=list(conversation_history)
+                )
+            routing["llm_calls"] += 1
+            
+            answer_failed = bool(final_result.get("error"))
+            response_text = final_result.get("response", "I couldn't find that info.")
+            response_payload = {
+                "text": response_text,
+                "suggestions": final_result.get("suggestions", [])
+            }
+        except Exception as e:
+            logger.error(f"Context Fetch Error: {e}")
+            response_text = "I encountered an error looking up that information."
+            response_payload = {"text": response_text, "suggestions": []}
+            answer_failed = True
+
+    else:
+        if speculation is not None:
+            speculation.discard()
+        if routing["source"] == "local":
+            # Router says general -> answer directly without the decision prompt
+            with timer.stage("answer_llm"):
+                initial_result = ai_engine.process_message(
+                    user_message,
+                    conversation_history=list(conversation_history),
+                    decide_intent=False
+                )
+            routing["llm_calls"] += 1
+            answer_failed = bool(initial_result.get("error"))
+        # AI Answered directly (Saved 1 Call!)
+        response_text = initial_result.get("response", "")
+        response_payload = {
+            "text": response_text,
+            "suggestions": initial_result.get("suggestions", [])
+        }
+
+    # Phase-1 decision call skipped for locally routed data questions
+    llm_calls_saved = 1 if routing["source"] == "local" and intent != "general" else 0
+    intent_router.record(routing["source"], routing["llm_calls"], llm_calls_saved)
+
+    # Cache general answers for repeat questions
+    if cacheable and not used_student_context and not answer_failed:
+        response_cache.put(user_message, response_payload, conversation_history,
+                           scope=filter_scope(retrieval_filters(current_user)))
+
+    return {
+        "payload": response_payload,
+        "routing": routing,
+        "security_response": None,
+        "timings": timer.as_dict()
+    }
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Chat endpoint supporting JWT and Dual Auth"""
@@ -260,11 +637,7 @@ def chat():
         user_message = data.get("message")
         
         # Get Token if available
-        current_user = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(" ")[1] if "Bearer " in request.headers['Authorization'] else None
-            if token:
-                current_user = auth_utils.decode_access_token(token)
+        current_user = get_optional_user()
         
         session_key, conversation_id, _ = resolve_conversation_session(current_user, data)
         conversation_history = get_conversation_history(session_key)
@@ -273,85 +646,46 @@ def chat():
             return jsonify({"error": "Message is required", "conversation_id": conversation_id}), 400
 
         append_conversation_message(session_key, "user", user_message)
+
+        # 0. Response Cache (general questions only, never personal data)
+        cacheable = not check_personal_intent(user_message, None)
+        if cacheable:
+            cached_payload = response_cache.get(user_message, conversation_history,
+                                                scope=filter_scope(retrieval_filters(current_user)))
+            if cached_payload:
+                append_conversation_message(session_key, "assistant", json.dumps(cached_payload))
+                return jsonify({
+                    "response": json.dumps(cached_payload),
+                    "session_id": conversation_id,
+                    "type": "message",
+                    "user": current_user.get("name") if current_user else "Guest",
+                    "cached": True,
+                    "routing": {"intent": None, "confidence": 0.0, "source": "cache", "llm_calls": 0}
+                })
         
         # --- OPTIMIZED SINGLE-CALL FLOW ---
-        
-        # 1. Initial Attempt (No Data Context)
-        # This checks if the AI can answer directly OR if it needs data.
-        initial_result = ai_engine.process_message(user_message, conversation_history=list(conversation_history))
-        
-        response_payload = {}
-        response_text = ""
-        context_used = ""
-
-        if initial_result.get("needs_context"):
-            # 2. Context Required -> Fetch Data & Re-Prompt
-            try:
-                print(f"DEBUG: AI requested context for '{user_message}'")
-                search_term = initial_result.get("search_term")
-                
-                # A. Check for Personal Data / Grades first (Security)
-                is_personal = check_personal_intent(user_message, search_term)
-                if is_personal:
-                     if not current_user:
-                        return jsonify({
-                            "response": "🔒 Please login to access personal information.",
-                            "type": "login_hint",
-                            "conversation_id": conversation_id
-                        })
-                     # Dual Auth Check for Grades
-                     if is_grade_query(user_message):
-                        expiry = high_security_sessions.get(current_user.get("student_number"))
-                        if not expiry or datetime.now() > expiry:
-                            return jsonify({
-                                "response": "🔒 Security Check: Please enter your password to view examination results.",
-                                "type": "password_prompt",
-                                "conversation_id": conversation_id
-                            })
-                            
-                     student_data = data_engine.get_student_info(current_user.get("student_number"))
-                     if student_data:
-                         context_used = build_student_context(student_data)
-                     else:
-                         context_used = "Student record not found."
-
-                # B. If not personal, check DB Stats or RAG
-                if not context_used:
-                    # Simple heuristic: if query mentions "how many" or "stats", check stats first
-                    if "count" in user_message.lower() or "how many" in user_message.lower():
-                        context_used = data_engine.get_summary_stats()
-                    
-                    # If still no context, try RAG
-                    if not context_used or "error" in str(context_used).lower():
-                        from app.engines.rag_engine import rag_engine
-                        rag_docs = rag_engine.search(user_message)
-                        if rag_docs:
-                             context_used = "\n".join([d.page_content for d in rag_docs])
-
-                # 3. Final call with context
-                final_result = ai_engine.process_message(
-                    user_message, 
-                    data_context=context_used or "No specific data found.", 
-                    conversation_history=list(conversation_history)
-                )
-                
-                response_text = final_result.get("response", "I couldn't find that info.")
-                response_payload = {
-                    "text": response_text,
-                    "suggestions": final_result.get("suggestions", [])
-                }
-            except Exception as e:
-                logger.error(f"Context Fetch Error: {e}")
-                response_text = "I encountered an error looking up that information."
-                response_payload = {"text": response_text, "suggestions": []}
 
+        # Identical concurrent guest questions (same history) share one computation.
+        # Authenticated and personal ("my ...") messages are never coalesced.
+        if current_user is None and cacheable:
+            flight_key = f"guest:{hash_context(conversation_history)}:{normalize_question(user_message)}"
+            outcome, shared = chat_flights.do(
+                flight_key,
+                lambda: answer_message(user_message, conversation_history, current_user, conversation_id, cacheable)
+            )
         else:
-            # AI Answered directly (Saved 1 Call!)
-            response_text = initial_result.get("response", "")
-            response_payload = {
-                "text": response_text,
-                "suggestions": initial_result.get("suggestions", [])
-            }
+            outcome = answer_message(user_message, conversation_history, current_user, conversation_id, cacheable)
+            shared = False
+
+        routing = dict(outcome["routing"])
+        if shared:
+            routing["coalesced"] = True
+            chat_flights.record_saved(routing["llm_calls"])
+
+        if outcome["security_response"]:
+            return jsonify(dict(outcome["security_response"], conversation_id=conversation_id, routing=routing))
+
+        response_payload = outcome["payload"]
 
         # Update History
         append_conversation_message(session_key, "assistant", json.dumps(response_payload))
@@ -362,13 +696,138 @@ def chat():
             "response": json.dumps(response_payload),
             "session_id": conversation_id,
             "type": "message",
-            "user": current_user.get("name") if current_user else "Guest"
+            "user": current_user.get("name") if current_user else "Guest",
+            "routing": routing,
+            "timings": outcome["timings"]
         })
 
     except Exception as e:
         logger.error(f"Chat error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Server-Sent Events variant of /api/chat.
+    Events: meta -> text (deltas) -> suggestions -> done, or security/error.
+    """
+    data = request.get_json() or {}
+    user_message = data.get("message")
+    current_user = get_optional_user()
+
+    session_key, conversation_id, _ = resolve_conversation_session(current_user, data)
+    conversation_history = get_conversation_history(session_key)
+
+    if not user_message:
+        return jsonify({"error": "Message is required", "conversation_id": conversation_id}), 400
+
+    append_conversation_message(session_key, "user", user_message)
+
+    def generate():
+        user_name = current_user.get("name") if current_user else "Guest"
+        yield sse_event("meta", {"session_id": conversation_id, "user": user_name})
+        try:
+            # 0. Response Cache
+            cacheable = not check_personal_intent(user_message, None)
+            scope = filter_scope(retrieval_filters(current_user))
+            cached_payload = response_cache.get(user_message, conversation_history, scope=scope) if cacheable else None
+            if cached_payload:
+                routing = {"intent": None, "confidence": 0.0, "source": "cache", "llm_calls": 0}
+                append_conversation_message(session_key, "assistant", json.dumps(cached_payload))
+                yield sse_event("text", {"delta": cached_payload.get("text", "")})
+                yield sse_event("suggestions", {"suggestions": cached_payload.get("suggestions", [])})
+                yield sse_event("done", {"response": json.dumps(cached_payload), "cached": True, "routing": routing})
+                return
+
+            # 0b. Calendar fast path
+            calendar_result = calendar_answer(user_message, conversation_history, current_user)
+            if calendar_result:
+                response_payload, llm_calls = calendar_result
+                routing = {"intent": "calendar", "confidence": 1.0, "source": "calendar", "llm_calls": llm_calls}
+                if cacheable:
+                    response_cache.put(user_message, response_payload, conversation_history, scope=scope)
+                append_conversation_message(session_key, "assistant", json.dumps(response_payload))
+                yield sse_event("text", {"delta": response_payload["text"]})
+                yield sse_event("suggestions", {"suggestions": response_payload["suggestions"]})
+                yield sse_event("done", {"response": json.dumps(response_payload), "type": "message", "routing": routing})
+                return
+
+            # 1. Local Intent Routing
+            route = intent_router.classify(user_message)
+            routing = {
+                "intent": route.get("intent"),
+                "confidence": route.get("confidence", 0.0),
+                "source": "local",
+                "llm_calls": 0
+            }
+
+            result = {}
+            if route.get("confident"):
+                intent = route["intent"]
+            else:
+                # Fallback: stream the decision call; direct answers flow straight to the client
+                routing["source"] = "llm"
+                for kind, value in ai_engine.stream_message(user_message, conversation_history=list(conversation_history)):
+                    if kind == "text":
+                        yield sse_event("text", {"delta": value})
+                    else:
+                        result = value
+                routing["llm_calls"] += 1
+                intent = classify_context_intent(user_message) if result.get("needs_context") else "general"
+                routing["intent"] = intent
+
+            used_student_context = False
+            if intent != "general" or routing["source"] == "local":
+                data_context = ""
+                if intent != "general":
+                    data_context, security_response, used_student_context = fetch_context(
+                        user_message, intent, current_user
+                    )
+                    if security_response:
+                        intent_router.record(routing["source"], routing["llm_calls"])
+                        security_response["routing"] = routing
+                        yield sse_event("security", security_response)
+                        yield sse_event("done", {"type": security_response["type"], "routing": routing})
+                        return
+
+                # 2. Answer call, streamed
+                for kind, value in ai_engine.stream_message(
+                    user_message,
+                    data_context=data_context or ("No specific data found." if intent != "general" else ""),
+                    conversation_history=list(conversation_history),
+                    decide_intent=False
+                ):
+                    if kind == "text":
+                        yield sse_event("text", {"delta": value})
+                    else:
+                        result = value
+                routing["llm_calls"] += 1
+
+            response_payload = {
+                "text": result.get("response", ""),
+                "suggestions": result.get("suggestions", [])
+            }
+            yield sse_event("suggestions", {"suggestions": response_payload["suggestions"]})
+
+            llm_calls_saved = 1 if routing["source"] == "local" and intent != "general" else 0
+            intent_router.record(routing["source"], routing["llm_calls"], llm_calls_saved)
+            if cacheable and not used_student_context and not result.get("error"):
+                response_cache.put(user_message, response_payload, conversation_history, scope=scope)
+
+            # Update History once the stream has completed
+            append_conversation_message(session_key, "assistant", json.dumps(response_payload))
+            yield sse_event("done", {"response": json.dumps(response_payload), "type": "message", "routing": routing})
+
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield sse_event("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ===========================================
 # FEEDBACK & ADMIN
 # ===========================================
@@ -413,6 +872,87 @@ def logout():
 # ADMIN ENDPOINTS
 # ===========================================
 
+@app.route('/api/admin/cache', methods=['GET'])
+def get_cache_stats():
+    """Response cache hit/miss counters"""
+    return jsonify(response_cache.get_stats())
+
+@app.route('/api/admin/cache', methods=['DELETE'])
+def clear_cache():
+    """Manually invalidate the response cache"""
+    response_cache.invalidate("admin request")
+    return jsonify({"success": True})
+
+@app.route('/api/admin/llm', methods=['GET'])
+def get_llm_stats():
+    """Per-model LLM latency, error and circuit-breaker state"""
+    return jsonify(ai_engine.get_llm_stats())
+
+@app.route('/api/admin/rag', methods=['GET'])
+def get_rag_stats():
+    """Vector index size/type and query embedding cache hit rate"""
+    from app.engines.rag_engine import rag_engine
+    return jsonify(rag_engine.get_stats())
+
+@app.route('/api/admin/students/cache', methods=['GET'])
+def get_student_cache_stats():
+    """Student record cache hit/miss/eviction counters"""
+    return jsonify(data_engine.student_cache.get_stats())
+
+@app.route('/api/admin/students/cache', methods=['DELETE'])
+def clear_student_cache():
+    """Drop one cached student record ({"student_number": ...}) or all of them"""
+    student_number = (request.get_json(silent=True) or {}).get("student_number")
+    data_engine.invalidate_student(student_number, "admin request")
+    return jsonify({"success": True})
+
+@app.route('/api/admin/analytics', methods=['GET'])
+def get_student_analytics():
+    """
+    Student counts from the analytics cube, e.g. ?nationality=Malaysian&gender=Female&group_by=programme
+    (repeat a dimension or comma-separate values to match any of them). No filters: cube status only.
+    """
+    filters = {dim: [v for value in request.args.getlist(dim) for v in value.split(",") if v]
+               for dim in ANALYTICS_DIMENSIONS if request.args.get(dim)}
+    group_by = [dim for dim in request.args.get("group_by", "").split(",") if dim]
+    unknown = [dim for dim in group_by if dim not in ANALYTICS_DIMENSIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown dimension(s): {', '.join(unknown)}",
+                        "dimensions": list(ANALYTICS_DIMENSIONS)}), 400
+    if not filters and not group_by:
+        return jsonify(analytics_engine.get_stats())
+    result = analytics_engine.count(filters, group_by, top=request.args.get("top", type=int))
+    if result is None:
+        return jsonify({"error": "Analytics cube not built yet (database unavailable)"}), 503
+    return jsonify(result)
+
+@app.route('/api/admin/analytics/refresh', methods=['POST'])
+def refresh_student_analytics():
+    """Rebuild the analytics cube now"""
+    result = analytics_engine.refresh()
+    if result is None:
+        return jsonify({"success": False, "message": "Refresh failed or database unavailable"}), 503
+    return jsonify(dict(result, success=True))
+
+@app.route('/api/admin/schema', methods=['GET'])
+def get_student_schema():
+    """Sampled student-collection fields with types and fill rates (?refresh=1 to resample now)"""
+    from app.engines.schema_engine import schema_engine
+    schema = schema_engine.refresh() if request.args.get("refresh") else schema_engine.get()
+    if schema is None:
+        return jsonify({"error": "Schema not sampled yet (database unavailable)"}), 503
+    return jsonify(dict(schema, stats=schema_engine.get_stats()))
+
+@app.route('/api/admin/catalog', methods=['GET'])
+def get_catalog_stats():
+    """Programme catalog size, reloads and query latency"""
+    return jsonify(catalog_engine.get_stats())
+
+@app.route('/api/admin/calendar', methods=['GET'])
+def get_calendar_stats():
+    """Calendar index size and how many chat turns the fast path answered"""
+    return jsonify(calendar_engine.get_stats())
+
 @app.route('/admin')
 def admin_page():
     """Serve Admin Dashboard"""
@@ -436,7 +976,18 @@ def get_admin_stats():
             "total_feedbacks": feedback_stats.get("total_feedbacks", 0),
             "unanswered_count": len(unanswered),
             "unanswered_logs": unanswered[-10:], # Last 10
-            "recent_feedbacks": recent_feedbacks
+            "recent_feedbacks": recent_feedbacks,
+            "response_cache": response_cache.get_stats(),
+            "intent_router": intent_router.get_stats(),
+            "llm": ai_engine.get_llm_stats(),
+            "speculative_rag": dict(speculation_snapshot(), mode=SPECULATIVE_RAG_MODE),
+            "coalescing": chat_flights.get_stats(),
+            "ingest_jobs": ingest_queue.get_stats(),
+            "calendar_fast_path": calendar_engine.get_stats(),
+            "programme_catalog": catalog_engine.get_stats(),
+            "student_lookup": db_engine.get_lookup_stats() if db_engine.is_loaded() else None,
+            "student_cache": data_engine.student_cache.get_stats() if data_engine.is_loaded() else None,
+            "student_analytics": analytics_engine.get_stats() if analytics_engine.is_loaded() else None
         })
     except Exception as e:
         logger.error(f"Admin stats error: {e}")
@@ -462,19 +1013,66 @@ def upload_document():
             file_path = f"data/knowledge_base/{file.filename}"
             file.save(file_path)
             
-            # Ingest into RAG
-            from app.engines.rag_engine import rag_engine
-            success = rag_engine.ingest_file(file_path)
-            
-            if success:
-                return jsonify({"success": True, "message": f"Successfully ingested {file.filename}"})
-            else:
-                return jsonify({"success": False, "message": "File saved but failed to ingest into Vector DB"})
+            # Ingest into RAG in the background; poll /api/admin/jobs/<id> for progress
+            job = ingest_queue.submit(file_path)
+            return jsonify({
+                "success": True,
+                "job_id": job["id"],
+                "message": f"Queued {file.filename} for ingestion"
+            }), 202
             
     except Exception as e:
         logger.error(f"Upload error: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/api/admin/jobs', methods=['GET'])
+def list_ingest_jobs():
+    """Recent ingestion jobs, newest first"""
+    return jsonify({"jobs": ingest_queue.list_jobs()})
+
+@app.route('/api/admin/jobs/<job_id>', methods=['GET'])
+def get_ingest_job(job_id):
+    """Progress of one ingestion job (pages, chunks embedded, vectors added)"""
+    job = ingest_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/admin/jobs/<job_id>/retry', methods=['POST'])
+def retry_ingest_job(job_id):
+    """Re-queue a failed ingestion job"""
+    job = ingest_queue.retry(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    if job["status"] != "queued":
+        return jsonify({"success": False, "message": f"Job is {job['status']}, only failed jobs can be retried", "job": job}), 409
+    return jsonify({"success": True, "job": job})
+
+@app.route('/api/admin/kb/sync', methods=['POST'])
+def sync_knowledge_base():
+    """Queue new/changed knowledge-base files for ingestion and drop vectors of deleted ones"""
+    from app.engines.rag_engine import rag_engine
+    if not rag_engine.enabled:
+        return jsonify({"success": False, "message": "RAG engine is disabled"}), 503
+    plan = rag_engine.plan_sync()
+    removed = {source: rag_engine.remove_source(source)[0] for source in plan["removed"]}
+    if removed:
+        # Files that reused chunks of a removed source need re-ingesting too
+        plan = dict(rag_engine.plan_sync(), removed=plan["removed"])
+    jobs = [ingest_queue.submit(path)["id"] for path in plan["new"] + plan["changed"]]
+    if removed:
+        if any("calendar" in source.lower() for source in removed):
+            calendar_engine.refresh()
+        response_cache.invalidate(f"sync removed {len(removed)} sources")
+    return jsonify({
+        "success": True,
+        "new": [os.path.basename(path) for path in plan["new"]],
+        "changed": [os.path.basename(path) for path in plan["changed"]],
+        "unchanged": len(plan["unchanged"]),
+        "removed": removed,
+        "job_ids": jobs
+    }), 202 if jobs else 200
+
 @app.route('/api/admin/files', methods=['GET'])
 def list_files():
     """List files in knowledge base"""
@@ -498,13 +1096,20 @@ def delete_file():
         if not filename:
             return jsonify({"success": False, "message": "Filename required"}), 400
         
-        file_path = os.path.join("data/knowledge_base", filename)
+        file_path = os.path.join(KNOWLEDGE_BASE_PATH, filename)
+        from app.engines.rag_engine import rag_engine
+        removed, stale = rag_engine.remove_source(filename) if rag_engine.enabled else (0, [])
         if os.path.exists(file_path):
             os.remove(file_path)
-            # Note: Ideally we should re-index RAG here, but for now we just delete source
-            return jsonify({"success": True})
-        else:
+        elif not removed:
             return jsonify({"success": False, "message": "File not found"}), 404
+        
+        # Files whose duplicate chunks pointed at this one lost that content
+        jobs = ingest_queue.submit_stale(stale, KNOWLEDGE_BASE_PATH)
+        if "calendar" in filename.lower():
+            calendar_engine.refresh()
+        response_cache.invalidate(f"deleted {filename}")
+        return jsonify({"success": True, "vectors_removed": removed, "reingesting": stale, "job_ids": jobs})
             
     except Exception as e:
         return jsonify({"error": str(e)}), 500